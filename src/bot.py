@@ -1,10 +1,19 @@
 """Инициализация бота"""
+import asyncio
+import signal
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
-from src.config import TELEGRAM_BOT_TOKEN
-from src.middleware import AuthMiddleware
+from src.config import TELEGRAM_BOT_TOKEN, BOT_RUN_MODE, SCHEDULER_ENABLED
+from src.middleware import AuthMiddleware, OutboundRequestMiddleware, InteractivePriorityMiddleware, EditDedupMiddleware, UpdateOrderingMiddleware
 from src.handlers import commands, callbacks, webapp
 from src.services.scheduler import SchedulerService
+from src.services.users import user_cache
+from src.services.regions import region_registry
+from src.services.order_store import order_store
+from src.services.cards import card_updater
+from src.services.sla import sla_engine
+from src.services.leader import scheduler_leader
+from src.utils.tasks import drain
 
 
 def create_bot():
@@ -12,7 +21,15 @@ def create_bot():
     bot = Bot(token=TELEGRAM_BOT_TOKEN)
     dp = Dispatcher(storage=MemoryStorage())
     
+    # Правки без изменений не отправляются (до очереди, чтобы не занимать лимит)
+    bot.session.middleware(EditDedupMiddleware())
+    # Все запросы в чаты проходят через очередь с лимитами Telegram
+    bot.session.middleware(OutboundRequestMiddleware())
+    
     # Регистрируем middleware
+    # Обновления разных чатов - параллельно, одного чата и одного заказа - по очереди
+    dp.update.outer_middleware(UpdateOrderingMiddleware())
+    dp.update.outer_middleware(InteractivePriorityMiddleware())
     dp.message.middleware(AuthMiddleware())
     dp.callback_query.middleware(AuthMiddleware())
     
@@ -25,15 +42,59 @@ def create_bot():
 
 
 async def start_bot():
-    """Запустить бота"""
+    """Запустить бота в режиме BOT_RUN_MODE"""
     bot, dp = create_bot()
     
-    # Запускаем планировщик задач
-    scheduler = SchedulerService(bot)
-    scheduler.start()
+    # Подписываемся на изменения пользователей для кэша авторизации
+    user_cache.start_listener()
     
-    print("🤖 Бот запущен и готов к работе!")
+    # Прогреваем реестр регионов и подписываемся на его изменения
+    await region_registry.load()
+    region_registry.start_listener()
     
-    # Запускаем polling
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
-
+    # Представление активных заказов в памяти для списков и карточек
+    order_store.start()
+    
+    # Карточки в региональных чатах обновляются после смены статуса
+    card_updater.start(bot)
+    
+    # Запускаем планировщик задач: задачи выполняет только ведущая копия
+    if SCHEDULER_ENABLED or BOT_RUN_MODE == 'scheduler':
+        scheduler = SchedulerService(bot)
+        scheduler.start(paused=True)
+        
+        def on_elected():
+            scheduler.resume()
+            # Задачи и эскалации по дедлайнам SLA
+            sla_engine.start(bot)
+        
+        def on_lost():
+            scheduler.pause()
+            sla_engine.stop()
+        
+        scheduler_leader.start(on_elected, on_lost)
+    
+    print(f"🤖 Бот запущен и готов к работе! Режим: {BOT_RUN_MODE}")
+    
+    try:
+        if BOT_RUN_MODE == 'webhook':
+            # Обновления принимает aiohttp-сервер
+            from src.webhook import run_webhook
+            await run_webhook(bot, dp)
+        elif BOT_RUN_MODE == 'scheduler':
+            # Только задачи по расписанию; обновления принимают webhook-копии
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, stop.set)
+            await stop.wait()
+        else:
+            # Запускаем polling (getUpdates не работает, пока установлен webhook)
+            await bot.delete_webhook()
+            # Каждое обновление - отдельная задача, порядок задает UpdateOrderingMiddleware
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_as_tasks=True)
+            # Смены статуса, начатые до остановки
+            await drain(timeout=10)
+    finally:
+        # Освобождаем аренду, чтобы задачи сразу подхватила другая копия
+        await scheduler_leader.stop()
@@ -13,6 +13,10 @@ if not TELEGRAM_BOT_TOKEN:
 FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID', 'studio-3898272712-a12a4')
 FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH', './firebase-credentials.json')
 
+# Хранилище данных: firestore (по умолчанию), memory (тесты, нагрузочные прогоны) или sqlite
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')
+SQLITE_PATH = os.getenv('SQLITE_PATH', './data/crm.sqlite3')
+
 # Роли пользователей
 ADMIN_USER_IDS = [int(uid) for uid in os.getenv('ADMIN_USER_IDS', '').split(',') if uid]
 LOGIST_USER_IDS = [int(uid) for uid in os.getenv('LOGIST_USER_IDS', '').split(',') if uid]
@@ -21,16 +25,58 @@ OPERATOR_USER_IDS = [int(uid) for uid in os.getenv('OPERATOR_USER_IDS', '').spli
 # Web App URL (React Mini App)
 WEB_APP_URL = os.getenv('WEB_APP_URL', 'https://your-mini-app-url.com')
 
-# Расписание задач (UTC)
+# Режим работы: polling (одна копия), webhook (aiohttp-сервер, можно несколько копий)
+# или scheduler (только планировщик, без приема обновлений)
+BOT_RUN_MODE = os.getenv('BOT_RUN_MODE', 'polling')
+if BOT_RUN_MODE not in ('polling', 'webhook', 'scheduler'):
+    raise ValueError(f'Неизвестный BOT_RUN_MODE: {BOT_RUN_MODE}. Допустимо: polling, webhook, scheduler')
+
+# Планировщик в этом процессе; при нескольких копиях задачи выполняет только
+# ведущая (аренда документа locks/scheduler)
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Срок аренды ведущей копии и период ее продления (секунды)
+LEADER_LEASE_TTL = int(os.getenv('LEADER_LEASE_TTL', '15'))
+LEADER_RENEW_INTERVAL = int(os.getenv('LEADER_RENEW_INTERVAL', '5'))
+
+# Webhook: публичный адрес сервиса (на Render задается автоматически) и секрет,
+# который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL') or os.getenv('RENDER_EXTERNAL_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEB_SERVER_HOST = os.getenv('WEB_SERVER_HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8080'))
+
+if BOT_RUN_MODE == 'webhook' and not (WEBHOOK_BASE_URL and WEBHOOK_SECRET):
+    raise ValueError('Для BOT_RUN_MODE=webhook нужны WEBHOOK_BASE_URL (или RENDER_EXTERNAL_URL) и WEBHOOK_SECRET')
+
+# Часовой пояс регионов без поля tz и задач, не привязанных к региону.
+# UTC - как до поясов по регионам: расписание регионов без tz не сдвигается
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'UTC')
+
+# Расписание задач по умолчанию (в часовом поясе региона; регион может
+# переопределить время полем schedule)
 SCHEDULE_MOVE_TO_TODAY = '07:30'  # Перекат завтра → сегодня
 SCHEDULE_MORNING_REPORT = '09:00'  # Утренний отчет
 SCHEDULE_DAY_REPORT = '20:00'      # Сводка дня
-SCHEDULE_SLA_CHECK = '*/10'        # Каждые 10 минут
+SCHEDULE_COUNTERS_RECONCILE = '03:00'  # Сверка дневных счетчиков (DEFAULT_TIMEZONE)
+
+# Сдвиг переката между регионами с одинаковым временем (секунды)
+SCHEDULE_STAGGER_SECONDS = int(os.getenv('SCHEDULE_STAGGER_SECONDS', '60'))
+
+# Хранилище задач планировщика и журнал запусков (SQLite)
+SCHEDULER_DB_PATH = os.getenv('SCHEDULER_DB_PATH', './data/scheduler.sqlite3')
+# Сколько секунд после плановой даты пропущенный запуск еще выполняется
+SCHEDULER_MISFIRE_GRACE = int(os.getenv('SCHEDULER_MISFIRE_GRACE', '3600'))
+# Предельная длительность задачи по умолчанию (секунды)
+SCHEDULER_JOB_TIMEOUT = int(os.getenv('SCHEDULER_JOB_TIMEOUT', '600'))
 
 # SLA таймеры (в минутах)
 SLA_NO_ANSWER_RETRY = 30  # Повторный звонок через 30 мин
 SLA_BAD_NUMBER_ESCALATION = 60  # Эскалация плохого номера через 60 мин
 
+# Шардов на счетчик заказов дня и региона (больше - меньше конфликтов записи)
+COUNTER_SHARDS = int(os.getenv('COUNTER_SHARDS', '4'))
+
 # Redis (опционально)
 REDIS_URL = os.getenv('REDIS_URL')
 
@@ -38,3 +84,46 @@ REDIS_URL = os.getenv('REDIS_URL')
 GOOGLE_SHEETS_CREDENTIALS_PATH = os.getenv('GOOGLE_SHEETS_CREDENTIALS_PATH')
 GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
 
+
+# Кэш пользователей для AuthMiddleware
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '5000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))  # секунды
+USER_CACHE_NEGATIVE_TTL = int(os.getenv('USER_CACHE_NEGATIVE_TTL', '60'))  # для неизвестных Telegram ID
+
+# Нормализация телефонов для поиска дубликатов
+PHONE_COUNTRY_CODE = os.getenv('PHONE_COUNTRY_CODE', '998')
+PHONE_LOCAL_LENGTH = int(os.getenv('PHONE_LOCAL_LENGTH', '9'))  # длина номера без кода страны
+
+# Очередь исходящих запросов к Telegram (лимиты Bot API)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))              # запросов в секунду на бота
+OUTBOUND_PRIVATE_CHAT_RATE = float(os.getenv('OUTBOUND_PRIVATE_CHAT_RATE', '1'))   # в секунду на личный чат
+OUTBOUND_GROUP_CHAT_RATE = float(os.getenv('OUTBOUND_GROUP_CHAT_RATE', '20'))      # в минуту на группу
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))                   # запас на короткие всплески
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))                 # повторов после 429
+
+# Рассылки (отчеты логистам и админам): сколько отправок идет одновременно
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '16'))
+
+# Сколько обновлений обрабатывается одновременно (разные чаты - параллельно)
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '32'))
+
+# Кнопки смены статуса: ответить на нажатие сразу, а статус менять в фоне
+CALLBACK_ACK_FIRST = os.getenv('CALLBACK_ACK_FIRST', 'true').lower() in ('1', 'true', 'yes')
+CALLBACK_TRANSITION_TIMEOUT = float(os.getenv('CALLBACK_TRANSITION_TIMEOUT', '10'))  # секунды
+
+# Карточки заказов в региональных чатах: правки объединяются
+CARD_EDIT_DEBOUNCE = float(os.getenv('CARD_EDIT_DEBOUNCE', '1.0'))    # секунд тишины перед правкой
+CARD_EDIT_MAX_DELAY = float(os.getenv('CARD_EDIT_MAX_DELAY', '3.0'))  # не позже, чем через столько секунд
+
+# Пропуск правок без изменений: хэши последнего содержимого сообщений
+EDIT_DEDUP_CACHE_SIZE = int(os.getenv('EDIT_DEDUP_CACHE_SIZE', '20000'))
+EDIT_DEDUP_TTL = int(os.getenv('EDIT_DEDUP_TTL', '172800'))  # секунды (сообщения можно править 48 часов)
+# Кэш хэшей - в памяти процесса: верен, только если сообщения бота правит один
+# процесс (polling). Копии webhook и воркер планировщика правят одни и те же
+# карточки, поэтому там по умолчанию полагаемся только на "message is not modified"
+EDIT_DEDUP_LOCAL_CACHE = os.getenv(
+    'EDIT_DEDUP_LOCAL_CACHE', 'true' if BOT_RUN_MODE == 'polling' else 'false'
+).lower() in ('1', 'true', 'yes')
+
+# Перекат очереди: сколько региональных чатов публикуются параллельно
+ROLLOVER_PUBLISH_CONCURRENCY = int(os.getenv('ROLLOVER_PUBLISH_CONCURRENCY', '8'))
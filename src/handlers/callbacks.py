@@ -1,23 +1,168 @@
 """Обработчики callback кнопок"""
+import asyncio
+from typing import Optional
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 from src.services.orders import OrderService
 from src.services.notifications import NotificationService
 from src.services.firebase import FirebaseService
+from src.services.cards import card_updater
 from src.utils.keyboards import (
     get_call_status_keyboard,
+    get_pagination_keyboard,
     get_return_type_keyboard,
     get_reschedule_keyboard,
     get_order_keyboard,
     get_order_action_keyboard
 )
-from src.utils.formatters import format_order_card
+from src.utils.formatters import format_order_card, format_order_list, ORDER_LIST_TITLES
+from src.utils.tasks import spawn
+from src.middleware.ordering import update_locks, orders_in_flight
+from src.config import CALLBACK_ACK_FIRST, CALLBACK_TRANSITION_TIMEOUT
 from datetime import datetime
 
 router = Router()
 
 
+async def _refresh_pressed_card(callback: CallbackQuery, order: dict, user_role: str):
+    """Обновить карточку, на которой нажата кнопка.
+    
+    Карточку в региональном чате обновляет card_updater после смены статуса,
+    здесь ее не трогаем, чтобы не редактировать дважды.
+    """
+    message = callback.message
+    if card_updater.is_card_message(order, message.chat.id, message.message_id):
+        return
+    
+    await message.edit_text(
+        format_order_card(order),
+        parse_mode='Markdown',
+        reply_markup=get_order_keyboard(order, user_role)
+    )
+
+
+async def _transition(
+    order_id: str,
+    new_status: str,
+    user_id: str,
+    user_role: str,
+    reason_code: Optional[str] = None,
+    note: Optional[str] = None
+) -> dict:
+    """Сменить статус с таймаутом.
+    
+    Ошибки не выбрасываются: при таймауте результат неизвестен ('timeout'),
+    при сбое хранилища или сети - ('failed'); в обоих случаях запись могла
+    пройти, и карточку нужно перерисовать по актуальному состоянию.
+    """
+    try:
+        return await asyncio.wait_for(
+            OrderService.update_order_status(
+                order_id=order_id,
+                new_status=new_status,
+                user_id=user_id,
+                user_role=user_role,
+                reason_code=reason_code,
+                note=note
+            ),
+            timeout=CALLBACK_TRANSITION_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        print(f"⚠️ Смена статуса {order_id} → {new_status} не завершилась за {CALLBACK_TRANSITION_TIMEOUT} с")
+        return {'success': False, 'error': 'timeout'}
+    except Exception as e:
+        print(f"❌ Ошибка смены статуса {order_id} → {new_status}: {e!r}")
+        return {'success': False, 'error': 'failed'}
+
+
+async def _show_result(callback: CallbackQuery, order_id: str, result: dict, user_role: str) -> None:
+    """Показать итог смены статуса на карточке.
+    
+    При таймауте или сбое запись могла пройти или нет - карточка
+    перерисовывается по актуальному состоянию заказа.
+    """
+    try:
+        if result.get('success'):
+            order = result.get('order')
+        elif result.get('error') in ('timeout', 'failed'):
+            order = await FirebaseService.get_order(order_id)
+        else:
+            order = None
+        
+        if order:
+            await _refresh_pressed_card(callback, order, user_role)
+    except Exception as e:
+        print(f"Error refreshing order card {order_id}: {e}")
+
+
+async def _run_transition(
+    callback: CallbackQuery,
+    order_id: str,
+    new_status: str,
+    user_id: str,
+    user_role: str,
+    done_text: str,
+    reason_code: Optional[str] = None,
+    note: Optional[str] = None,
+    error_text: str = "❌ Ошибка"
+) -> None:
+    """Обработать кнопку смены статуса.
+    
+    В режиме CALLBACK_ACK_FIRST нажатие подтверждается сразу, смена статуса
+    выполняется фоновой задачей, а итог видно на карточке (ошибка - ответом
+    на карточку). Иначе ответ на нажатие отправляется после записи.
+    """
+    # Заказ в обработке до конца записи: повторные нажатия не создают второй
+    # записи (их сразу подтверждает UpdateOrderingMiddleware)
+    if order_id in orders_in_flight:
+        await callback.answer("⏳ Заказ уже обрабатывается")
+        return
+    orders_in_flight.add(order_id)
+    
+    if not CALLBACK_ACK_FIRST:
+        try:
+            result = await _transition(order_id, new_status, user_id, user_role, reason_code, note)
+        finally:
+            orders_in_flight.discard(order_id)
+        if result.get('success'):
+            await callback.answer(done_text)
+        elif result.get('error') == 'timeout':
+            await callback.answer("⚠️ Нет ответа от базы, проверьте карточку", show_alert=True)
+        elif result.get('error') == 'failed':
+            await callback.answer("⚠️ Не удалось сменить статус, проверьте карточку", show_alert=True)
+        else:
+            await callback.answer(error_text, show_alert=True)
+        await _show_result(callback, order_id, result, user_role)
+        return
+    
+    try:
+        await callback.answer("⏳ Обрабатываем...")
+    except Exception:
+        orders_in_flight.discard(order_id)
+        raise
+    
+    async def run() -> None:
+        # Фоновые смены статуса одного заказа тоже идут по очереди
+        try:
+            async with update_locks.acquire(('order', order_id)):
+                result = await _transition(order_id, new_status, user_id, user_role, reason_code, note)
+                await _show_result(callback, order_id, result, user_role)
+        finally:
+            orders_in_flight.discard(order_id)
+        if result.get('success'):
+            return
+        # Ответ на карточку, чтобы было видно, к какому заказу относится ошибка
+        if result.get('error') == 'timeout':
+            await callback.message.reply("⚠️ Не удалось подтвердить смену статуса, проверьте карточку заказа")
+        elif result.get('error') == 'failed':
+            await callback.message.reply("⚠️ Не удалось сменить статус, проверьте карточку заказа и повторите")
+        else:
+            await callback.message.reply(f"{error_text}: {result.get('error')}")
+    
+    spawn(run(), name=f'transition:{order_id}')
+
+
 @router.callback_query(F.data.startswith("order:take:"))
 async def callback_take_order(callback: CallbackQuery, db_user: dict = None, user_role: str = None):
     """Взять заказ"""
@@ -28,27 +173,15 @@ async def callback_take_order(callback: CallbackQuery, db_user: dict = None, use
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id')
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='ASSIGNED',
-        user_id=user_id,
-        user_role=user_role
+    await _run_transition(
+        callback,
+        order_id,
+        'ASSIGNED',
+        user_id,
+        user_role,
+        "✅ Заказ взят в работу",
+        error_text="❌ Ошибка при взятии заказа"
     )
-    
-    if result.get('success'):
-        await callback.answer("✅ Заказ взят в работу")
-        
-        # Обновляем карточку в чате
-        order = result.get('order')
-        if order:
-            # TODO: Обновить сообщение в региональном чате
-            await callback.message.edit_text(
-                format_order_card(order),
-                parse_mode='Markdown',
-                reply_markup=get_order_keyboard(order, user_role)
-            )
-    else:
-        await callback.answer("❌ Ошибка при взятии заказа", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call_menu:"))
@@ -68,25 +201,15 @@ async def callback_call_confirmed(callback: CallbackQuery, db_user: dict = None,
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='CONFIRMED',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'CONFIRMED',
+        user_id,
+        user_role or 'courier',
+        "✅ Заказ подтвержден",
         note='Клиент подтвердил заказ'
     )
-    
-    if result.get('success'):
-        await callback.answer("✅ Заказ подтвержден")
-        order = result.get('order')
-        if order:
-            await callback.message.edit_text(
-                format_order_card(order),
-                parse_mode='Markdown',
-                reply_markup=get_order_keyboard(order, user_role or 'courier')
-            )
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call:no_answer:"))
@@ -95,20 +218,17 @@ async def callback_call_no_answer(callback: CallbackQuery, db_user: dict = None,
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='NO_ANSWER',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    # Дедлайн SLA (повторный звонок) пишется вместе со статусом
+    await _run_transition(
+        callback,
+        order_id,
+        'NO_ANSWER',
+        user_id,
+        user_role or 'courier',
+        "📞 Статус: нет ответа",
         reason_code='NO_ANSWER',
         note='Клиент не отвечает на звонок'
     )
-    
-    if result.get('success'):
-        await callback.answer("📞 Статус: нет ответа")
-        # TODO: Создать задачу оператору на повторный звонок через SLA
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call:bad_number:"))
@@ -117,20 +237,17 @@ async def callback_call_bad_number(callback: CallbackQuery, db_user: dict = None
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='BAD_NUMBER',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    # Дедлайн SLA (эскалация логистам) пишется вместе со статусом
+    await _run_transition(
+        callback,
+        order_id,
+        'BAD_NUMBER',
+        user_id,
+        user_role or 'courier',
+        "❌ Статус: неверный номер",
         reason_code='BAD_NUMBER',
         note='Неверный номер телефона'
     )
-    
-    if result.get('success'):
-        await callback.answer("❌ Статус: неверный номер")
-        # TODO: Создать задачу оператору на проверку номера
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call:fake:"))
@@ -139,19 +256,16 @@ async def callback_call_fake(callback: CallbackQuery, db_user: dict = None, user
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='FAKE',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'FAKE',
+        user_id,
+        user_role or 'courier',
+        "⚠️ Статус: фейк",
         reason_code='FAKE',
         note='Фейковый заказ'
     )
-    
-    if result.get('success'):
-        await callback.answer("⚠️ Статус: фейк")
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call:declined:"))
@@ -160,19 +274,16 @@ async def callback_call_declined(callback: CallbackQuery, db_user: dict = None,
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='DECLINED',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'DECLINED',
+        user_id,
+        user_role or 'courier',
+        "🚫 Статус: отказ",
         reason_code='DECLINED',
         note='Клиент отказался от заказа'
     )
-    
-    if result.get('success'):
-        await callback.answer("🚫 Статус: отказ")
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:call:reschedule:"))
@@ -194,20 +305,17 @@ async def callback_reschedule(callback: CallbackQuery, db_user: dict = None, use
     new_date = parts[3]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='RESCHEDULED',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    # TODO: Обновить deliveryDate в заказе
+    await _run_transition(
+        callback,
+        order_id,
+        'RESCHEDULED',
+        user_id,
+        user_role or 'courier',
+        f"🔄 Заказ перенесен на {new_date}",
         reason_code='RESCHEDULED',
         note=f'Заказ перенесен на {new_date}'
     )
-    
-    if result.get('success'):
-        # TODO: Обновить deliveryDate в заказе
-        await callback.answer(f"🔄 Заказ перенесен на {new_date}")
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:on_the_way:"))
@@ -216,25 +324,15 @@ async def callback_on_the_way(callback: CallbackQuery, db_user: dict = None, use
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='ON_THE_WAY',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'ON_THE_WAY',
+        user_id,
+        user_role or 'courier',
+        "🚗 Статус: в пути",
         note='Курьер в пути к клиенту'
     )
-    
-    if result.get('success'):
-        await callback.answer("🚗 Статус: в пути")
-        order = result.get('order')
-        if order:
-            await callback.message.edit_text(
-                format_order_card(order),
-                parse_mode='Markdown',
-                reply_markup=get_order_keyboard(order, user_role or 'courier')
-            )
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:delivered:"))
@@ -243,25 +341,15 @@ async def callback_delivered(callback: CallbackQuery, db_user: dict = None, user
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='DELIVERED',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'DELIVERED',
+        user_id,
+        user_role or 'courier',
+        "📦 Заказ доставлен!",
         note='Заказ доставлен'
     )
-    
-    if result.get('success'):
-        await callback.answer("📦 Заказ доставлен!")
-        order = result.get('order')
-        if order:
-            await callback.message.edit_text(
-                format_order_card(order),
-                parse_mode='Markdown',
-                reply_markup=get_order_keyboard(order, user_role or 'courier')
-            )
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:return_menu:"))
@@ -281,19 +369,16 @@ async def callback_return_partial(callback: CallbackQuery, db_user: dict = None,
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='PARTIAL_RETURN',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'PARTIAL_RETURN',
+        user_id,
+        user_role or 'courier',
+        "🔄 Частичный возврат",
         reason_code='PARTIAL_RETURN',
         note='Частичный возврат товара'
     )
-    
-    if result.get('success'):
-        await callback.answer("🔄 Частичный возврат")
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:return:full:"))
@@ -302,19 +387,16 @@ async def callback_return_full(callback: CallbackQuery, db_user: dict = None, us
     order_id = callback.data.split(":")[-1]
     user_id = db_user.get('id') if db_user else 'system'
     
-    result = await OrderService.update_order_status(
-        order_id=order_id,
-        new_status='FULL_RETURN',
-        user_id=user_id,
-        user_role=user_role or 'courier',
+    await _run_transition(
+        callback,
+        order_id,
+        'FULL_RETURN',
+        user_id,
+        user_role or 'courier',
+        "🔄 Полный возврат",
         reason_code='FULL_RETURN',
         note='Полный возврат товара'
     )
-    
-    if result.get('success'):
-        await callback.answer("🔄 Полный возврат")
-    else:
-        await callback.answer("❌ Ошибка", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("order:comment:"))
@@ -334,7 +416,7 @@ async def callback_order_details(callback: CallbackQuery):
     """Детали заказа"""
     order_id = callback.data.split(":")[-1]
     
-    order = FirebaseService.get_order(order_id)
+    order = await FirebaseService.get_order(order_id)
     if not order:
         await callback.answer("❌ Заказ не найден", show_alert=True)
         return
@@ -342,8 +424,8 @@ async def callback_order_details(callback: CallbackQuery):
     # Показываем полную информацию
     details = format_order_card(order, show_buttons=False)
     
-    # Добавляем историю
-    history = order.get('history', [])
+    # Добавляем историю (подколлекция events; массив history - у неперенесенных заказов)
+    history = await FirebaseService.get_order_events(order_id, limit=5) or order.get('history', [])
     if history:
         details += "\n\n*История изменений:*\n"
         for event in history[-5:]:  # Последние 5 событий
@@ -363,36 +445,27 @@ async def callback_menu(callback: CallbackQuery, db_user: dict = None, user_role
     menu_action = callback.data.split(":")[-1]
     user_id = db_user.get('id')
     
-    if menu_action == "my_orders":
-        orders = await OrderService.get_orders_for_user(user_id, user_role, 'all')
-        from src.utils.formatters import format_order_list
-        text = format_order_list(orders[:10], "Мои заказы")
-        await callback.message.answer(text, parse_mode='Markdown')
-        await callback.answer()
-    
-    elif menu_action == "today":
-        orders = await OrderService.get_orders_for_user(user_id, user_role, 'today')
-        from src.utils.formatters import format_order_list
-        text = format_order_list(orders[:10], "Заказы на сегодня")
-        await callback.message.answer(text, parse_mode='Markdown')
-        await callback.answer()
+    # Пункты меню со списками заказов -> тип фильтра
+    list_filters = {
+        'my_orders': 'all',
+        'today': 'today',
+        'tomorrow': 'tomorrow',
+        'action': 'action',
+    }
     
-    elif menu_action == "tomorrow":
-        orders = await OrderService.get_orders_for_user(user_id, user_role, 'tomorrow')
-        from src.utils.formatters import format_order_list
-        text = format_order_list(orders[:10], "Заказы на завтра")
-        await callback.message.answer(text, parse_mode='Markdown')
-        await callback.answer()
-    
-    elif menu_action == "action":
-        if user_role not in ['operator', 'logist', 'admin']:
+    if menu_action in list_filters:
+        if menu_action == "action" and user_role not in ['operator', 'logist', 'admin']:
             await callback.answer("❌ У вас нет прав", show_alert=True)
             return
         
-        orders = await OrderService.get_orders_for_user(user_id, user_role, 'action')
-        from src.utils.formatters import format_order_list
-        text = format_order_list(orders[:10], "Требуют действия")
-        await callback.message.answer(text, parse_mode='Markdown')
+        filter_type = list_filters[menu_action]
+        page = await OrderService.get_orders_page(user_id, user_role, filter_type)
+        text = format_order_list(page['orders'], ORDER_LIST_TITLES[filter_type])
+        await callback.message.answer(
+            text,
+            parse_mode='Markdown',
+            reply_markup=get_pagination_keyboard(filter_type, page['prev_cursor'], page['next_cursor'])
+        )
         await callback.answer()
     
     elif menu_action == "reports":
@@ -403,3 +476,40 @@ async def callback_menu(callback: CallbackQuery, db_user: dict = None, user_role
         await callback.message.answer("📊 Отчеты доступны по команде /report")
         await callback.answer()
 
+
+@router.callback_query(F.data.startswith("page:"))
+async def callback_page(callback: CallbackQuery, db_user: dict = None, user_role: str = None):
+    """Листание списка заказов"""
+    if not db_user:
+        await callback.answer("❌ Вы не авторизованы", show_alert=True)
+        return
+    
+    # page:<filter>:<next|prev>:<cursor>
+    _, filter_type, direction, cursor = callback.data.split(":", 3)
+    if filter_type not in ORDER_LIST_TITLES:
+        await callback.answer()
+        return
+    
+    if filter_type == "action" and user_role not in ['operator', 'logist', 'admin']:
+        await callback.answer("❌ У вас нет прав", show_alert=True)
+        return
+    
+    page = await OrderService.get_orders_page(
+        db_user.get('id'),
+        user_role,
+        filter_type,
+        start_after=cursor if direction == 'next' else None,
+        end_before=cursor if direction == 'prev' else None
+    )
+    
+    if not page['orders']:
+        await callback.answer("Больше заказов нет")
+        return
+    
+    text = format_order_list(page['orders'], ORDER_LIST_TITLES[filter_type])
+    await callback.message.edit_text(
+        text,
+        parse_mode='Markdown',
+        reply_markup=get_pagination_keyboard(filter_type, page['prev_cursor'], page['next_cursor'])
+    )
+    await callback.answer()
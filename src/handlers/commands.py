@@ -3,10 +3,10 @@ from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from src.services.firebase import FirebaseService
 from src.services.orders import OrderService
-from src.utils.keyboards import get_main_menu_keyboard
-from src.utils.formatters import format_order_list
+from src.services.reports import ReportService
+from src.utils.keyboards import get_main_menu_keyboard, get_pagination_keyboard
+from src.utils.formatters import format_order_list, ORDER_LIST_TITLES
 from datetime import datetime
 
 router = Router()
@@ -85,14 +85,19 @@ async def cmd_orders(message: Message, db_user: dict = None, user_role: str = No
         return
     
     user_id = db_user.get('id')
-    orders = await OrderService.get_orders_for_user(user_id, user_role, 'all')
+    page = await OrderService.get_orders_page(user_id, user_role, 'all')
+    orders = page['orders']
     
     if not orders:
         await message.answer("📋 У вас нет заказов")
         return
     
-    text = format_order_list(orders[:10], "Мои заказы")
-    await message.answer(text, parse_mode='Markdown')
+    text = format_order_list(orders, ORDER_LIST_TITLES['all'])
+    await message.answer(
+        text,
+        parse_mode='Markdown',
+        reply_markup=get_pagination_keyboard('all', page['prev_cursor'], page['next_cursor'])
+    )
 
 
 @router.message(Command("today"))
@@ -103,14 +108,19 @@ async def cmd_today(message: Message, db_user: dict = None, user_role: str = Non
         return
     
     user_id = db_user.get('id')
-    orders = await OrderService.get_orders_for_user(user_id, user_role, 'today')
+    page = await OrderService.get_orders_page(user_id, user_role, 'today')
+    orders = page['orders']
     
     if not orders:
         await message.answer("📅 Нет заказов на сегодня")
         return
     
-    text = format_order_list(orders[:10], "Заказы на сегодня")
-    await message.answer(text, parse_mode='Markdown')
+    text = format_order_list(orders, ORDER_LIST_TITLES['today'])
+    await message.answer(
+        text,
+        parse_mode='Markdown',
+        reply_markup=get_pagination_keyboard('today', page['prev_cursor'], page['next_cursor'])
+    )
 
 
 @router.message(Command("tomorrow"))
@@ -121,14 +131,19 @@ async def cmd_tomorrow(message: Message, db_user: dict = None, user_role: str =
         return
     
     user_id = db_user.get('id')
-    orders = await OrderService.get_orders_for_user(user_id, user_role, 'tomorrow')
+    page = await OrderService.get_orders_page(user_id, user_role, 'tomorrow')
+    orders = page['orders']
     
     if not orders:
         await message.answer("📆 Нет заказов на завтра")
         return
     
-    text = format_order_list(orders[:10], "Заказы на завтра")
-    await message.answer(text, parse_mode='Markdown')
+    text = format_order_list(orders, ORDER_LIST_TITLES['tomorrow'])
+    await message.answer(
+        text,
+        parse_mode='Markdown',
+        reply_markup=get_pagination_keyboard('tomorrow', page['prev_cursor'], page['next_cursor'])
+    )
 
 
 @router.message(Command("action"))
@@ -143,14 +158,19 @@ async def cmd_action(message: Message, db_user: dict = None, user_role: str = No
         return
     
     user_id = db_user.get('id')
-    orders = await OrderService.get_orders_for_user(user_id, user_role, 'action')
+    page = await OrderService.get_orders_page(user_id, user_role, 'action')
+    orders = page['orders']
     
     if not orders:
         await message.answer("✅ Нет заказов, требующих действия")
         return
     
-    text = format_order_list(orders[:10], "Требуют действия")
-    await message.answer(text, parse_mode='Markdown')
+    text = format_order_list(orders, ORDER_LIST_TITLES['action'])
+    await message.answer(
+        text,
+        parse_mode='Markdown',
+        reply_markup=get_pagination_keyboard('action', page['prev_cursor'], page['next_cursor'])
+    )
 
 
 @router.message(Command("report"))
@@ -165,18 +185,16 @@ async def cmd_report(message: Message, db_user: dict = None, user_role: str = No
         return
     
     from src.utils.formatters import format_report
-    from datetime import datetime
+    from src.services.regions import region_registry
+    from src.utils.timezones import local_date
     
-    today = datetime.now().strftime('%Y-%m-%d')
-    orders = FirebaseService.get_orders_by_date(today)
+    # "Сегодня" - в часовом поясе региона пользователя
+    today = local_date(region_registry.timezone_of(db_user.get('regionId')))
     
-    # Подсчитываем по статусам
-    statuses = {}
-    for order in orders:
-        status = order.get('status', 'NEW')
-        statuses[status] = statuses.get(status, 0) + 1
+    # Статистика по статусам из дневных счетчиков, заказы не читаются
+    stats = await ReportService.get_day_stats(today)
     
-    report_text = format_report(statuses, today)
+    report_text = format_report(stats['byStatus'], today)
     await message.answer(report_text, parse_mode='Markdown')
 
 
@@ -4,7 +4,6 @@ from aiogram.types import Message, WebAppData
 import json
 from src.services.orders import OrderService
 from src.services.notifications import NotificationService
-from src.services.firebase import FirebaseService
 from src.utils.formatters import format_order_card
 from src.utils.keyboards import get_order_keyboard
 from datetime import datetime
@@ -57,7 +56,6 @@ async def handle_webapp_data(message: Message, db_user: dict = None, user_role:
             return
         
         order = result.get('order')
-        order_id = result.get('order_id')
         
         # Отправляем подтверждение оператору
         card_text = format_order_card(order, show_buttons=False)
@@ -73,19 +71,6 @@ async def handle_webapp_data(message: Message, db_user: dict = None, user_role:
             await notification_service.send_order_to_region_chat(order)
         except Exception as e:
             print(f"Error sending order to region chat: {e}")
-        
-        # Проверяем на дубликаты (предупреждение)
-        duplicate = FirebaseService.check_duplicate_order(
-            data.get('customer', {}).get('phone'),
-            data.get('deliveryDate', '')
-        )
-        
-        if duplicate and duplicate.get('id') != order_id:
-            await message.answer(
-                "⚠️ *Внимание:* Найден похожий заказ на этот номер и дату.\n"
-                "Проверьте, не является ли это дубликатом.",
-                parse_mode='Markdown'
-            )
     
     except json.JSONDecodeError:
         await message.answer("❌ Ошибка: неверный формат данных")
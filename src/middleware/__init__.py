@@ -1,5 +1,7 @@
 """Middleware"""
 from .auth import AuthMiddleware
+from .outbound import OutboundRequestMiddleware, InteractivePriorityMiddleware
+from .edit_dedup import EditDedupMiddleware
+from .ordering import UpdateOrderingMiddleware
 
-__all__ = ['AuthMiddleware']
-
+__all__ = ['AuthMiddleware', 'OutboundRequestMiddleware', 'InteractivePriorityMiddleware', 'EditDedupMiddleware', 'UpdateOrderingMiddleware']
@@ -2,7 +2,7 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, User
-from src.services.firebase import FirebaseService
+from src.services.users import user_cache
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -19,8 +19,8 @@ class AuthMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
         
-        # Проверяем пользователя в базе
-        db_user = FirebaseService.get_user_by_telegram_id(user.id)
+        # Проверяем пользователя (кэш с подпиской на изменения в Firestore)
+        db_user = await user_cache.get_by_telegram_id(user.id)
         
         if not db_user:
             # Пользователь не найден - можно создать или отклонить
@@ -0,0 +1,101 @@
+"""Middleware для пропуска правок сообщений, которые ничего не меняют"""
+import hashlib
+from typing import Any, Dict, Optional
+from aiogram import Bot
+from aiogram.client.default import Default
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import TelegramMethod, SendMessage, EditMessageText, EditMessageReplyMarkup
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import Message
+from src.config import EDIT_DEDUP_CACHE_SIZE, EDIT_DEDUP_TTL, EDIT_DEDUP_LOCAL_CACHE
+from src.utils.cache import TTLCache, MISSING
+
+
+def _digest(*parts: Any) -> str:
+    data = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _markup_digest(markup: Any) -> str:
+    return _digest(markup.model_dump_json(exclude_none=True) if markup is not None else None)
+
+
+def _parse_mode(method: TelegramMethod) -> Optional[str]:
+    parse_mode = getattr(method, 'parse_mode', None)
+    return None if isinstance(parse_mode, Default) else parse_mode
+
+
+class EditDedupMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: не отправляет правки без изменений.
+    
+    Для каждого сообщения (чат, message_id) запоминается хэш последнего
+    отправленного текста (с parse_mode) и клавиатуры. editMessageText и
+    editMessageReplyMarkup с тем же содержимым не отправляются; ответ
+    "message is not modified" тоже считается успехом. Хэши хранятся в
+    памяти процесса (EDIT_DEDUP_CACHE_SIZE сообщений, EDIT_DEDUP_TTL секунд).
+    
+    Кэш предполагает, что сообщения правит только этот процесс: если
+    карточку изменила другая копия, правка обратно к закэшированному
+    содержимому была бы пропущена. Поэтому при нескольких процессах
+    (webhook, планировщик - EDIT_DEDUP_LOCAL_CACHE=false) кэш не ведется,
+    и остается только обработка "message is not modified".
+    """
+    
+    def __init__(self, local_cache: bool = EDIT_DEDUP_LOCAL_CACHE):
+        self._rendered = TTLCache(EDIT_DEDUP_CACHE_SIZE, EDIT_DEDUP_TTL) if local_cache else None
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        if self._rendered is None:
+            return await self._send_edit(make_request, bot, method)
+        
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.chat_id and method.message_id:
+            key = (str(method.chat_id), method.message_id)
+            rendered = self._rendered.get(key)
+            new = self._render(method, None if rendered is MISSING else rendered)
+            if rendered == new:
+                return True
+            
+            result = await self._send_edit(make_request, bot, method)
+            self._rendered.set(key, new)
+            return result
+        
+        result = await make_request(bot, method)
+        if isinstance(method, SendMessage) and isinstance(result, Message):
+            self._rendered.set((str(result.chat.id), result.message_id), self._render(method, None))
+        return result
+    
+    @staticmethod
+    async def _send_edit(
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        """Отправить запрос; "message is not modified" у правки - успех"""
+        try:
+            return await make_request(bot, method)
+        except TelegramBadRequest as e:
+            is_edit = isinstance(method, (EditMessageText, EditMessageReplyMarkup))
+            if not is_edit or 'message is not modified' not in e.message:
+                raise
+            return True
+    
+    @staticmethod
+    def _render(method: TelegramMethod, previous: Optional[Dict[str, str]]) -> Dict[str, Optional[str]]:
+        """Хэши содержимого сообщения после запроса"""
+        if isinstance(method, EditMessageReplyMarkup):
+            # Текст не меняется: берем известный (или неизвестный - None)
+            return {
+                'text': previous.get('text') if previous else None,
+                'markup': _markup_digest(method.reply_markup),
+            }
+        # sendMessage/editMessageText: без reply_markup клавиатура убирается
+        return {
+            'text': _digest(method.text, _parse_mode(method)),
+            'markup': _markup_digest(method.reply_markup),
+        }
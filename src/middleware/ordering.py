@@ -0,0 +1,65 @@
+"""Middleware для параллельной обработки обновлений с порядком внутри чата"""
+import asyncio
+from typing import Callable, Dict, Any, Awaitable, Hashable, List, Set
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, Chat, User
+from src.config import UPDATE_WORKERS
+from src.utils.keyboards import order_id_from_callback
+from src.utils.locks import KeyedLock
+
+# Блокировки по чатам и заказам: общие с фоновыми сменами статуса
+update_locks = KeyedLock()
+
+# Заказы, статус которых сейчас меняется (от нажатия до конца фоновой записи)
+orders_in_flight: Set[str] = set()
+
+
+def ordering_keys(event: Update, data: Dict[str, Any]) -> List[Hashable]:
+    """Ключи, внутри которых обновления обрабатываются строго по очереди.
+    
+    Кнопки заказа упорядочиваются по заказу и нажавшему, а не по чату:
+    курьеры одной региональной группы обслуживаются параллельно.
+    """
+    chat: Chat = data.get('event_chat')
+    user: User = data.get('event_from_user')
+    
+    if event.callback_query:
+        order_id = order_id_from_callback(event.callback_query.data)
+        if order_id:
+            return [('order', order_id), ('user', user.id if user else None)]
+    
+    if chat:
+        return [('chat', chat.id)]
+    if user:
+        return [('user', user.id)]
+    return []
+
+
+class UpdateOrderingMiddleware(BaseMiddleware):
+    """Outer-middleware обновлений: разные чаты обрабатываются параллельно
+    (не более UPDATE_WORKERS одновременно), а обновления одного чата и
+    кнопки одного заказа - по очереди, в порядке поступления.
+    
+    Повторное нажатие на кнопку заказа, статус которого еще меняется,
+    подтверждается сразу, не вставая в очередь заказа: иначе оно ждало бы
+    конца фоновой записи и затем записало бы переход второй раз.
+    """
+    
+    def __init__(self, workers: int = UPDATE_WORKERS):
+        self._workers = asyncio.Semaphore(workers)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = event.callback_query
+        if callback and order_id_from_callback(callback.data) in orders_in_flight:
+            await callback.answer("⏳ Заказ уже обрабатывается")
+            return None
+        
+        # Сначала очередь ключа, потом воркер: ожидание своей очереди не занимает воркер
+        async with update_locks.acquire(*ordering_keys(event, data)):
+            async with self._workers:
+                return await handler(event, data)
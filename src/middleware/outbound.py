@@ -0,0 +1,41 @@
+"""Middleware для отправки запросов к Telegram через очередь исходящих"""
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+from src.services.outbound import outbound_queue, outbound_priority, PRIORITY_INTERACTIVE
+
+
+class OutboundRequestMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: запросы в чаты идут через outbound_queue.
+
+    Запросы без chat_id (answerCallbackQuery, getUpdates, setWebhook)
+    выполняются сразу: на них не действуют лимиты чатов.
+    """
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        
+        return await outbound_queue.submit(chat_id, lambda: make_request(bot, method))
+
+
+class InteractivePriorityMiddleware(BaseMiddleware):
+    """Ответы при обработке обновлений идут с приоритетом interactive"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with outbound_priority(PRIORITY_INTERACTIVE):
+            return await handler(event, data)
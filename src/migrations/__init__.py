@@ -0,0 +1 @@
+"""Миграции данных Firestore"""
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Пересчет дневных счетчиков заказов daily_counters по заказам
+
+Запуск из корня проекта (даты включительно, по умолчанию - последние
+30 дней и 7 дней вперед):
+    python -m src.migrations.daily_counters [С YYYY-MM-DD] [ПО YYYY-MM-DD]
+"""
+import asyncio
+import sys
+from datetime import date, timedelta
+
+from src.services.firebase import FirebaseService
+
+
+async def main(start: date, end: date):
+    """Пересчитать счетчики за каждый день диапазона"""
+    print(f"🔄 Пересчет дневных счетчиков с {start} по {end}...")
+    day = start
+    while day <= end:
+        regions = await FirebaseService.rebuild_daily_counters(day.isoformat())
+        if regions:
+            print(f"✅ {day}: исправлено регионов {regions}")
+        day += timedelta(days=1)
+    print("✅ Пересчет завершен")
+
+
+if __name__ == '__main__':
+    today = date.today()
+    start = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else today - timedelta(days=30)
+    end = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else today + timedelta(days=7)
+    asyncio.run(main(start, end))
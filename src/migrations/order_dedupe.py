@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Ключи дедупликации order_dedupe для заказов, созданных до их появления
+
+Запуск из корня проекта (по умолчанию - заказы с датой доставки от вчера;
+более ранние даты для дедупликации новых заказов не нужны):
+    python -m src.migrations.order_dedupe [С YYYY-MM-DD]
+"""
+import asyncio
+import sys
+from datetime import date, timedelta
+
+from src.services.firebase import FirebaseService
+
+
+async def main(since: str):
+    """Создать ключи для заказов с датой доставки от since"""
+    print(f"🔄 Ключи дедупликации для заказов с {since}...")
+    created, duplicates = await FirebaseService.backfill_dedupe_keys(since)
+    print(f"✅ Создано ключей: {created}, найдено дубликатов: {duplicates}")
+
+
+if __name__ == '__main__':
+    since = sys.argv[1] if len(sys.argv) > 1 else (date.today() - timedelta(days=1)).isoformat()
+    asyncio.run(main(since))
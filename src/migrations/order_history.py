@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Перенос массива history заказов в подколлекцию orders/{id}/events
+
+Запуск из корня проекта:
+    python -m src.migrations.order_history
+"""
+import asyncio
+
+from src.services.firebase import FirebaseService
+
+
+async def main():
+    """Перенести историю всех заказов"""
+    print("🔄 Перенос истории заказов в подколлекцию events...")
+    migrated = await FirebaseService.migrate_order_history()
+    print(f"✅ Перенесено заказов: {migrated}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
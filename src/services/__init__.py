@@ -3,6 +3,12 @@ from .firebase import FirebaseService
 from .orders import OrderService
 from .notifications import NotificationService
 from .scheduler import SchedulerService
+from .users import UserCache, user_cache
+from .regions import RegionRegistry, region_registry
+from .reports import ReportService
+from .order_store import OrderStore, order_store
+from .cards import OrderCardUpdater, card_updater
+from .sla import SlaEngine, sla_engine
 
-__all__ = ['FirebaseService', 'OrderService', 'NotificationService', 'SchedulerService']
+__all__ = ['FirebaseService', 'OrderService', 'NotificationService', 'SchedulerService', 'UserCache', 'user_cache', 'RegionRegistry', 'region_registry', 'ReportService', 'OrderStore', 'order_store', 'OrderCardUpdater', 'card_updater', 'SlaEngine', 'sla_engine']
 
@@ -0,0 +1,83 @@
+"""Обновление карточек заказов в региональных чатах"""
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot
+
+from src.config import CARD_EDIT_DEBOUNCE, CARD_EDIT_MAX_DELAY
+from src.services.notifications import NotificationService
+
+
+class OrderCardUpdater:
+    """Редактирует карточку заказа в региональном чате после смены статуса.
+
+    Где лежит карточка, хранится в поле заказа ``regionCard``
+    (chatId, messageId, threadId), которое записывается при публикации.
+    Правки одной карточки объединяются: после смены статуса карточка
+    редактируется через CARD_EDIT_DEBOUNCE секунд тишины (но не позже
+    CARD_EDIT_MAX_DELAY после первой смены) по последнему состоянию
+    заказа, поэтому серия переходов дает одну правку.
+    """
+
+    def __init__(self):
+        self._bot: Optional[Bot] = None
+        # ID заказа -> последнее состояние, ожидающее правки
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # ID заказа -> (время первой смены, срок правки)
+        self._due: Dict[str, Tuple[float, float]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, bot: Bot) -> None:
+        """Привязать бота, через которого редактируются карточки"""
+        self._bot = bot
+
+    @staticmethod
+    def card_of(order: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Карточка заказа в региональном чате или None"""
+        card = order.get('regionCard')
+        if card and card.get('chatId') and card.get('messageId'):
+            return card
+        return None
+
+    @staticmethod
+    def is_card_message(order: Dict[str, Any], chat_id: Any, message_id: int) -> bool:
+        """Является ли сообщение карточкой заказа в региональном чате"""
+        card = OrderCardUpdater.card_of(order)
+        return bool(card) and str(card['chatId']) == str(chat_id) and card['messageId'] == message_id
+
+    def schedule(self, order: Dict[str, Any]) -> None:
+        """Запланировать правку карточки по новому состоянию заказа"""
+        if self._bot is None or not self.card_of(order):
+            return
+
+        order_id = order['id']
+        now = time.monotonic()
+        first = self._due[order_id][0] if order_id in self._due else now
+        self._pending[order_id] = order
+        self._due[order_id] = (first, min(now + CARD_EDIT_DEBOUNCE, first + CARD_EDIT_MAX_DELAY))
+
+        if order_id not in self._tasks:
+            self._tasks[order_id] = asyncio.create_task(self._flush_later(order_id))
+
+    async def _flush_later(self, order_id: str) -> None:
+        try:
+            while True:
+                delay = self._due[order_id][1] - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            order = self._pending.pop(order_id, None)
+            self._due.pop(order_id, None)
+            self._tasks.pop(order_id, None)
+
+        if order:
+            await self._edit(order)
+
+    async def _edit(self, order: Dict[str, Any]) -> None:
+        card = self.card_of(order)
+        await NotificationService(self._bot).update_order_card_in_chat(order, card['messageId'], card['chatId'])
+
+
+card_updater = OrderCardUpdater()
@@ -1,164 +1,229 @@
-"""Сервис для работы с Firebase Firestore"""
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Optional, Dict, Any, List
-from datetime import datetime
-import json
-import os
+"""Сервис для работы с данными бота (заказы, пользователи, регионы).
 
-from src.config import FIREBASE_PROJECT_ID, FIREBASE_CREDENTIALS_PATH
+Исторически построен на Firebase Firestore; конкретное хранилище
+выбирается STORAGE_BACKEND (см. src/storage).
+"""
+from typing import Optional, Dict, Any, List, Callable, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import random
 
-# Инициализация Firebase Admin SDK
-if not firebase_admin._apps:
-    # Проверяем, есть ли credentials в переменной окружения (для Render)
-    firebase_creds_json = os.getenv('FIREBASE_CREDENTIALS_JSON')
-    
-    if firebase_creds_json:
-        # Читаем credentials из переменной окружения
-        try:
-            print("📝 Загрузка Firebase credentials из переменной окружения...")
-            cred_dict = json.loads(firebase_creds_json)
-            cred = credentials.Certificate(cred_dict)
-            firebase_admin.initialize_app(cred, {
-                'projectId': FIREBASE_PROJECT_ID,
-            })
-            print("✅ Firebase credentials загружены из переменной окружения")
-        except json.JSONDecodeError as e:
-            print(f"❌ Ошибка парсинга FIREBASE_CREDENTIALS_JSON: {e}")
-            print(f"Первые 100 символов: {firebase_creds_json[:100]}")
-            raise
-        except Exception as e:
-            print(f"❌ Ошибка инициализации Firebase: {e}")
-            raise
-    elif os.path.exists(FIREBASE_CREDENTIALS_PATH):
-        # Читаем credentials из файла (для локальной разработки)
-        print(f"📝 Загрузка Firebase credentials из файла: {FIREBASE_CREDENTIALS_PATH}")
-        cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-        firebase_admin.initialize_app(cred, {
-            'projectId': FIREBASE_PROJECT_ID,
-        })
-        print("✅ Firebase credentials загружены из файла")
-    else:
-        # Для разработки можно использовать Application Default Credentials
-        print("⚠️ Firebase credentials не найдены.")
-        print(f"   Проверьте переменную окружения FIREBASE_CREDENTIALS_JSON или файл {FIREBASE_CREDENTIALS_PATH}")
-        print("   Пытаемся использовать Application Default Credentials...")
-        try:
-            firebase_admin.initialize_app()
-            print("✅ Используются Application Default Credentials")
-        except Exception as e:
-            print(f"❌ Не удалось инициализировать Firebase: {e}")
-            raise
+from src.config import SLA_NO_ANSWER_RETRY, SLA_BAD_NUMBER_ESCALATION, COUNTER_SHARDS
+from src.storage import get_storage, new_id, AlreadyExists, TransactionRejected, SERVER_TIMESTAMP, DELETE_FIELD, Increment, Write
+from src.storage.base import DocumentChange
+from src.utils.validators import make_dedupe_key
+from src.utils.query import Filter
+
+# Все статусы заказа
+ORDER_STATUSES = [
+    'NEW', 'QUEUED_TOMORROW', 'PUBLISHED_TODAY', 'ASSIGNED', 'CONFIRMED', 'ON_THE_WAY',
+    'DELIVERED', 'PARTIAL_RETURN', 'FULL_RETURN', 'RESCHEDULED',
+    'NO_ANSWER', 'BAD_NUMBER', 'FAKE', 'DECLINED',
+]
+
+# Финальные статусы: заказ больше не меняется
+TERMINAL_STATUSES = ['DELIVERED', 'PARTIAL_RETURN', 'FULL_RETURN']
+
+# Активные (нефинальные) статусы
+ACTIVE_STATUSES = [status for status in ORDER_STATUSES if status not in TERMINAL_STATUSES]
+
+# Статусы заказов, требующих действия оператора
+ACTION_REQUIRED_STATUSES = ['NO_ANSWER', 'BAD_NUMBER', 'FAKE', 'DECLINED', 'RESCHEDULED']
+
+# Статусы с SLA: сколько минут заказ может в них находиться
+SLA_STATUSES = {
+    'NO_ANSWER': SLA_NO_ANSWER_RETRY,
+    'BAD_NUMBER': SLA_BAD_NUMBER_ESCALATION,
+}
+
+# Тип задачи, которая создается при нарушении SLA
+SLA_TASK_TYPES = {
+    'NO_ANSWER': 'RECALL',       # повторный звонок оператора
+    'BAD_NUMBER': 'ESCALATION',  # эскалация логистам
+}
 
-db = firestore.client()
+# Статусы, в которых заказ освобождает ключ дедупликации: клиента можно
+# оформить на ту же дату заново
+DEDUPE_RELEASE_STATUSES = ['FAKE', 'DECLINED']
+
+# Максимум записей в одном коммите Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
+# Поля, которых достаточно для строки в списке заказов (без history и items)
+ORDER_SUMMARY_FIELDS = ['idHuman', 'customer.name', 'status']
+
+# Изменения дневных счетчиков: (дата, регион) -> ({статус: заказы}, {статус: сумма})
+CounterDeltas = Dict[Tuple[str, str], Tuple[Dict[str, int], Dict[str, float]]]
 
 
 class FirebaseService:
-    """Сервис для работы с Firestore"""
+    """Сервис для работы с данными бота поверх хранилища (src/storage)"""
     
     @staticmethod
-    def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
-        """Получить пользователя по Telegram ID"""
-        users_ref = db.collection('users')
-        query = users_ref.where('telegramId', '==', str(telegram_id)).limit(1)
-        docs = query.stream()
+    def watch_collection(
+        collection: str,
+        callback: Callable[[List[DocumentChange]], None],
+        loop: asyncio.AbstractEventLoop,
+        filters: Optional[List[Filter]] = None
+    ):
+        """Подписаться на изменения коллекции.
         
-        for doc in docs:
-            return {'id': doc.id, **doc.to_dict()}
-        return None
+        Изменения передаются в callback через event loop; первый вызов -
+        начальный снапшот. Возвращает watch-объект
+        (для отписки - ``watch.unsubscribe()``).
+        """
+        return get_storage().watch(collection, callback, loop, filters)
+    
+    @staticmethod
+    async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить пользователя по Telegram ID"""
+        users = await get_storage().query('users', [('telegramId', '==', str(telegram_id))], limit=1)
+        return users[0] if users else None
+    
+    @staticmethod
+    async def get_user(user_id: str) -> Optional[Dict[str, Any]]:
+        """Получить пользователя по ID документа"""
+        return await get_storage().get('users', user_id)
     
     @staticmethod
-    def create_user(telegram_id: int, display_name: str, role: str, region_id: str) -> str:
+    async def create_user(telegram_id: int, display_name: str, role: str, region_id: str) -> str:
         """Создать нового пользователя"""
-        user_ref = db.collection('users').document()
-        user_ref.set({
-            'id': user_ref.id,
+        user_id = new_id()
+        await get_storage().set('users', user_id, {
+            'id': user_id,
             'telegramId': str(telegram_id),
             'displayName': display_name,
             'role': role,
             'regionId': region_id,
-            'createdAt': firestore.SERVER_TIMESTAMP,
-            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'createdAt': SERVER_TIMESTAMP,
+            'updatedAt': SERVER_TIMESTAMP,
         })
-        return user_ref.id
+        return user_id
     
     @staticmethod
-    def get_region(region_id: str) -> Optional[Dict[str, Any]]:
+    async def get_region(region_id: str) -> Optional[Dict[str, Any]]:
         """Получить регион по ID"""
-        doc = db.collection('regions').document(region_id).get()
-        if doc.exists:
-            return {'id': doc.id, **doc.to_dict()}
-        return None
+        return await get_storage().get('regions', region_id)
     
     @staticmethod
-    def get_all_regions() -> List[Dict[str, Any]]:
+    async def get_all_regions() -> List[Dict[str, Any]]:
         """Получить все регионы"""
-        regions = []
-        docs = db.collection('regions').stream()
-        for doc in docs:
-            regions.append({'id': doc.id, **doc.to_dict()})
-        return regions
+        return await get_storage().query('regions', [])
+    
+    @staticmethod
+    def _events_collection(order_id: str) -> str:
+        """Подколлекция событий истории заказа"""
+        return f'orders/{order_id}/events'
     
     @staticmethod
-    def create_order(order_data: Dict[str, Any]) -> str:
-        """Создать новый заказ"""
-        order_ref = db.collection('orders').document()
+    async def create_order(order_data: Dict[str, Any], dedupe_key: Optional[str] = None) -> Dict[str, Any]:
+        """Создать новый заказ.
+        
+        Если передан ``dedupe_key``, в той же транзакции создается документ
+        ``order_dedupe/{dedupe_key}``; если он уже существует, заказ не
+        создается. Ключ сохраняется в заказе (dedupeKey), чтобы освободить
+        его при переходе в DEDUPE_RELEASE_STATUSES. Возвращает ``{'success': True, 'order_id': ...}`` или
+        ``{'success': False, 'error': 'duplicate', 'duplicate': {...}}``.
+        """
+        order_id = new_id()
         
         # Добавляем timestamp поля
-        order_data['createdAt'] = firestore.SERVER_TIMESTAMP
-        order_data['updatedAt'] = firestore.SERVER_TIMESTAMP
+        order_data['createdAt'] = SERVER_TIMESTAMP
+        order_data['updatedAt'] = SERVER_TIMESTAMP
+        if dedupe_key:
+            order_data['dedupeKey'] = dedupe_key
         
-        # Устанавливаем начальный статус
+        # Устанавливаем начальный статус ("сегодня" - в часовом поясе региона)
         if 'status' not in order_data:
+            from src.services.regions import region_registry
+            from src.utils.timezones import local_date
             delivery_date = order_data.get('deliveryDate', '')
-            if delivery_date == datetime.now().strftime('%Y-%m-%d'):
+            if delivery_date == local_date(region_registry.timezone_of(order_data.get('regionId'))):
                 order_data['status'] = 'PUBLISHED_TODAY'
             else:
                 order_data['status'] = 'QUEUED_TOMORROW'
         
-        # Инициализируем историю, если её нет
-        if 'history' not in order_data:
-            order_data['history'] = [{
-                'by': order_data.get('operatorId', 'system'),
-                'to': order_data['status'],
-                'at': datetime.now().isoformat(),
-                'note': 'Заказ создан',
-            }]
+        # История хранится в подколлекции orders/{id}/events
+        now = datetime.now(timezone.utc)
+        history = order_data.pop('history', None) or [{
+            'by': order_data.get('operatorId', 'system'),
+            'to': order_data['status'],
+            'note': 'Заказ создан',
+        }]
+        
+        # Денормализованные отметки времени для SLA-запросов
+        order_data['statusEnteredAt'] = now
+        order_data['lastTransitionAt'] = now
+        
+        events = FirebaseService._events_collection(order_id)
         
-        order_ref.set(order_data)
-        return order_ref.id
+        def build(docs: List[Optional[Dict[str, Any]]]) -> List[Write]:
+            writes: List[Write] = []
+            if dedupe_key:
+                # Ключ дедупликации занимается атомарно вместе с созданием заказа
+                dedupe = docs[0]
+                if dedupe:
+                    raise TransactionRejected({
+                        'success': False,
+                        'error': 'duplicate',
+                        'duplicate': {'id': dedupe.get('orderId'), 'idHuman': dedupe.get('idHuman')},
+                    })
+                writes.append(('create', 'order_dedupe', dedupe_key, {
+                    'orderId': order_id,
+                    'idHuman': order_data.get('idHuman'),
+                    'deliveryDate': order_data.get('deliveryDate'),
+                    'createdAt': SERVER_TIMESTAMP,
+                }))
+            
+            writes.append(('set', 'orders', order_id, order_data))
+            writes.extend(('set', events, new_id(), {**event, 'at': now}) for event in history)
+            
+            deltas: CounterDeltas = {}
+            FirebaseService._add_counter_delta(deltas, order_data, order_data['status'], 1)
+            writes.extend(FirebaseService._counter_writes(deltas))
+            return writes
+        
+        reads = [('order_dedupe', dedupe_key)] if dedupe_key else []
+        try:
+            await get_storage().transact(reads, build)
+        except TransactionRejected as e:
+            return e.payload
+        return {'success': True, 'order_id': order_id}
     
     @staticmethod
-    def get_order(order_id: str) -> Optional[Dict[str, Any]]:
+    def _serialize_order(order_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Привести документ заказа к словарю для бота"""
+        # Конвертируем Timestamp в ISO строку
+        if 'createdAt' in data and hasattr(data['createdAt'], 'isoformat'):
+            data['createdAt'] = data['createdAt'].isoformat()
+        if 'updatedAt' in data and hasattr(data['updatedAt'], 'isoformat'):
+            data['updatedAt'] = data['updatedAt'].isoformat()
+        return {'id': order_id, **data}
+    
+    @staticmethod
+    async def get_order(order_id: str) -> Optional[Dict[str, Any]]:
         """Получить заказ по ID"""
-        doc = db.collection('orders').document(order_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            # Конвертируем Firestore Timestamp в ISO строку
-            if 'createdAt' in data and hasattr(data['createdAt'], 'isoformat'):
-                data['createdAt'] = data['createdAt'].isoformat()
-            if 'updatedAt' in data and hasattr(data['updatedAt'], 'isoformat'):
-                data['updatedAt'] = data['updatedAt'].isoformat()
-            return {'id': doc.id, **data}
+        from src.services.order_store import order_store
+        cached = order_store.get(order_id)
+        if cached:
+            return FirebaseService._serialize_order(order_id, cached)
+        
+        order = await get_storage().get('orders', order_id)
+        if order:
+            return FirebaseService._serialize_order(order_id, order)
         return None
     
     @staticmethod
-    def update_order_status(
-        order_id: str,
+    def _build_transition(
+        current_data: Dict[str, Any],
         new_status: str,
         user_id: str,
+        now: datetime,
         reason_code: Optional[str] = None,
         note: Optional[str] = None,
         courier_id: Optional[str] = None
-    ) -> bool:
-        """Обновить статус заказа"""
-        order_ref = db.collection('orders').document(order_id)
-        order_doc = order_ref.get()
-        
-        if not order_doc.exists:
-            return False
-        
-        current_data = order_doc.to_dict()
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Подготовить изменения заказа и событие истории для смены статуса"""
         old_status = current_data.get('status', 'NEW')
         
         # Создаем событие истории
@@ -166,17 +231,19 @@ class FirebaseService:
             'by': user_id,
             'from': old_status,
             'to': new_status,
-            'at': datetime.now().isoformat(),
+            'at': now,
             'note': note or f'Статус изменен на {new_status}',
         }
         if reason_code:
             history_event['reasonCode'] = reason_code
         
-        # Обновляем заказ
         update_data = {
             'status': new_status,
-            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'lastTransitionAt': now,
         }
+        # Повторный вход в SLA-статус (еще один недозвон) отсчитывает SLA заново
+        if new_status != old_status or new_status in SLA_STATUSES:
+            update_data['statusEnteredAt'] = now
         
         if courier_id and new_status == 'ASSIGNED':
             update_data['courierId'] = courier_id
@@ -186,84 +253,729 @@ class FirebaseService:
         if note:
             update_data['comment'] = note
         
-        # Добавляем событие в историю
-        order_ref.update(update_data)
-        order_ref.update({
-            'history': firestore.ArrayUnion([history_event])
-        })
+        return update_data, history_event
+    
+    @staticmethod
+    def _sla_writes(
+        order_id: str,
+        current_data: Dict[str, Any],
+        new_status: str,
+        now: datetime
+    ) -> List[Write]:
+        """Записи дедлайна SLA для смены статуса.
+        
+        Вход в статус из SLA_STATUSES, в том числе повторный (NO_ANSWER ->
+        NO_ANSWER после еще одного недозвона), заново создает
+        ``sla_deadlines/{order_id}`` от момента перехода, даже если прежний
+        дедлайн уже сработал; выход из статуса - удаляет дедлайн. Дедлайн
+        пишется тем же коммитом, что и статус, поэтому не расходится с заказом.
+        """
+        old_status = current_data.get('status', 'NEW')
+        if new_status in SLA_STATUSES:
+            return [('set', 'sla_deadlines', order_id, FirebaseService._sla_deadline(
+                order_id, current_data, new_status, now
+            ))]
+        if old_status in SLA_STATUSES and new_status != old_status:
+            return [('delete', 'sla_deadlines', order_id, None)]
+        return []
+    
+    @staticmethod
+    def _dedupe_writes(order_id: str, current_data: Dict[str, Any], new_status: str) -> List[Write]:
+        """Освободить ключ дедупликации заказа при переходе в FAKE или DECLINED.
+        
+        Ключ из поля dedupeKey принадлежит этому заказу: он создан вместе
+        с заказом или миграцией, которая записывает его только владельцу.
+        """
+        dedupe_key = current_data.get('dedupeKey')
+        if not dedupe_key or new_status not in DEDUPE_RELEASE_STATUSES:
+            return []
+        if current_data.get('status') in DEDUPE_RELEASE_STATUSES:
+            return []
+        return [
+            ('delete', 'order_dedupe', dedupe_key, None),
+            ('update', 'orders', order_id, {'dedupeKey': DELETE_FIELD}),
+        ]
+    
+    @staticmethod
+    def _sla_deadline(
+        order_id: str,
+        order: Dict[str, Any],
+        status: str,
+        entered_at: datetime
+    ) -> Dict[str, Any]:
+        """Документ дедлайна SLA для заказа, вошедшего в status в entered_at"""
+        return {
+            'orderId': order_id,
+            'status': status,
+            'dueAt': entered_at + timedelta(minutes=SLA_STATUSES[status]),
+            'idHuman': order.get('idHuman'),
+            'operatorId': order.get('operatorId'),
+            'regionId': order.get('regionId'),
+        }
+    
+    @staticmethod
+    def _add_counter_delta(deltas: CounterDeltas, order: Dict[str, Any], status: str, sign: int) -> None:
+        """Учесть заказ (sign=1) или снять его (sign=-1) со счетчика статуса"""
+        date = order.get('deliveryDate')
+        if not date:
+            return
+        amount = order.get('totalAmount') or 0
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool):
+            amount = 0
+        
+        counts, amounts = deltas.setdefault((date, order.get('regionId') or ''), ({}, {}))
+        counts[status] = counts.get(status, 0) + sign
+        amounts[status] = amounts.get(status, 0) + sign * amount
+    
+    @staticmethod
+    def _counter_id(date: str, region_id: str, shard: int) -> str:
+        """ID шарда счетчика ``daily_counters/{дата}_{регион}_{шард}``"""
+        return f'{date}_{region_id or "none"}_{shard}'
+    
+    @staticmethod
+    def _counter_writes(deltas: CounterDeltas) -> List[Write]:
+        """Записи дневных счетчиков: одна на дату и регион, в случайный шард.
+        
+        Шарды (COUNTER_SHARDS на счетчик) разносят одновременные смены
+        статуса по разным документам; при чтении шарды суммируются.
+        """
+        writes: List[Write] = []
+        for (date, region_id), (counts, amounts) in deltas.items():
+            count_updates = {status: Increment(value) for status, value in counts.items() if value}
+            amount_updates = {status: Increment(value) for status, value in amounts.items() if value}
+            if not count_updates and not amount_updates:
+                continue
+            
+            shard = random.randrange(COUNTER_SHARDS)
+            writes.append(('merge', 'daily_counters', FirebaseService._counter_id(date, region_id, shard), {
+                'date': date,
+                'regionId': region_id,
+                'shard': shard,
+                'count': count_updates,
+                'amount': amount_updates,
+                'updatedAt': SERVER_TIMESTAMP,
+            }))
+        return writes
+    
+    @staticmethod
+    def _transition_counter_writes(current_data: Dict[str, Any], new_status: str) -> List[Write]:
+        """Записи счетчиков для смены статуса одного заказа"""
+        old_status = current_data.get('status', 'NEW')
+        if new_status == old_status:
+            return []
+        deltas: CounterDeltas = {}
+        FirebaseService._add_counter_delta(deltas, current_data, old_status, -1)
+        FirebaseService._add_counter_delta(deltas, current_data, new_status, 1)
+        return FirebaseService._counter_writes(deltas)
+    
+    @staticmethod
+    async def transition_order_status(
+        order_id: str,
+        new_status: str,
+        user_id: str,
+        reason_code: Optional[str] = None,
+        note: Optional[str] = None,
+        courier_id: Optional[str] = None,
+        check: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None
+    ) -> Dict[str, Any]:
+        """Сменить статус заказа в одной транзакции.
+        
+        Чтение заказа, проверка ``check`` (возвращает текст ошибки или None),
+        запись статуса и события истории выполняются одним коммитом.
+        Возвращает ``{'success': True, 'order': ...}`` с новым состоянием
+        заказа или ``{'success': False, 'error': ...}``.
+        """
+        result: Dict[str, Any] = {}
         
+        def build(docs: List[Optional[Dict[str, Any]]]) -> List[Write]:
+            current_data = docs[0]
+            if current_data is None:
+                raise TransactionRejected({'success': False, 'error': 'Order not found'})
+            
+            if check:
+                error = check(current_data)
+                if error:
+                    raise TransactionRejected({'success': False, 'error': error})
+            
+            now = datetime.now(timezone.utc)
+            update_data, history_event = FirebaseService._build_transition(
+                current_data, new_status, user_id, now, reason_code, note, courier_id
+            )
+            
+            # Новое состояние собираем локально, без повторного чтения
+            order = FirebaseService._serialize_order(order_id, dict(current_data))
+            order.update(update_data)
+            order['updatedAt'] = now.isoformat()
+            result['order'] = order
+            
+            # Статус, событие истории, дедлайн SLA, счетчики и ключ дедупликации
+            # пишутся атомарно одним коммитом
+            return [
+                ('update', 'orders', order_id, {**update_data, 'updatedAt': SERVER_TIMESTAMP}),
+                ('set', FirebaseService._events_collection(order_id), new_id(), history_event),
+                *FirebaseService._sla_writes(order_id, current_data, new_status, now),
+                *FirebaseService._transition_counter_writes(current_data, new_status),
+                *FirebaseService._dedupe_writes(order_id, current_data, new_status),
+            ]
+        
+        try:
+            await get_storage().transact([('orders', order_id)], build)
+        except TransactionRejected as e:
+            return e.payload
+        return {'success': True, 'order': result['order']}
+    
+    @staticmethod
+    async def transition_orders_batch(
+        orders: List[Dict[str, Any]],
+        new_status: str,
+        user_id: str,
+        note: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Сменить статус у многих заказов пакетами транзакций.
+        
+        Для системных переходов (перекат очереди). Заказы делятся на пакеты,
+        каждый пакет - отдельная транзакция: заказы перечитываются, и заказ,
+        чей статус уже отличается от переданного (его успели отменить или
+        подтвердить), пропускается. Каждый заказ - до шести записей
+        (документ + событие + дедлайн SLA + ключ дедупликации и его поле +
+        счетчик; счетчики одной даты и региона в пакете объединяются), в
+        пакете не более FIRESTORE_BATCH_LIMIT записей. Пакеты выполняются параллельно и
+        независимо: ошибка одного не отменяет остальные.
+        
+        Возвращает ``{'orders': [...], 'skipped': [...], 'errors': [...]}`` -
+        новые состояния заказов из успешных пакетов, ID пропущенных заказов
+        и ошибки неудавшихся пакетов.
+        """
+        storage = get_storage()
+        per_batch = FIRESTORE_BATCH_LIMIT // 6
+        
+        async def commit_batch(batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+            result: Dict[str, Any] = {}
+            
+            def build(docs: List[Optional[Dict[str, Any]]]) -> List[Write]:
+                # Транзакция может повторяться - результат собираем заново
+                now = datetime.now(timezone.utc)
+                updated, skipped = [], []
+                writes: List[Write] = []
+                deltas: CounterDeltas = {}
+                for order, current_data in zip(batch, docs):
+                    order_id = order['id']
+                    if current_data is None or current_data.get('status', 'NEW') != order.get('status', 'NEW'):
+                        skipped.append(order_id)
+                        continue
+                    
+                    update_data, history_event = FirebaseService._build_transition(
+                        current_data, new_status, user_id, now, note=note
+                    )
+                    writes.append(('update', 'orders', order_id, {**update_data, 'updatedAt': SERVER_TIMESTAMP}))
+                    writes.append(('set', FirebaseService._events_collection(order_id), new_id(), history_event))
+                    writes.extend(FirebaseService._sla_writes(order_id, current_data, new_status, now))
+                    writes.extend(FirebaseService._dedupe_writes(order_id, current_data, new_status))
+                    if current_data.get('status', 'NEW') != new_status:
+                        FirebaseService._add_counter_delta(deltas, current_data, current_data.get('status', 'NEW'), -1)
+                        FirebaseService._add_counter_delta(deltas, current_data, new_status, 1)
+                    
+                    order = FirebaseService._serialize_order(order_id, dict(current_data))
+                    order.update(update_data)
+                    order['updatedAt'] = now.isoformat()
+                    updated.append(order)
+                writes.extend(FirebaseService._counter_writes(deltas))
+                
+                result['updated'], result['skipped'] = updated, skipped
+                return writes
+            
+            await storage.transact([('orders', order['id']) for order in batch], build)
+            return result['updated'], result['skipped']
+        
+        batches = [orders[start:start + per_batch] for start in range(0, len(orders), per_batch)]
+        outcomes = await asyncio.gather(*(commit_batch(batch) for batch in batches), return_exceptions=True)
+        
+        updated_orders, skipped, errors = [], [], []
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"Error transitioning batch of {len(batch)} orders to {new_status}: {outcome}")
+                errors.append(outcome)
+                continue
+            updated_orders.extend(outcome[0])
+            skipped.extend(outcome[1])
+        
+        return {'orders': updated_orders, 'skipped': skipped, 'errors': errors}
+    
+    @staticmethod
+    async def update_order_status(
+        order_id: str,
+        new_status: str,
+        user_id: str,
+        reason_code: Optional[str] = None,
+        note: Optional[str] = None,
+        courier_id: Optional[str] = None
+    ) -> bool:
+        """Обновить статус заказа"""
+        result = await FirebaseService.transition_order_status(
+            order_id=order_id,
+            new_status=new_status,
+            user_id=user_id,
+            reason_code=reason_code,
+            note=note,
+            courier_id=courier_id
+        )
+        return result['success']
+    
+    @staticmethod
+    async def fire_sla_deadline(order_id: str) -> Optional[Dict[str, Any]]:
+        """Отработать наступивший дедлайн SLA заказа в одной транзакции.
+        
+        Если заказ все еще в статусе дедлайна, создается задача
+        ``tasks/{id}`` (SLA_TASK_TYPES) и дедлайн помечается firedAt.
+        Устаревший дедлайн (заказ уже вышел из статуса) удаляется.
+        Повторный вызов ничего не делает, поэтому задача создается один раз
+        даже при нескольких копиях бота. Возвращает
+        ``{'deadline': ..., 'order': ..., 'task_id': ...}`` или None.
+        """
+        result: Dict[str, Any] = {}
+        
+        def build(docs: List[Optional[Dict[str, Any]]]) -> List[Write]:
+            deadline, order = docs
+            if deadline is None or deadline.get('firedAt'):
+                raise TransactionRejected(None)
+            if order is None or order.get('status') != deadline.get('status'):
+                return [('delete', 'sla_deadlines', order_id, None)]
+            
+            task_id = new_id()
+            result.update({
+                'deadline': deadline,
+                'order': FirebaseService._serialize_order(order_id, dict(order)),
+                'task_id': task_id,
+            })
+            return [
+                ('create', 'tasks', task_id, {
+                    'id': task_id,
+                    'type': SLA_TASK_TYPES[deadline['status']],
+                    'state': 'OPEN',
+                    'orderId': order_id,
+                    'idHuman': order.get('idHuman'),
+                    'status': deadline['status'],
+                    'assigneeId': order.get('operatorId'),
+                    'regionId': order.get('regionId'),
+                    'dueAt': deadline['dueAt'],
+                    'createdAt': SERVER_TIMESTAMP,
+                }),
+                ('update', 'sla_deadlines', order_id, {'firedAt': SERVER_TIMESTAMP, 'taskId': task_id}),
+            ]
+        
+        try:
+            await get_storage().transact([('sla_deadlines', order_id), ('orders', order_id)], build)
+        except TransactionRejected as e:
+            return e.payload
+        return result or None
+    
+    @staticmethod
+    async def ensure_sla_deadline(order: Dict[str, Any]) -> bool:
+        """Создать дедлайн SLA для заказа, если его еще нет.
+        
+        Нужно для заказов, вошедших в SLA-статус до появления
+        sla_deadlines. ``order`` - с полями status и statusEnteredAt.
+        Возвращает True, если дедлайн создан.
+        """
+        entered_at = order.get('statusEnteredAt')
+        if order.get('status') not in SLA_STATUSES or not isinstance(entered_at, datetime):
+            return False
+        
+        deadline = FirebaseService._sla_deadline(order['id'], order, order['status'], entered_at)
+        try:
+            await get_storage().commit([('create', 'sla_deadlines', order['id'], deadline)])
+        except AlreadyExists:
+            return False
+        return True
+    
+    @staticmethod
+    async def claim_scheduled_run(job_id: str, scheduled_at: datetime) -> bool:
+        """Занять плановый запуск задачи ``scheduler_runs/{job_id}_{время}``.
+        
+        Возвращает False, если этот запуск уже выполнила другая копия
+        (например, до смены ведущей копии).
+        """
+        run_id = f'{job_id}_{int(scheduled_at.timestamp())}'
+        try:
+            await get_storage().commit([('create', 'scheduler_runs', run_id, {
+                'jobId': job_id,
+                'scheduledAt': scheduled_at,
+                'createdAt': SERVER_TIMESTAMP,
+            })])
+        except AlreadyExists:
+            return False
         return True
     
     @staticmethod
-    def get_orders_by_status(status: str, region_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def set_order_cards(cards: Dict[str, Dict[str, Any]]) -> None:
+        """Сохранить карточки заказов в региональных чатах.
+        
+        ``cards`` - ``{order_id: {'chatId', 'messageId', 'threadId'}}``;
+        пишется в поле regionCard заказа пакетами не более
+        FIRESTORE_BATCH_LIMIT записей.
+        """
+        storage = get_storage()
+        writes: List[Write] = [
+            ('update', 'orders', order_id, {'regionCard': card})
+            for order_id, card in cards.items()
+        ]
+        await asyncio.gather(*(
+            storage.commit(writes[start:start + FIRESTORE_BATCH_LIMIT])
+            for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT)
+        ))
+    
+    @staticmethod
+    async def _query_orders(
+        filters: List[Filter],
+        order_by: str = '__name__',
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Выполнить запрос к заказам с курсорной пагинацией.
+        
+        Курсоры ``start_after``/``end_before`` - ID заказов, на которых
+        закончилась/началась текущая страница. При ``end_before`` возвращаются
+        последние ``limit`` заказов перед курсором (предыдущая страница).
+        ``fields`` - проекция: вернуть только перечисленные поля
+        (например, ORDER_SUMMARY_FIELDS для списков).
+        """
+        # Запросы по активным заказам обслуживает материализованное представление
+        from src.services.order_store import order_store
+        if order_store.covers(filters):
+            return order_store.query(
+                filters,
+                order_by=order_by,
+                descending=descending,
+                limit=limit,
+                start_after=start_after,
+                end_before=end_before,
+                fields=fields
+            )
+        
+        return await get_storage().query(
+            'orders',
+            filters,
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+            start_after=start_after,
+            end_before=end_before,
+            fields=fields
+        )
+    
+    @staticmethod
+    async def get_orders_by_status(
+        status: str,
+        region_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """Получить заказы по статусу"""
-        orders_ref = db.collection('orders')
-        query = orders_ref.where('status', '==', status)
+        filters = [('status', '==', status)]
+        if region_id:
+            filters.append(('regionId', '==', region_id))
         
+        return await FirebaseService._query_orders(
+            filters, limit=limit, start_after=start_after, end_before=end_before, fields=fields
+        )
+    
+    @staticmethod
+    async def get_queued_orders(delivery_date: str, region_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Заказы в очереди QUEUED_TOMORROW с датой доставки delivery_date"""
+        filters = [('status', '==', 'QUEUED_TOMORROW'), ('deliveryDate', '==', delivery_date)]
         if region_id:
-            query = query.where('regionId', '==', region_id)
+            filters.append(('regionId', '==', region_id))
         
-        orders = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            orders.append({'id': doc.id, **data})
-        return orders
+        return await FirebaseService._query_orders(filters)
     
     @staticmethod
-    def get_orders_by_date(delivery_date: str, region_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def get_orders_by_date(
+        delivery_date: str,
+        region_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """Получить заказы по дате доставки"""
-        orders_ref = db.collection('orders')
-        query = orders_ref.where('deliveryDate', '==', delivery_date)
-        
+        filters = [('deliveryDate', '==', delivery_date)]
         if region_id:
-            query = query.where('regionId', '==', region_id)
+            filters.append(('regionId', '==', region_id))
         
-        orders = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            orders.append({'id': doc.id, **data})
-        return orders
+        return await FirebaseService._query_orders(
+            filters, limit=limit, start_after=start_after, end_before=end_before, fields=fields
+        )
     
     @staticmethod
-    def get_orders_requiring_action(operator_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Получить заказы, требующие действия оператора"""
-        statuses = ['NO_ANSWER', 'BAD_NUMBER', 'FAKE', 'DECLINED', 'RESCHEDULED']
-        orders_ref = db.collection('orders')
+    async def get_orders_requiring_action(
+        operator_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Получить заказы, требующие действия оператора (свежие первыми).
         
-        all_orders = []
-        for status in statuses:
-            query = orders_ref.where('status', '==', status)
-            if operator_id:
-                query = query.where('operatorId', '==', operator_id)
-            
-            for doc in query.stream():
-                data = doc.to_dict()
-                all_orders.append({'id': doc.id, **data})
+        Один запрос с фильтром `in`, сортировка и лимит на стороне хранилища
+        (без составного индекса Firestore выполняет запросы по статусам
+        параллельно, см. FirestoreBackend.query).
+        """
+        filters = [('status', 'in', ACTION_REQUIRED_STATUSES)]
+        if operator_id:
+            filters.append(('operatorId', '==', operator_id))
         
-        return all_orders
+        return await FirebaseService._query_orders(
+            filters,
+            order_by='updatedAt',
+            descending=True,
+            limit=limit,
+            start_after=start_after,
+            end_before=end_before,
+            fields=fields
+        )
     
     @staticmethod
-    def get_courier_orders(courier_id: str, date: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def get_courier_orders(
+        courier_id: str,
+        date: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """Получить заказы курьера"""
-        orders_ref = db.collection('orders')
-        query = orders_ref.where('courierId', '==', courier_id)
-        
+        filters = [('courierId', '==', courier_id)]
         if date:
-            query = query.where('deliveryDate', '==', date)
+            filters.append(('deliveryDate', '==', date))
         
-        orders = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            orders.append({'id': doc.id, **data})
-        return orders
+        return await FirebaseService._query_orders(
+            filters, limit=limit, start_after=start_after, end_before=end_before, fields=fields
+        )
     
     @staticmethod
-    def check_duplicate_order(phone: str, delivery_date: str) -> Optional[Dict[str, Any]]:
-        """Проверить дубликат заказа по телефону и дате"""
-        orders_ref = db.collection('orders')
-        query = orders_ref.where('customer.phone', '==', phone).where('deliveryDate', '==', delivery_date)
+    async def get_order_events(order_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Получить события истории заказа (последние ``limit``, по возрастанию времени)"""
+        events = await get_storage().query(
+            FirebaseService._events_collection(order_id),
+            [],
+            order_by='at',
+            descending=True,
+            limit=limit
+        )
+        events.reverse()
+        return events
+    
+    @staticmethod
+    async def get_orders_in_status_since(
+        status: str,
+        entered_before: datetime,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Заказы, находящиеся в статусе status с момента не позже entered_before.
+        
+        Диапазонный запрос по денормализованному statusEnteredAt
+        (индекс status + statusEnteredAt).
+        """
+        return await FirebaseService._query_orders(
+            [('status', '==', status), ('statusEnteredAt', '<=', entered_before)],
+            order_by='statusEnteredAt',
+            fields=fields
+        )
+    
+    @staticmethod
+    async def migrate_order_history(batch_size: int = 200) -> int:
+        """Перенести массив history старых заказов в подколлекцию events.
+        
+        Для каждого заказа с полем history события копируются в
+        orders/{id}/events, выставляются statusEnteredAt/lastTransitionAt,
+        а массив удаляется. Заказы читаются страницами по batch_size.
+        Идемпотентно: заказы без history пропускаются.
+        Возвращает число перенесенных заказов.
+        """
+        def parse_at(value: Any) -> datetime:
+            if isinstance(value, datetime):
+                return value if value.tzinfo else value.astimezone(timezone.utc)
+            try:
+                # Старые события писались в локальном времени сервера
+                return datetime.fromisoformat(value).astimezone(timezone.utc)
+            except (TypeError, ValueError):
+                return datetime.now(timezone.utc)
         
-        for doc in query.stream():
-            return {'id': doc.id, **doc.to_dict()}
+        storage = get_storage()
+        migrated = 0
+        cursor = None
+        
+        while True:
+            page = await storage.query('orders', [], limit=batch_size, start_after=cursor)
+            if not page:
+                break
+            cursor = page[-1]['id']
+            
+            writes: List[Write] = []
+            for data in page:
+                history = data.get('history')
+                if history is None:
+                    continue
+                
+                events = [{**event, 'at': parse_at(event.get('at'))} for event in history]
+                status = data.get('status')
+                entered = [event['at'] for event in events if event.get('to') == status]
+                last_at = events[-1]['at'] if events else parse_at(data.get('updatedAt'))
+                
+                # Одна запись на заказ + по одной на событие, не более лимита в коммите
+                if writes and len(writes) + len(events) + 1 > FIRESTORE_BATCH_LIMIT:
+                    await storage.commit(writes)
+                    writes = []
+                
+                events_collection = FirebaseService._events_collection(data['id'])
+                writes.extend(('set', events_collection, new_id(), event) for event in events)
+                writes.append(('update', 'orders', data['id'], {
+                    'history': DELETE_FIELD,
+                    'statusEnteredAt': entered[-1] if entered else last_at,
+                    'lastTransitionAt': last_at,
+                }))
+                migrated += 1
+            
+            if writes:
+                await storage.commit(writes)
+            if len(page) < batch_size:
+                break
+        
+        return migrated
+    
+    @staticmethod
+    async def backfill_dedupe_keys(since: str, batch_size: int = 200) -> Tuple[int, int]:
+        """Создать ключи дедупликации для заказов, созданных до их появления.
+        
+        Заказы с датой доставки не раньше since читаются страницами по
+        batch_size. Для заказа с телефоном, без dedupeKey и не в
+        DEDUPE_RELEASE_STATUSES ключ ``order_dedupe/{ключ}`` создается
+        одним коммитом с полем dedupeKey заказа. Если ключ уже занят, заказ
+        - дубликат более раннего и пропускается. Идемпотентно.
+        Возвращает (создано ключей, найдено дубликатов).
+        """
+        storage = get_storage()
+        created = duplicates = 0
+        cursor = None
+        
+        async def claim(order: Dict[str, Any]) -> Optional[bool]:
+            dedupe_key = make_dedupe_key((order.get('customer') or {}).get('phone', ''), order['deliveryDate'])
+            if not dedupe_key:
+                return None
+            try:
+                await storage.commit([
+                    ('create', 'order_dedupe', dedupe_key, {
+                        'orderId': order['id'],
+                        'idHuman': order.get('idHuman'),
+                        'deliveryDate': order['deliveryDate'],
+                        'createdAt': SERVER_TIMESTAMP,
+                    }),
+                    ('update', 'orders', order['id'], {'dedupeKey': dedupe_key}),
+                ])
+            except AlreadyExists:
+                return False
+            return True
+        
+        while True:
+            page = await storage.query(
+                'orders',
+                [('deliveryDate', '>=', since)],
+                order_by='deliveryDate',
+                limit=batch_size,
+                start_after=cursor
+            )
+            if not page:
+                break
+            cursor = page[-1]['id']
+            
+            results = await asyncio.gather(*(
+                claim(order) for order in page
+                if not order.get('dedupeKey') and order.get('status') not in DEDUPE_RELEASE_STATUSES
+            ))
+            created += results.count(True)
+            duplicates += results.count(False)
+            if len(page) < batch_size:
+                break
+        
+        return created, duplicates
+    
+    @staticmethod
+    async def get_daily_counters(
+        delivery_date: str,
+        region_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Дневные счетчики заказов: ``{region_id: {status: {'count', 'amount'}}}``.
+        
+        Читаются только шарды счетчиков даты (COUNTER_SHARDS документов на
+        регион), заказы не читаются. Пустые статусы не возвращаются.
+        """
+        filters = [('date', '==', delivery_date)]
+        if region_id is not None:
+            filters.append(('regionId', '==', region_id))
+        shards = await get_storage().query('daily_counters', filters)
+        
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for shard in shards:
+            region = result.setdefault(shard.get('regionId', ''), {})
+            for field in ('count', 'amount'):
+                for status, value in (shard.get(field) or {}).items():
+                    region.setdefault(status, {'count': 0, 'amount': 0})[field] += value
+        
+        return {
+            region: {status: values for status, values in statuses.items() if values['count']}
+            for region, statuses in result.items()
+        }
+    
+    @staticmethod
+    async def rebuild_daily_counters(delivery_date: str) -> int:
+        """Сверить счетчики даты с заказами и исправить расхождения.
+        
+        Заказы даты (с проекцией status, regionId, totalAmount) и шарды
+        счетчиков читаются параллельно; разница между подсчетом по заказам
+        и суммой шардов дописывается инкрементами в случайный шард, как
+        обычная смена статуса. Шарды не перезаписываются, поэтому смены
+        статуса во время сверки не теряются; в худшем случае смена, попавшая
+        между двумя чтениями, будет исправлена следующей сверкой.
+        Возвращает число исправленных регионов.
+        """
+        storage = get_storage()
+        orders, shards = await asyncio.gather(
+            storage.query(
+                'orders',
+                [('deliveryDate', '==', delivery_date)],
+                fields=['status', 'regionId', 'totalAmount', 'deliveryDate']
+            ),
+            storage.query('daily_counters', [('date', '==', delivery_date)])
+        )
+        
+        deltas: CounterDeltas = {}
+        for order in orders:
+            FirebaseService._add_counter_delta(deltas, order, order.get('status', 'NEW'), 1)
+        for shard in shards:
+            counts, amounts = deltas.setdefault((delivery_date, shard.get('regionId') or ''), ({}, {}))
+            for status, value in (shard.get('count') or {}).items():
+                counts[status] = counts.get(status, 0) - value
+            for status, value in (shard.get('amount') or {}).items():
+                # Погрешность сложения дробных сумм не считаем расхождением
+                amounts[status] = round(amounts.get(status, 0) - value, 2)
+        
+        writes = FirebaseService._counter_writes(deltas)
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            await storage.commit(writes[start:start + FIRESTORE_BATCH_LIMIT])
+        return len(writes)
+    
+    @staticmethod
+    async def check_duplicate_order(phone: str, delivery_date: str) -> Optional[Dict[str, Any]]:
+        """Проверить дубликат заказа по телефону и дате (чтение ключа дедупликации)"""
+        dedupe_key = make_dedupe_key(phone, delivery_date)
+        if not dedupe_key:
+            return None
+        dedupe = await get_storage().get('order_dedupe', dedupe_key)
+        if dedupe:
+            return {'id': dedupe.get('orderId'), 'idHuman': dedupe.get('idHuman')}
         return None
-
@@ -0,0 +1,86 @@
+"""Журнал запусков задач планировщика"""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class JobRunLog:
+    """История запусков задач в таблице job_runs (SQLite).
+
+    Статусы: ok, error, timeout, missed (пропущен дольше misfire grace),
+    skipped (предыдущий запуск еще выполнялся). Лежит в том же файле,
+    что и хранилище задач планировщика.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Запись выполняется в потоке, чтобы не блокировать event loop
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS job_runs ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' job_id TEXT NOT NULL,'
+            ' scheduled_at TEXT,'
+            ' started_at TEXT,'
+            ' finished_at TEXT,'
+            ' duration_ms INTEGER,'
+            ' status TEXT NOT NULL,'
+            ' error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS job_runs_job ON job_runs (job_id, id)')
+
+    async def record(
+        self,
+        job_id: str,
+        status: str,
+        scheduled_at: Optional[datetime] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Записать запуск задачи"""
+        duration_ms = None
+        if started_at and finished_at:
+            duration_ms = int((finished_at - started_at).total_seconds() * 1000)
+
+        def insert() -> None:
+            self._conn.execute(
+                'INSERT INTO job_runs (job_id, scheduled_at, started_at, finished_at, duration_ms, status, error)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    job_id,
+                    scheduled_at.isoformat() if scheduled_at else None,
+                    started_at.isoformat() if started_at else None,
+                    finished_at.isoformat() if finished_at else None,
+                    duration_ms,
+                    status,
+                    error,
+                )
+            )
+
+        try:
+            await asyncio.to_thread(insert)
+        except sqlite3.Error as e:
+            print(f"Error recording job run {job_id}: {e}")
+
+    async def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последние запуски задач (свежие первыми)"""
+        def select() -> List[Dict[str, Any]]:
+            cursor = self._conn.execute(
+                'SELECT job_id, scheduled_at, started_at, finished_at, duration_ms, status, error'
+                ' FROM job_runs ORDER BY id DESC LIMIT ?',
+                (limit,)
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+        return await asyncio.to_thread(select)
+
+    def close(self) -> None:
+        self._conn.close()
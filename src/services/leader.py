@@ -0,0 +1,131 @@
+"""Выбор ведущей копии для задач по расписанию"""
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from src.config import LEADER_LEASE_TTL, LEADER_RENEW_INTERVAL
+from src.storage import get_storage, new_id, TransactionRejected, Write
+
+
+class LeaderElection:
+    """Аренда (lease) документа ``locks/{name}``.
+
+    Каждая копия раз в LEADER_RENEW_INTERVAL секунд пытается в транзакции
+    занять или продлить аренду на LEADER_LEASE_TTL секунд; занять можно
+    свободную, истекшую или свою аренду. Копия считает себя ведущей до
+    конца аренды, отсчитанного по локальным часам от начала запроса, поэтому
+    слагает полномочия раньше, чем аренду сможет забрать другая копия.
+    При остановке аренда освобождается, и другая копия становится ведущей
+    со следующей попытки.
+    """
+
+    def __init__(self, name: str, ttl: int = LEADER_LEASE_TTL, renew_interval: int = LEADER_RENEW_INTERVAL):
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{new_id()[:6]}'
+        self._leader = False
+        # Монотонное время, до которого аренда точно наша
+        self._valid_until = 0.0
+        self._on_elected: Optional[Callable[[], None]] = None
+        self._on_lost: Optional[Callable[[], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Является ли копия ведущей"""
+        return self._leader and time.monotonic() < self._valid_until
+
+    def start(self, on_elected: Callable[[], None], on_lost: Callable[[], None]) -> None:
+        """Начать участвовать в выборах.
+
+        on_elected вызывается, когда копия становится ведущей, on_lost -
+        когда перестает ей быть (аренда не продлена или занята другой копией).
+        """
+        if self._task is not None:
+            return
+        self._on_elected = on_elected
+        self._on_lost = on_lost
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Выйти из выборов и освободить аренду"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._leader:
+            self._set_leader(False)
+            try:
+                await self._release()
+            except Exception as e:
+                print(f"Error releasing lease {self.name}: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                acquired = await self._try_acquire()
+            except Exception as e:
+                # Хранилище недоступно: остаемся ведущей до конца аренды
+                print(f"Error renewing lease {self.name}: {e}")
+                acquired = None
+
+            if acquired:
+                self._valid_until = started + self.ttl
+                self._set_leader(True)
+            elif acquired is False or time.monotonic() >= self._valid_until:
+                self._set_leader(False)
+
+            delay = self.renew_interval
+            if self._leader:
+                # Не пропустить конец аренды, если продление не удается
+                delay = max(0.0, min(delay, self._valid_until - time.monotonic()))
+            await asyncio.sleep(delay)
+
+    def _set_leader(self, leader: bool) -> None:
+        if leader == self._leader:
+            return
+        self._leader = leader
+        if leader:
+            print(f"👑 Копия {self.holder} стала ведущей ({self.name})")
+            self._on_elected()
+        else:
+            print(f"⚠️ Копия {self.holder} больше не ведущая ({self.name})")
+            self._on_lost()
+
+    async def _try_acquire(self) -> bool:
+        """Занять или продлить аренду; False - аренда у другой копии"""
+        now = datetime.now(timezone.utc)
+
+        def build(docs) -> List[Write]:
+            lease = docs[0]
+            ours = lease is not None and lease.get('holder') == self.holder
+            if lease is not None and not ours and lease.get('expiresAt') and lease['expiresAt'] > now:
+                raise TransactionRejected(False)
+            return [('set', 'locks', self.name, {
+                'holder': self.holder,
+                'acquiredAt': lease['acquiredAt'] if ours else now,
+                'renewedAt': now,
+                'expiresAt': now + timedelta(seconds=self.ttl),
+            })]
+
+        try:
+            await get_storage().transact([('locks', self.name)], build)
+        except TransactionRejected as e:
+            return e.payload
+        return True
+
+    async def _release(self) -> None:
+        def build(docs) -> List[Write]:
+            lease = docs[0]
+            if lease is None or lease.get('holder') != self.holder:
+                return []
+            return [('delete', 'locks', self.name, None)]
+
+        await get_storage().transact([('locks', self.name)], build)
+
+
+scheduler_leader = LeaderElection('scheduler')
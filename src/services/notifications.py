@@ -1,9 +1,14 @@
 """Сервис для отправки уведомлений в Telegram"""
 from aiogram import Bot
 from aiogram.types import Message
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
+from collections import defaultdict
+import asyncio
 from src.services.firebase import FirebaseService
+from src.services.regions import region_registry
+from src.services.outbound import outbound_priority, PRIORITY_BULK
+from src.config import ROLLOVER_PUBLISH_CONCURRENCY, BROADCAST_CONCURRENCY
 from src.utils.formatters import format_order_card
 from src.utils.keyboards import get_order_keyboard
 
@@ -14,22 +19,27 @@ class NotificationService:
     def __init__(self, bot: Bot):
         self.bot = bot
     
-    async def send_order_to_region_chat(self, order: Dict[str, Any]) -> Optional[Message]:
-        """Отправить заказ в региональный чат"""
-        region = FirebaseService.get_region(order.get('regionId', ''))
-        if not region:
-            return None
-        
-        # Определяем топик в зависимости от статуса
-        status = order.get('status', '')
-        topic_id = None
-        
-        if status == 'PUBLISHED_TODAY':
-            topic_id = region.get('topics', {}).get('todayTopicId')
-        elif status == 'QUEUED_TOMORROW':
-            topic_id = region.get('topics', {}).get('tomorrowQueueId')
+    @staticmethod
+    def _card_of(message: Message) -> Dict[str, Any]:
+        """Адрес карточки заказа для поля regionCard"""
+        return {
+            'chatId': message.chat.id,
+            'messageId': message.message_id,
+            'threadId': message.message_thread_id,
+        }
+    
+    async def send_order_to_region_chat(self, order: Dict[str, Any], save_card: bool = True) -> Optional[Message]:
+        """Отправить заказ в региональный чат.
         
-        chat_id = region.get('telegramChatId')
+        Адрес отправленной карточки сохраняется в заказе (regionCard), чтобы
+        обновлять ее при смене статуса. save_card=False - сохранит вызывающий
+        (пакетом, см. publish_orders).
+        """
+        # Чат и топик берем из реестра регионов в памяти
+        chat_id, topic_id = await region_registry.get_chat_target(
+            order.get('regionId', ''),
+            order.get('status', '')
+        )
         if not chat_id:
             return None
         
@@ -43,12 +53,61 @@ class NotificationService:
                 text=card_text,
                 parse_mode='Markdown',
                 reply_markup=keyboard,
-                message_thread_id=int(topic_id) if topic_id else None
+                message_thread_id=topic_id
             )
-            return message
         except Exception as e:
             print(f"Error sending order to region chat: {e}")
             return None
+        
+        if save_card and order.get('id'):
+            try:
+                await FirebaseService.set_order_cards({order['id']: self._card_of(message)})
+            except Exception as e:
+                print(f"Error saving order card {order['id']}: {e}")
+        return message
+    
+    async def publish_orders(
+        self,
+        orders: List[Dict[str, Any]],
+        concurrency: int = ROLLOVER_PUBLISH_CONCURRENCY
+    ) -> int:
+        """Опубликовать заказы в региональные чаты.
+        
+        Заказы группируются по региону: внутри чата отправка идет по порядку,
+        разные чаты публикуются параллельно (не более concurrency одновременно).
+        Карточки отправляются с приоритетом bulk: ответы пользователям в
+        очереди исходящих идут раньше. Адреса карточек сохраняются в заказы
+        пакетной записью по завершении региона - в том числе если публикацию
+        прервали, чтобы у отправленных карточек был regionCard. Возвращает
+        число отправленных карточек.
+        """
+        by_region: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for order in orders:
+            by_region[order.get('regionId', '')].append(order)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        published = 0
+        
+        async def publish_region(region_orders: List[Dict[str, Any]]) -> None:
+            nonlocal published
+            cards: Dict[str, Dict[str, Any]] = {}
+            try:
+                async with semaphore:
+                    for order in region_orders:
+                        message = await self.send_order_to_region_chat(order, save_card=False)
+                        if message:
+                            cards[order['id']] = self._card_of(message)
+            finally:
+                published += len(cards)
+                if cards:
+                    try:
+                        await FirebaseService.set_order_cards(cards)
+                    except Exception as e:
+                        print(f"Error saving order cards: {e}")
+        
+        with outbound_priority(PRIORITY_BULK):
+            await asyncio.gather(*(publish_region(region_orders) for region_orders in by_region.values()))
+        return published
     
     async def update_order_card_in_chat(
         self,
@@ -78,8 +137,11 @@ class NotificationService:
         order: Dict[str, Any],
         operator_id: str
     ) -> bool:
-        """Уведомить оператора о необходимости действия"""
-        user = FirebaseService.get_user_by_telegram_id(int(operator_id))
+        """Уведомить оператора о необходимости действия.
+        
+        ``operator_id`` - ID документа пользователя (поле operatorId заказа).
+        """
+        user = await FirebaseService.get_user(operator_id)
         if not user or not user.get('telegramId'):
             return False
         
@@ -110,25 +172,53 @@ class NotificationService:
     async def send_daily_report(
         self,
         report_data: Dict[str, Any],
-        user_ids: list
+        user_ids: list,
+        date: Optional[str] = None,
+        header: Optional[str] = None
     ) -> int:
-        """Отправить ежедневный отчет пользователям"""
+        """Отправить ежедневный отчет пользователям.
+        
+        ``date`` - дата отчета (по умолчанию сегодня по часам сервера),
+        ``header`` - строка перед отчетом (например, регионы).
+        """
         from src.utils.formatters import format_report
         
-        date = datetime.now().strftime('%d.%m.%Y')
+        date = date or datetime.now().strftime('%d.%m.%Y')
         report_text = format_report(report_data, date)
+        if header:
+            report_text = f"{header}\n\n{report_text}"
         
-        sent_count = 0
-        for user_id in user_ids:
-            try:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=report_text,
-                    parse_mode='Markdown'
-                )
-                sent_count += 1
-            except Exception as e:
-                print(f"Error sending report to {user_id}: {e}")
+        result = await self.broadcast(report_text, user_ids)
+        return len(result['sent'])
+    
+    async def broadcast(
+        self,
+        text: str,
+        user_ids: List[int],
+        parse_mode: Optional[str] = 'Markdown',
+        concurrency: int = BROADCAST_CONCURRENCY
+    ) -> Dict[str, Any]:
+        """Отправить одно сообщение многим получателям параллельно.
         
-        return sent_count
-
+        Текст формируется один раз вызывающим кодом; одновременно идет не
+        более concurrency отправок (лимиты Telegram соблюдает очередь
+        исходящих). Повторяющиеся получатели получают сообщение один раз.
+        Возвращает ``{'sent': [user_id, ...], 'failed': {user_id: ошибка}}``.
+        """
+        recipients = list(dict.fromkeys(user_ids))
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def send(user_id: int) -> Optional[str]:
+            async with semaphore:
+                try:
+                    await self.bot.send_message(chat_id=user_id, text=text, parse_mode=parse_mode)
+                    return None
+                except Exception as e:
+                    print(f"Error sending message to {user_id}: {e}")
+                    return str(e)
+        
+        errors = await asyncio.gather(*(send(user_id) for user_id in recipients))
+        return {
+            'sent': [user_id for user_id, error in zip(recipients, errors) if error is None],
+            'failed': {user_id: error for user_id, error in zip(recipients, errors) if error is not None},
+        }
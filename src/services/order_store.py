@@ -0,0 +1,216 @@
+"""Материализованное представление активных заказов в памяти"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from src.services.firebase import FirebaseService, DocumentChange, ACTIVE_STATUSES
+from src.utils.query import Filter, run_query
+
+# Поля со вторичными индексами (значение -> множество ID заказов)
+INDEXED_FIELDS = ['status', 'deliveryDate', 'courierId', 'operatorId', 'regionId']
+
+
+class OrderStore:
+    """Рабочий набор заказов, синхронизируемый snapshot-листенерами.
+
+    Держит в памяти два подмножества заказов:
+    - все заказы в активных статусах (``status in ACTIVE_STATUSES``);
+    - все заказы с датой доставки не раньше вчерашней (по UTC).
+
+    Запросы, которые целиком попадают в эти подмножества (по активному
+    статусу или по дате доставки >= нижней границы), FirebaseService отдает
+    отсюда без обращения к Firestore. Остальные идут в Firestore как раньше.
+    Нижняя граница сдвигается каждую полночь UTC: листенер по дате
+    переподписывается, и прошедшие неактивные заказы уходят из памяти.
+    """
+
+    def __init__(self):
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        # Какие листенеры видят заказ: заказ удаляется, когда не видит ни один
+        self._sources: Dict[str, Set[str]] = defaultdict(set)
+        self._index: Dict[str, Dict[Any, Set[str]]] = {field: defaultdict(set) for field in INDEXED_FIELDS}
+        self._watches: Dict[str, Any] = {}
+        self._synced: Set[str] = set()
+        self._floor_date: Optional[str] = None
+        # Номер подписки по дате: изменения от прежней подписки отбрасываются
+        self._dated_generation = 0
+        self._floor_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Начальные снапшоты обоих листенеров получены"""
+        return bool(self._watches) and self._synced >= set(self._watches)
+
+    def start(self) -> None:
+        """Подписаться на активные заказы и заказы от нижней границы дат"""
+        if self._watches:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._watches['active'] = FirebaseService.watch_collection(
+            'orders',
+            lambda changes: self._apply_changes('active', changes),
+            loop,
+            filters=[('status', 'in', ACTIVE_STATUSES)]
+        )
+        self._subscribe_dated()
+        self._floor_task = asyncio.create_task(self._advance_floor())
+        print("✅ Листенеры представления заказов запущены")
+
+    def _subscribe_dated(self) -> None:
+        """Подписаться на заказы с датой доставки от текущей нижней границы"""
+        # Вчера по UTC: не позже "сегодня" в часовом поясе любого региона
+        self._floor_date = (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%d')
+        self._dated_generation += 1
+        generation = self._dated_generation
+
+        def on_changes(changes: List[DocumentChange]) -> None:
+            if generation == self._dated_generation:
+                self._apply_changes('dated', changes)
+
+        self._watches['dated'] = FirebaseService.watch_collection(
+            'orders',
+            on_changes,
+            asyncio.get_running_loop(),
+            filters=[('deliveryDate', '>=', self._floor_date)]
+        )
+
+    async def _advance_floor(self) -> None:
+        """Каждую полночь UTC сдвигать нижнюю границу дат"""
+        while True:
+            now = datetime.now(timezone.utc)
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            await asyncio.sleep((midnight - now).total_seconds() + 1)
+
+            # Заказы, которые видел только листенер по дате, выгружаются и
+            # возвращаются начальным снапшотом новой подписки; до него
+            # запросы идут в хранилище
+            self._watches.pop('dated').unsubscribe()
+            self._synced.discard('dated')
+            for order_id in [order_id for order_id, sources in self._sources.items() if 'dated' in sources]:
+                self._sources[order_id].discard('dated')
+                if not self._sources[order_id]:
+                    self._remove(order_id)
+            self._subscribe_dated()
+            print(f"✅ Нижняя граница представления заказов: {self._floor_date}, заказов в памяти: {len(self._orders)}")
+
+    def stop(self) -> None:
+        """Отписаться от листенеров и очистить представление"""
+        if self._floor_task is not None:
+            self._floor_task.cancel()
+            self._floor_task = None
+        for watch in self._watches.values():
+            watch.unsubscribe()
+        self._watches.clear()
+        self._synced.clear()
+        self._orders.clear()
+        self._sources.clear()
+        for index in self._index.values():
+            index.clear()
+
+    def covers(self, filters: List[Filter]) -> bool:
+        """Можно ли ответить на запрос с такими фильтрами из памяти"""
+        if not self.ready:
+            return False
+
+        for field, op, value in filters:
+            if field == 'deliveryDate' and op == '==' and value >= self._floor_date:
+                return True
+            if field == 'status' and op == '==' and value in ACTIVE_STATUSES:
+                return True
+            if field == 'status' and op == 'in' and set(value) <= set(ACTIVE_STATUSES):
+                return True
+        return False
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Получить заказ из представления (копию) или None"""
+        order = self._orders.get(order_id)
+        return dict(order) if order else None
+
+    def query(
+        self,
+        filters: List[Filter],
+        order_by: str = '__name__',
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Выполнить запрос по представлению"""
+        return run_query(
+            self._candidates(filters),
+            filters,
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+            start_after=start_after,
+            end_before=end_before,
+            fields=fields,
+            get_doc=self._orders.get
+        )
+
+    def _candidates(self, filters: List[Filter]) -> List[Dict[str, Any]]:
+        """Сузить выборку по самому селективному индексу"""
+        best: Optional[Set[str]] = None
+        for field, op, value in filters:
+            if field not in self._index:
+                continue
+            if op == '==':
+                ids = self._index[field].get(value, set())
+            elif op == 'in':
+                ids = set().union(*(self._index[field].get(item, set()) for item in value))
+            else:
+                continue
+            if best is None or len(ids) < len(best):
+                best = ids
+
+        if best is None:
+            return list(self._orders.values())
+        return [self._orders[order_id] for order_id in best]
+
+    def _apply_changes(self, source: str, changes: List[DocumentChange]) -> None:
+        for change_type, doc_id, data in changes:
+            if change_type == 'REMOVED':
+                sources = self._sources.get(doc_id)
+                if sources is not None:
+                    sources.discard(source)
+                    if not sources:
+                        self._remove(doc_id)
+            else:
+                self._sources[doc_id].add(source)
+                self._put({'id': doc_id, **data})
+
+        if source not in self._synced:
+            self._synced.add(source)
+            if self.ready:
+                print(f"✅ Представление заказов загружено: {len(self._orders)}")
+
+    def _put(self, order: Dict[str, Any]) -> None:
+        old = self._orders.get(order['id'])
+        if old:
+            self._unindex(old)
+        self._orders[order['id']] = order
+        for field in INDEXED_FIELDS:
+            value = order.get(field)
+            if value is not None:
+                self._index[field][value].add(order['id'])
+
+    def _remove(self, order_id: str) -> None:
+        self._sources.pop(order_id, None)
+        old = self._orders.pop(order_id, None)
+        if old:
+            self._unindex(old)
+
+    def _unindex(self, order: Dict[str, Any]) -> None:
+        for field in INDEXED_FIELDS:
+            value = order.get(field)
+            ids = self._index[field].get(value)
+            if ids is not None:
+                ids.discard(order['id'])
+                if not ids:
+                    del self._index[field][value]
+
+
+order_store = OrderStore()
@@ -1,9 +1,16 @@
 """Сервис для управления заказами"""
 from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-from src.services.firebase import FirebaseService
+from datetime import datetime
+from src.services.firebase import FirebaseService, ORDER_SUMMARY_FIELDS
+from src.services.cards import card_updater
+from src.services.regions import region_registry
+from src.utils.timezones import get_timezone, local_date
 from src.utils.formatters import format_order_card
 from src.utils.keyboards import get_order_keyboard
+from src.utils.validators import make_dedupe_key
+
+# Размер страницы в списках заказов
+ORDERS_PAGE_SIZE = 10
 
 
 class OrderService:
@@ -12,20 +19,13 @@ class OrderService:
     @staticmethod
     async def create_order_from_webapp(data: Dict[str, Any], operator_id: str) -> Dict[str, Any]:
         """Создать заказ из данных Web App"""
-        # Проверка на дубликат
         phone = data.get('customer', {}).get('phone', '')
         delivery_date = data.get('deliveryDate', '')
         
-        duplicate = FirebaseService.check_duplicate_order(phone, delivery_date)
-        if duplicate:
-            return {
-                'success': False,
-                'error': 'duplicate',
-                'message': f'Найден дубликат заказа: {duplicate.get("idHuman", duplicate.get("id"))}'
-            }
-        
-        # Определяем статус
-        today = datetime.now().strftime('%Y-%m-%d')
+        # Определяем статус ("сегодня" - в часовом поясе региона)
+        tz = region_registry.timezone_of(data.get('regionId'))
+        now = datetime.now(tz)
+        today = now.strftime('%Y-%m-%d')
         if delivery_date == today:
             status = 'PUBLISHED_TODAY'
         else:
@@ -33,7 +33,7 @@ class OrderService:
         
         # Формируем данные заказа
         order_data = {
-            'idHuman': f"#{datetime.now().strftime('%y%m%d')}{datetime.now().strftime('%H%M%S')[-4:]}",
+            'idHuman': f"#{now.strftime('%y%m%d')}{now.strftime('%H%M%S')[-4:]}",
             'status': status,
             'customer': data.get('customer', {}),
             'items': data.get('items', []),
@@ -48,14 +48,26 @@ class OrderService:
             'history': [{
                 'by': operator_id,
                 'to': status,
-                'at': datetime.now().isoformat(),
+                'at': now.isoformat(),
                 'note': 'Заказ создан через Web App',
             }]
         }
         
-        # Создаем заказ
-        order_id = FirebaseService.create_order(order_data)
+        # Создаем заказ; проверка дубликата - в той же транзакции
+        result = await FirebaseService.create_order(
+            order_data,
+            dedupe_key=make_dedupe_key(phone, delivery_date)
+        )
+        
+        if not result.get('success'):
+            duplicate = result.get('duplicate', {})
+            return {
+                'success': False,
+                'error': 'duplicate',
+                'message': f'Найден дубликат заказа: {duplicate.get("idHuman") or duplicate.get("id")}'
+            }
         
+        order_id = result['order_id']
         return {
             'success': True,
             'order_id': order_id,
@@ -72,40 +84,36 @@ class OrderService:
         note: Optional[str] = None
     ) -> Dict[str, Any]:
         """Обновить статус заказа"""
-        order = FirebaseService.get_order(order_id)
-        if not order:
-            return {'success': False, 'error': 'Order not found'}
-        
-        # Проверка прав
-        if user_role == 'courier' and order.get('courierId') != user_id:
-            if order.get('status') != 'PUBLISHED_TODAY':
-                return {'success': False, 'error': 'Permission denied'}
+        def check_permission(order: Dict[str, Any]) -> Optional[str]:
+            # Проверка прав
+            if user_role == 'courier' and order.get('courierId') != user_id:
+                if order.get('status') != 'PUBLISHED_TODAY':
+                    return 'Permission denied'
+            return None
         
-        # Обновляем статус
+        # Обновляем статус: чтение, проверка и запись - одна транзакция
         courier_id = user_id if user_role == 'courier' and new_status == 'ASSIGNED' else None
         
-        success = FirebaseService.update_order_status(
+        result = await FirebaseService.transition_order_status(
             order_id=order_id,
             new_status=new_status,
             user_id=user_id,
             reason_code=reason_code,
             note=note,
-            courier_id=courier_id
+            courier_id=courier_id,
+            check=check_permission
         )
         
-        if success:
-            updated_order = FirebaseService.get_order(order_id)
-            return {
-                'success': True,
-                'order': updated_order
-            }
+        # Карточка в региональном чате обновляется (с объединением правок)
+        if result.get('success'):
+            card_updater.schedule(result['order'])
         
-        return {'success': False, 'error': 'Update failed'}
+        return result
     
     @staticmethod
     async def get_order_for_display(order_id: str, user_role: str) -> Optional[Dict[str, Any]]:
         """Получить заказ с форматированием для отображения"""
-        order = FirebaseService.get_order(order_id)
+        order = await FirebaseService.get_order(order_id)
         if not order:
             return None
         
@@ -116,26 +124,78 @@ class OrderService:
         return order
     
     @staticmethod
-    async def get_orders_for_user(user_id: str, user_role: str, filter_type: str = 'all') -> List[Dict[str, Any]]:
+    async def get_orders_for_user(
+        user_id: str,
+        user_role: str,
+        filter_type: str = 'all',
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """Получить заказы для пользователя"""
+        page = {'limit': limit, 'start_after': start_after, 'end_before': end_before, 'fields': fields}
+        
         if filter_type == 'action' and user_role in ['operator', 'admin']:
-            return FirebaseService.get_orders_requiring_action(user_id)
+            return await FirebaseService.get_orders_requiring_action(user_id, **page)
         
+        # Списки не привязаны к региону: даты в DEFAULT_TIMEZONE
         if filter_type == 'today':
-            today = datetime.now().strftime('%Y-%m-%d')
+            today = local_date(get_timezone())
             if user_role == 'courier':
-                return FirebaseService.get_courier_orders(user_id, today)
-            return FirebaseService.get_orders_by_date(today)
+                return await FirebaseService.get_courier_orders(user_id, today, **page)
+            return await FirebaseService.get_orders_by_date(today, **page)
         
         if filter_type == 'tomorrow':
-            tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+            tomorrow = local_date(get_timezone(), days=1)
             if user_role == 'courier':
-                return FirebaseService.get_courier_orders(user_id, tomorrow)
-            return FirebaseService.get_orders_by_date(tomorrow)
+                return await FirebaseService.get_courier_orders(user_id, tomorrow, **page)
+            return await FirebaseService.get_orders_by_date(tomorrow, **page)
         
         if user_role == 'courier':
-            return FirebaseService.get_courier_orders(user_id)
+            return await FirebaseService.get_courier_orders(user_id, **page)
         
         # Для операторов и логистов - все заказы
-        return FirebaseService.get_orders_by_status('NEW')
-
+        return await FirebaseService.get_orders_by_status('NEW', **page)
+    
+    @staticmethod
+    async def get_orders_page(
+        user_id: str,
+        user_role: str,
+        filter_type: str = 'all',
+        page_size: int = ORDERS_PAGE_SIZE,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Получить страницу заказов для пользователя.
+        
+        Запрашивается на один заказ больше размера страницы, чтобы узнать,
+        есть ли следующая (или предыдущая) страница. Курсоры - ID первого
+        и последнего заказа страницы. Заказы возвращаются только с полями
+        ORDER_SUMMARY_FIELDS, нужными format_order_list.
+        """
+        orders = await OrderService.get_orders_for_user(
+            user_id,
+            user_role,
+            filter_type,
+            limit=page_size + 1,
+            start_after=start_after,
+            end_before=end_before,
+            fields=ORDER_SUMMARY_FIELDS
+        )
+        
+        if end_before:
+            # Листаем назад: следующая страница точно есть
+            has_prev = len(orders) > page_size
+            orders = orders[-page_size:]
+            has_next = True
+        else:
+            has_next = len(orders) > page_size
+            orders = orders[:page_size]
+            has_prev = start_after is not None
+        
+        return {
+            'orders': orders,
+            'prev_cursor': orders[0]['id'] if orders and has_prev else None,
+            'next_cursor': orders[-1]['id'] if orders and has_next else None,
+        }
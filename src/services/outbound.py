@@ -0,0 +1,271 @@
+"""Очередь исходящих запросов к Telegram с учетом лимитов и приоритетов"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from src.config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_PRIVATE_CHAT_RATE,
+    OUTBOUND_GROUP_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_MAX_RETRIES,
+)
+from src.utils.rate_limit import TokenBucket
+
+# Приоритеты: меньше - раньше
+PRIORITY_INTERACTIVE = 0  # ответы на действия пользователя
+PRIORITY_NORMAL = 1       # уведомления и отчеты
+PRIORITY_BULK = 2         # массовая публикация (перекат очереди)
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_BULK: 'bulk',
+}
+
+# Сколько последних ожиданий хранить для метрик
+WAIT_SAMPLES = 1000
+
+# Приоритет запросов текущей задачи (обработчик обновления, задача планировщика)
+_priority: ContextVar[int] = ContextVar('outbound_priority', default=PRIORITY_NORMAL)
+
+
+@contextmanager
+def outbound_priority(priority: int) -> Iterator[None]:
+    """Отправлять запросы внутри блока с приоритетом priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Приоритет запросов текущей задачи"""
+    return _priority.get()
+
+
+def _is_group(chat_id: Any) -> bool:
+    # У групп и каналов отрицательный ID или @username
+    return str(chat_id).startswith(('-', '@'))
+
+
+class _Job:
+    """Запрос в очереди"""
+
+    __slots__ = ('priority', 'seq', 'call', 'future', 'enqueued_at', 'attempts')
+
+    def __init__(self, priority: int, seq: int, call: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.call = call
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _ChatState:
+    """Очередь и лимит одного чата"""
+
+    __slots__ = ('bucket', 'queue', 'busy', 'blocked_until')
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.queue: List[Tuple[int, int, _Job]] = []
+        # В чат отправляется по одному запросу: сообщения не перемешиваются,
+        # а после retry_after запрос повторяется первым
+        self.busy = False
+        self.blocked_until = 0.0
+
+    def ready_at(self, now: float) -> float:
+        return max(self.blocked_until, now + self.bucket.delay(now))
+
+
+class OutboundQueue:
+    """Центральная очередь исходящих запросов к Telegram.
+
+    Лимиты: общий token bucket (OUTBOUND_GLOBAL_RATE в секунду) и bucket
+    на каждый чат (личные чаты - OUTBOUND_PRIVATE_CHAT_RATE в секунду,
+    группы - OUTBOUND_GROUP_CHAT_RATE в минуту). Из чатов, которые можно
+    обслужить сейчас, выбирается запрос с лучшим приоритетом (при равном -
+    более ранний). На 429 чат блокируется на retry_after, запрос
+    повторяется до OUTBOUND_MAX_RETRIES раз.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_RATE)
+        self._chats: Dict[str, _ChatState] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+        # Метрики
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+        self._in_flight = 0
+        self._waits: Dict[int, Deque[float]] = {
+            priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES
+        }
+
+    async def submit(
+        self,
+        chat_id: Any,
+        call: Callable[[], Awaitable[Any]],
+        priority: Optional[int] = None
+    ) -> Any:
+        """Поставить запрос в очередь чата и дождаться результата.
+
+        call вызывается, когда лимиты позволяют (и повторно после 429).
+        Исключения call пробрасываются вызывающему.
+        """
+        self._ensure_worker()
+        priority = current_priority() if priority is None else priority
+
+        key = str(chat_id)
+        state = self._chats.get(key)
+        if state is None:
+            if _is_group(chat_id):
+                bucket = TokenBucket(OUTBOUND_GROUP_CHAT_RATE / 60, OUTBOUND_CHAT_BURST)
+            else:
+                bucket = TokenBucket(OUTBOUND_PRIVATE_CHAT_RATE, OUTBOUND_CHAT_BURST)
+            state = self._chats[key] = _ChatState(bucket)
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(priority, next(self._seq), call, future)
+        heapq.heappush(state.queue, (job.priority, job.seq, job))
+        self._wakeup.set()
+        return await future
+
+    def metrics(self) -> Dict[str, Any]:
+        """Глубина очереди, ожидание в очереди и счетчики отправок"""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for state in self._chats.values():
+            for priority, _, _ in state.queue:
+                depth[PRIORITY_NAMES[priority]] += 1
+
+        wait_ms = {}
+        for priority, samples in self._waits.items():
+            values = sorted(samples) or [0.0]
+            wait_ms[PRIORITY_NAMES[priority]] = {
+                'avg': round(sum(values) / len(values) * 1000, 1),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+                'max': round(values[-1] * 1000, 1),
+            }
+
+        return {
+            'depth': depth,
+            'depth_total': sum(depth.values()),
+            'in_flight': self._in_flight,
+            'chats': len(self._chats),
+            'blocked_chats': sum(1 for state in self._chats.values() if state.blocked_until > time.monotonic()),
+            'sent': self._sent,
+            'failed': self._failed,
+            'retries': self._retries,
+            'wait_ms': wait_ms,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Выдавать запросы по мере появления токенов"""
+        while True:
+            job, state, wait = self._pick(time.monotonic())
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Токены и занятость чата фиксируются до запуска задачи,
+            # чтобы следующий _pick их уже учитывал
+            now = time.monotonic()
+            self._global.take(now)
+            state.bucket.take(now)
+            state.busy = True
+            task = asyncio.create_task(self._execute(job, state, now))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _pick(self, now: float) -> Tuple[Optional[_Job], Optional[_ChatState], Optional[float]]:
+        """Выбрать следующий запрос или вернуть, сколько ждать"""
+        global_delay = self._global.delay(now)
+        best: Optional[Tuple[int, int, _Job]] = None
+        best_state: Optional[_ChatState] = None
+        next_ready: Optional[float] = None
+
+        for key, state in list(self._chats.items()):
+            # Отмененные вызывающим запросы просто выбрасываем
+            while state.queue and state.queue[0][2].future.done():
+                heapq.heappop(state.queue)
+
+            if not state.queue:
+                if not state.busy and state.blocked_until <= now and state.bucket.full:
+                    del self._chats[key]
+                continue
+            if state.busy:
+                continue
+
+            ready_at = state.ready_at(now)
+            if ready_at > now:
+                next_ready = ready_at if next_ready is None else min(next_ready, ready_at)
+                continue
+            if best is None or state.queue[0][:2] < best[:2]:
+                best, best_state = state.queue[0], state
+
+        if best is None:
+            return None, None, None if next_ready is None else next_ready - now
+        if global_delay > 0:
+            return None, None, global_delay
+
+        heapq.heappop(best_state.queue)
+        return best[2], best_state, None
+
+    async def _execute(self, job: _Job, state: _ChatState, started_at: float) -> None:
+        self._in_flight += 1
+        if job.attempts == 0:
+            self._waits[job.priority].append(started_at - job.enqueued_at)
+
+        try:
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            state.blocked_until = time.monotonic() + e.retry_after
+            if job.attempts < OUTBOUND_MAX_RETRIES and not job.future.done():
+                job.attempts += 1
+                self._retries += 1
+                print(f"⏳ Telegram 429: чат заблокирован на {e.retry_after} с, повтор {job.attempts}/{OUTBOUND_MAX_RETRIES}")
+                # Тот же seq: запрос останется первым в очереди чата
+                heapq.heappush(state.queue, (job.priority, job.seq, job))
+            else:
+                self._fail(job, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self._sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            state.busy = False
+            self._in_flight -= 1
+            self._wakeup.set()
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        self._failed += 1
+        if not job.future.done():
+            job.future.set_exception(error)
+
+
+outbound_queue = OutboundQueue()
@@ -0,0 +1,98 @@
+"""Реестр регионов в памяти"""
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from src.services.firebase import FirebaseService, DocumentChange
+from src.utils.timezones import region_timezone
+
+
+class RegionRegistry:
+    """Регионы, загруженные один раз при старте.
+
+    Регионов немного и меняются они редко, поэтому чат и топики региона
+    берутся из словаря, а актуальность поддерживает snapshot-листенер
+    на коллекции ``regions``.
+    """
+
+    def __init__(self):
+        self._regions: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._watch = None
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self) -> None:
+        """Загрузить все регионы"""
+        regions = await FirebaseService.get_all_regions()
+        self._regions = {region['id']: region for region in regions}
+        self._loaded = True
+        print(f"✅ Загружено регионов: {len(self._regions)}")
+
+    def start_listener(self) -> None:
+        """Запустить snapshot-листенер на коллекции regions"""
+        if self._watch is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._watch = FirebaseService.watch_collection('regions', self._apply_changes, loop)
+
+    def stop_listener(self) -> None:
+        """Остановить snapshot-листенер"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    async def get(self, region_id: str) -> Optional[Dict[str, Any]]:
+        """Получить регион по ID"""
+        if not region_id:
+            return None
+
+        region = self._regions.get(region_id)
+        if region is None and not self._loaded:
+            # Реестр еще не прогрет - читаем напрямую
+            region = await FirebaseService.get_region(region_id)
+            if region:
+                self._regions[region_id] = region
+        return region
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Все регионы"""
+        return list(self._regions.values())
+
+    def timezone_of(self, region_id: Optional[str]) -> ZoneInfo:
+        """Часовой пояс региона (DEFAULT_TIMEZONE для неизвестного региона)"""
+        return region_timezone(self._regions.get(region_id) if region_id else None)
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Вызывать callback после каждого изменения реестра"""
+        self._listeners.append(callback)
+
+    async def get_chat_target(self, region_id: str, status: str) -> Tuple[Optional[str], Optional[int]]:
+        """Получить (chat_id, topic_id) региона для заказа в статусе status"""
+        region = await self.get(region_id)
+        if not region:
+            return None, None
+
+        topics = region.get('topics', {})
+        topic_id = None
+        if status == 'PUBLISHED_TODAY':
+            topic_id = topics.get('todayTopicId')
+        elif status == 'QUEUED_TOMORROW':
+            topic_id = topics.get('tomorrowQueueId')
+
+        return region.get('telegramChatId'), int(topic_id) if topic_id else None
+
+    def _apply_changes(self, changes: List[DocumentChange]) -> None:
+        for change_type, doc_id, data in changes:
+            if change_type == 'REMOVED':
+                self._regions.pop(doc_id, None)
+            else:
+                self._regions[doc_id] = {'id': doc_id, **data}
+        for callback in self._listeners:
+            callback()
+
+
+region_registry = RegionRegistry()
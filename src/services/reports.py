@@ -0,0 +1,61 @@
+"""Сервис для подготовки отчетов"""
+from typing import Any, Dict, List, Optional
+
+from src.services.firebase import FirebaseService
+from src.services.regions import region_registry
+
+
+class ReportService:
+    """Статистика заказов для отчетов"""
+
+    @staticmethod
+    def _build_stats(aggregates: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+        """Свернуть агрегаты по статусам в статистику для форматтеров"""
+        by_status = {status: int(values['count']) for status, values in aggregates.items()}
+        return {
+            'byStatus': by_status,
+            'total': sum(by_status.values()),
+            'totalAmount': sum(values['amount'] for values in aggregates.values()),
+            'deliveredAmount': aggregates.get('DELIVERED', {}).get('amount', 0),
+        }
+
+    @staticmethod
+    def _merge_regions(region_aggregates: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+        """Сложить агрегаты по статусам нескольких регионов"""
+        aggregates: Dict[str, Dict[str, float]] = {}
+        for statuses in region_aggregates:
+            for status, values in statuses.items():
+                total = aggregates.setdefault(status, {'count': 0, 'amount': 0})
+                total['count'] += values['count']
+                total['amount'] += values['amount']
+        return aggregates
+
+    @staticmethod
+    async def get_day_stats(date: str, region_id: Optional[str] = None) -> Dict[str, Any]:
+        """Статистика заказов за дату (по дневным счетчикам, без чтения заказов)"""
+        counters = await FirebaseService.get_daily_counters(date, region_id)
+        return ReportService._build_stats(ReportService._merge_regions(list(counters.values())))
+
+    @staticmethod
+    async def get_day_stats_for_regions(
+        date: str,
+        region_ids: Optional[List[str]] = None,
+        include_unassigned: bool = False
+    ) -> Dict[str, Any]:
+        """Суммарная статистика за дату по регионам region_ids.
+
+        region_ids=None - все заказы. include_unassigned - добавить заказы
+        без региона или с регионом, которого нет в реестре.
+        """
+        if region_ids is None:
+            return await ReportService.get_day_stats(date)
+
+        counters = await FirebaseService.get_daily_counters(date)
+        known = {region['id'] for region in region_registry.all()}
+        selected = set(region_ids)
+
+        return ReportService._build_stats(ReportService._merge_regions([
+            region_aggregates
+            for region_id, region_aggregates in counters.items()
+            if region_id in selected or (include_unassigned and region_id not in known)
+        ]))
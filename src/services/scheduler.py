@@ -1,231 +1,437 @@
 """Планировщик автоматических задач"""
+import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
-from typing import Optional
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES, JobEvent
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 from src.services.firebase import FirebaseService
 from src.services.notifications import NotificationService
+from src.services.reports import ReportService
+from src.services.regions import region_registry
+from src.services.job_runs import JobRunLog
+from src.utils.tasks import spawn
+from src.utils.timezones import get_timezone, region_timezone, local_date
 from src.config import (
+    DEFAULT_TIMEZONE,
     SCHEDULE_MOVE_TO_TODAY,
     SCHEDULE_MORNING_REPORT,
     SCHEDULE_DAY_REPORT,
-    SCHEDULE_SLA_CHECK,
-    SLA_NO_ANSWER_RETRY,
-    SLA_BAD_NUMBER_ESCALATION
+    SCHEDULE_COUNTERS_RECONCILE,
+    SCHEDULE_STAGGER_SECONDS,
+    SCHEDULER_DB_PATH,
+    SCHEDULER_MISFIRE_GRACE,
+    SCHEDULER_JOB_TIMEOUT
 )
 from aiogram import Bot
 
+# Предельная длительность задач (секунды); остальные - SCHEDULER_JOB_TIMEOUT.
+# None - без общего ограничения: публикация переката упирается в лимит
+# сообщений группы и длится столько, сколько заказов в регионе, поэтому
+# ограничена только смена статусов (ROLLOVER_STORAGE_TIMEOUT)
+JOB_TIMEOUTS = {
+    'move_tomorrow_to_today': None,
+    'send_morning_report': 300,
+    'send_day_report': 300,
+    'reconcile_daily_counters': 900,
+}
+
+# Предельная длительность смены статусов при перекате (секунды)
+ROLLOVER_STORAGE_TIMEOUT = 300
+
+# Запуск позже плановой даты больше чем на столько секунд - догоняющий
+CATCH_UP_THRESHOLD = 60
+
+# Время задач по умолчанию; регион переопределяет его полем schedule
+REGION_SCHEDULE_DEFAULTS = {
+    'moveToToday': SCHEDULE_MOVE_TO_TODAY,
+    'morningReport': SCHEDULE_MORNING_REPORT,
+    'dayReport': SCHEDULE_DAY_REPORT,
+}
+
+# Через сколько секунд после изменения регионов пересобрать расписание
+REGIONS_RESYNC_DELAY = 2
+
+# Экземпляр сервиса процесса: задачи в хранилище ссылаются на run_job по
+# строке и не могут хранить бота
+_service: Optional['SchedulerService'] = None
+
+
+def _region_time(region: Dict[str, Any], key: str) -> str:
+    """Время задачи key (HH:MM) по расписанию региона или по умолчанию"""
+    default = REGION_SCHEDULE_DEFAULTS[key]
+    value = (region.get('schedule') or {}).get(key)
+    if not value:
+        return default
+    try:
+        hour, minute = (int(part) for part in str(value).split(':'))
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            return f'{hour:02d}:{minute:02d}'
+    except ValueError:
+        pass
+    print(f"⚠️ Неверное время {key}={value!r} у региона {region.get('id')}, используется {default}")
+    return default
+
+
+def _daily(at: str, tz: str, offset: int = 0) -> CronTrigger:
+    """Ежедневный триггер на время at (HH:MM) в поясе tz, сдвинутый на offset секунд"""
+    hour, minute = (int(part) for part in at.split(':'))
+    total = (hour * 3600 + minute * 60 + offset) % 86400
+    return CronTrigger(hour=total // 3600, minute=total // 60 % 60, second=total % 60, timezone=tz)
+
+
+async def run_job(job_id: str, method: str, **params: Any) -> None:
+    """Точка входа всех задач планировщика.
+    
+    Выполняет метод SchedulerService с параметрами params и ограничением
+    по времени (JOB_TIMEOUTS) и записывает запуск в job_runs.
+    """
+    service = _service
+    if service is None:
+        print(f"⚠️ Задача {job_id} пропущена: планировщик не запущен")
+        return
+    
+    scheduled_at = service.scheduled.pop(job_id, None)
+    
+    # Копия могла стать ведущей после того, как запуск выполнила предыдущая
+    if scheduled_at and not await FirebaseService.claim_scheduled_run(job_id, scheduled_at):
+        print(f"⏭ Задача {job_id} на {scheduled_at.isoformat()} уже выполнена другой копией")
+        await service.runs.record(job_id, 'skipped', scheduled_at, error='Выполнена другой копией')
+        return
+    
+    started_at = datetime.now(timezone.utc)
+    timeout = JOB_TIMEOUTS.get(method, SCHEDULER_JOB_TIMEOUT)
+    status, error = 'ok', None
+    try:
+        await asyncio.wait_for(getattr(service, method)(**params), timeout=timeout)
+    except asyncio.TimeoutError:
+        status, error = 'timeout', f'Превышено время выполнения {timeout} с'
+    except Exception as e:
+        status, error = 'error', repr(e)
+    finished_at = datetime.now(timezone.utc)
+    
+    duration = (finished_at - started_at).total_seconds()
+    if status == 'ok':
+        print(f"✅ Задача {job_id} выполнена за {duration:.1f} с")
+    else:
+        print(f"❌ Задача {job_id}: {error} ({duration:.1f} с)")
+    await service.runs.record(job_id, status, scheduled_at, started_at, finished_at, error)
+
+
+async def recent_job_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Последние запуски задач этой копии из job_runs (пусто, если планировщик не запущен)"""
+    service = _service
+    if service is None:
+        return []
+    return await service.runs.recent(limit)
+
 
 class SchedulerService:
-    """Сервис для планирования задач"""
+    """Сервис для планирования задач.
+    
+    Задачи хранятся в SQLite (SCHEDULER_DB_PATH) и переживают перезапуск:
+    пропущенный за время простоя запуск выполняется один раз при старте,
+    если опоздание меньше SCHEDULER_MISFIRE_GRACE. Одна задача не
+    выполняется параллельно сама с собой (max_instances=1).
+    
+    Перекат и отчеты строятся по реестру регионов в часовом поясе региона
+    (поле tz) и пересобираются при изменении регионов.
+    """
     
     def __init__(self, bot: Bot):
-        self.scheduler = AsyncIOScheduler()
+        self.scheduler = AsyncIOScheduler(
+            jobstores={'default': SQLAlchemyJobStore(url=f'sqlite:///{SCHEDULER_DB_PATH}')},
+            job_defaults={
+                'coalesce': True,
+                'misfire_grace_time': SCHEDULER_MISFIRE_GRACE,
+                'max_instances': 1,
+            }
+        )
         self.bot = bot
         self.notification_service = NotificationService(bot)
+        self.runs = JobRunLog(SCHEDULER_DB_PATH)
+        # ID задачи -> плановое время текущего запуска
+        self.scheduled: Dict[str, datetime] = {}
+        self._resync: Optional[asyncio.TimerHandle] = None
     
-    def start(self):
-        """Запустить планировщик"""
-        # Перекат заказов "Завтра" → "Сегодня" в 07:30
-        hour, minute = SCHEDULE_MOVE_TO_TODAY.split(':')
-        self.scheduler.add_job(
-            self.move_tomorrow_to_today,
-            trigger=CronTrigger(hour=int(hour), minute=int(minute)),
-            id='move_tomorrow_to_today',
-            name='Перекат заказов на сегодня'
-        )
+    def _jobs(self) -> Dict[str, Dict]:
+        """Задачи по расписанию: ID -> параметры add_job"""
+        jobs: Dict[str, Dict] = {}
+        regions = sorted(region_registry.all(), key=lambda region: region['id'])
         
-        # Утренний отчет в 09:00
-        hour, minute = SCHEDULE_MORNING_REPORT.split(':')
-        self.scheduler.add_job(
-            self.send_morning_report,
-            trigger=CronTrigger(hour=int(hour), minute=int(minute)),
-            id='morning_report',
-            name='Утренний отчет'
-        )
+        # Перекат "Завтра" → "Сегодня" - отдельно для каждого региона; регионы
+        # с одним поясом и временем сдвигаются на SCHEDULE_STAGGER_SECONDS,
+        # чтобы не упираться одновременно в Firestore и лимиты Telegram
+        stagger: Dict[Tuple[str, str], int] = {}
+        for region in regions:
+            group = (str(region_timezone(region)), _region_time(region, 'moveToToday'))
+            index = stagger.get(group, 0)
+            stagger[group] = index + 1
+            
+            job_id = f"move_tomorrow_to_today:{region['id']}"
+            jobs[job_id] = {
+                'trigger': _daily(group[1], group[0], index * SCHEDULE_STAGGER_SECONDS),
+                'kwargs': {'job_id': job_id, 'method': 'move_tomorrow_to_today', 'region_id': region['id']},
+                'name': f"Перекат заказов на сегодня ({region.get('name', region['id'])})",
+            }
         
-        # Сводка дня в 20:00
-        hour, minute = SCHEDULE_DAY_REPORT.split(':')
-        self.scheduler.add_job(
-            self.send_day_report,
-            trigger=CronTrigger(hour=int(hour), minute=int(minute)),
-            id='day_report',
-            name='Сводка дня'
-        )
+        # Заказы без известного региона - в DEFAULT_TIMEZONE после регионов этого пояса
+        group = (DEFAULT_TIMEZONE, SCHEDULE_MOVE_TO_TODAY)
+        jobs['move_tomorrow_to_today'] = {
+            'trigger': _daily(group[1], group[0], stagger.get(group, 0) * SCHEDULE_STAGGER_SECONDS),
+            'kwargs': {'job_id': 'move_tomorrow_to_today', 'method': 'move_tomorrow_to_today', 'region_id': None},
+            'name': 'Перекат заказов на сегодня (без региона)',
+        }
+        
+        # Отчеты - по одному на часовой пояс и время; заказы без региона
+        # попадают в отчет DEFAULT_TIMEZONE со временем по умолчанию
+        for key, prefix, method, name in (
+            ('morningReport', 'morning_report', 'send_morning_report', 'Утренний отчет'),
+            ('dayReport', 'day_report', 'send_day_report', 'Сводка дня'),
+        ):
+            groups: Dict[Tuple[str, str], List[str]] = {}
+            for region in regions:
+                groups.setdefault((str(region_timezone(region)), _region_time(region, key)), []).append(region['id'])
+            unassigned = (DEFAULT_TIMEZONE, REGION_SCHEDULE_DEFAULTS[key])
+            groups.setdefault(unassigned, [])
+            
+            for (tz, at), region_ids in groups.items():
+                job_id = f'{prefix}:{tz}:{at}'
+                jobs[job_id] = {
+                    'trigger': _daily(at, tz),
+                    'kwargs': {
+                        'job_id': job_id,
+                        'method': method,
+                        'tz': tz,
+                        'region_ids': region_ids,
+                        'include_unassigned': (tz, at) == unassigned,
+                    },
+                    'name': f'{name} ({tz} {at})',
+                }
+        
+        # Сверка дневных счетчиков: пишет только разницу инкрементами,
+        # поэтому время не обязано быть ночью во всех регионах
+        jobs['reconcile_counters'] = {
+            'trigger': _daily(SCHEDULE_COUNTERS_RECONCILE, DEFAULT_TIMEZONE),
+            'kwargs': {'job_id': 'reconcile_counters', 'method': 'reconcile_daily_counters'},
+            'name': 'Сверка дневных счетчиков',
+        }
+        return jobs
+    
+    def start(self, paused: bool = False):
+        """Запустить планировщик (paused - до вызова resume)"""
+        global _service
+        _service = self
+        
+        self.scheduler.add_listener(self._on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+        
+        # Хранилище открывается при старте; до синхронизации задач не выполняем
+        self.scheduler.start(paused=True)
+        self._sync_jobs()
+        region_registry.add_listener(self._on_regions_changed)
+        if not paused:
+            self.scheduler.resume()
+        print("✅ Планировщик задач запущен" + (" (ожидает resume)" if paused else ""))
+    
+    def pause(self):
+        """Приостановить запуск задач (копия перестала быть ведущей)"""
+        self.scheduler.pause()
+        print("⏸ Планировщик приостановлен")
+    
+    def resume(self):
+        """Возобновить запуск задач; пропущенные запуски догоняются"""
+        self.scheduler.resume()
+        print("▶️ Планировщик возобновлен")
+    
+    def _sync_jobs(self) -> None:
+        """Привести сохраненные задачи к текущему расписанию.
+        
+        add_job(replace_existing=True) пересчитал бы время следующего
+        запуска и потерял пропущенный за простой запуск, поэтому задача
+        пересоздается, только если изменились расписание или параметры.
+        """
+        jobs = self._jobs()
+        removed = changed = 0
+        
+        for job in self.scheduler.get_jobs():
+            if job.id not in jobs:
+                # Задача убрана из расписания (например, удален регион)
+                job.remove()
+                removed += 1
         
-        # Проверка SLA каждые 10 минут
-        if SCHEDULE_SLA_CHECK.startswith('*/'):
-            minutes = int(SCHEDULE_SLA_CHECK.split('/')[1])
+        for job_id, params in jobs.items():
+            existing = self.scheduler.get_job(job_id)
+            if existing and repr(existing.trigger) == repr(params['trigger']) and existing.kwargs == params['kwargs']:
+                continue
             self.scheduler.add_job(
-                self.check_sla,
-                trigger=CronTrigger(minute=f'*/{minutes}'),
-                id='sla_check',
-                name='Проверка SLA'
+                'src.services.scheduler:run_job',
+                id=job_id,
+                replace_existing=True,
+                **params
             )
+            changed += 1
         
-        self.scheduler.start()
-        print("✅ Планировщик задач запущен")
+        if removed or changed:
+            print(f"🔄 Расписание обновлено: задач {len(jobs)}, изменено {changed}, удалено {removed}")
+    
+    def _on_regions_changed(self) -> None:
+        """Пересобрать расписание после серии изменений регионов"""
+        if not self.scheduler.running:
+            return
+        if self._resync is not None:
+            self._resync.cancel()
+        self._resync = asyncio.get_running_loop().call_later(REGIONS_RESYNC_DELAY, self._sync_jobs)
+    
+    def _on_job_event(self, event: JobEvent) -> None:
+        """Плановое время запусков, пропуски и наложения запусков"""
+        if event.code == EVENT_JOB_SUBMITTED:
+            scheduled_at = event.scheduled_run_times[-1]
+            self.scheduled[event.job_id] = scheduled_at
+            late = (datetime.now(timezone.utc) - scheduled_at).total_seconds()
+            if late > CATCH_UP_THRESHOLD:
+                print(f"⏰ Догоняющий запуск {event.job_id}: опоздание {late:.0f} с")
+            return
+        
+        if event.code == EVENT_JOB_MISSED:
+            status, error = 'missed', f'Опоздание больше {SCHEDULER_MISFIRE_GRACE} с'
+        else:
+            status, error = 'skipped', 'Предыдущий запуск еще выполняется'
+        print(f"⚠️ Задача {event.job_id} не запущена: {error}")
+        spawn(self.runs.record(event.job_id, status, event.scheduled_run_time, error=error), name=f'job-run-{event.job_id}')
     
     def stop(self):
         """Остановить планировщик"""
-        self.scheduler.shutdown()
-    
-    async def move_tomorrow_to_today(self):
-        """Перекатить заказы из очереди 'Завтра' в 'Сегодня'"""
-        print(f"[{datetime.now()}] Перекат заказов на сегодня...")
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        tomorrow_orders = FirebaseService.get_orders_by_status('QUEUED_TOMORROW')
-        
-        moved_count = 0
-        for order in tomorrow_orders:
-            # Проверяем, что дата доставки сегодня
-            if order.get('deliveryDate') == today:
-                # Обновляем статус
-                FirebaseService.update_order_status(
-                    order_id=order.get('id'),
-                    new_status='PUBLISHED_TODAY',
-                    user_id='system',
-                    note='Автоматический перекат на сегодня'
-                )
-                
-                # Отправляем в региональный чат
-                updated_order = FirebaseService.get_order(order.get('id'))
-                if updated_order:
-                    await self.notification_service.send_order_to_region_chat(updated_order)
-                
-                moved_count += 1
-        
-        print(f"✅ Перекачено заказов: {moved_count}")
-    
-    async def send_morning_report(self):
-        """Отправить утренний отчет логистам"""
-        print(f"[{datetime.now()}] Отправка утреннего отчета...")
-        
-        today = datetime.now().strftime('%Y-%m-%d')
-        orders = FirebaseService.get_orders_by_date(today)
-        
-        # Подсчитываем по статусам
-        statuses = {}
-        for order in orders:
-            status = order.get('status', 'NEW')
-            statuses[status] = statuses.get(status, 0) + 1
+        global _service
+        if self._resync is not None:
+            self._resync.cancel()
+        self.scheduler.shutdown(wait=False)
+        self.runs.close()
+        _service = None
+    
+    async def move_tomorrow_to_today(self, region_id: Optional[str] = None):
+        """Перекатить заказы региона из очереди 'Завтра' в 'Сегодня'.
+        
+        "Сегодня" - в часовом поясе региона; region_id=None - заказы без
+        региона или с регионом, которого нет в реестре.
+        """
+        tz = region_registry.timezone_of(region_id)
+        print(f"[{datetime.now(tz)}] Перекат заказов на сегодня ({region_id or 'без региона'})...")
+        
+        today = local_date(tz)
+        
+        async def transition() -> Dict[str, Any]:
+            # Один запрос по статусу и дате, пакетная смена статуса
+            queued_orders = await FirebaseService.get_queued_orders(today, region_id)
+            if region_id is None:
+                known = {region['id'] for region in region_registry.all()}
+                queued_orders = [order for order in queued_orders if order.get('regionId') not in known]
+            
+            return await FirebaseService.transition_orders_batch(
+                queued_orders,
+                new_status='PUBLISHED_TODAY',
+                user_id='system',
+                note='Автоматический перекат на сегодня'
+            )
+        
+        # Ограничена по времени только смена статусов: публикацию не прерываем
+        try:
+            moved = await asyncio.wait_for(transition(), timeout=ROLLOVER_STORAGE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Смена статусов не уложилась в {ROLLOVER_STORAGE_TIMEOUT} с")
+        print(f"✅ Перекачено заказов: {len(moved['orders'])}")
+        if moved['skipped']:
+            print(f"⚠️ Пропущено заказов (статус уже изменен): {len(moved['skipped'])}")
+        
+        # Публикуем по регионам параллельно, в том числе при ошибке части пакетов
+        published = await self.notification_service.publish_orders(moved['orders'])
+        print(f"✅ Опубликовано в региональные чаты: {published}")
+        
+        if moved['errors']:
+            raise RuntimeError(
+                f"Не удалось перекатить пакетов: {len(moved['errors'])} ({moved['errors'][0]})"
+            )
+    
+    @staticmethod
+    def _regions_header(region_ids: Optional[List[str]], include_unassigned: bool) -> Optional[str]:
+        """Строка с регионами отчета, если отчет охватывает не все регионы"""
+        regions = region_registry.all()
+        if region_ids is None or len(region_ids) == len(regions):
+            return None
+        names = [region.get('name', region['id']) for region in regions if region['id'] in region_ids]
+        if include_unassigned:
+            names.append('без региона')
+        return '📍 ' + ', '.join(names)
+    
+    async def send_morning_report(
+        self,
+        tz: str = DEFAULT_TIMEZONE,
+        region_ids: Optional[List[str]] = None,
+        include_unassigned: bool = True
+    ):
+        """Отправить утренний отчет логистам по регионам часового пояса tz"""
+        zone = get_timezone(tz)
+        print(f"[{datetime.now(zone)}] Отправка утреннего отчета ({tz})...")
+        
+        today = local_date(zone)
+        
+        # Подсчитываем по статусам по дневным счетчикам
+        stats = await ReportService.get_day_stats_for_regions(today, region_ids, include_unassigned)
+        if region_ids == [] and not stats['total']:
+            # Отчет только по заказам без региона, а их нет
+            return
         
         # Получаем всех логистов
         from src.config import LOGIST_USER_IDS, ADMIN_USER_IDS
         user_ids = LOGIST_USER_IDS + ADMIN_USER_IDS
         
         if user_ids:
-            from src.utils.formatters import format_report
-            report_text = format_report(statuses, today)
-            
-            sent = await self.notification_service.send_daily_report(statuses, user_ids)
+            sent = await self.notification_service.send_daily_report(
+                stats['byStatus'],
+                user_ids,
+                date=datetime.now(zone).strftime('%d.%m.%Y'),
+                header=self._regions_header(region_ids, include_unassigned)
+            )
             print(f"✅ Отправлено отчетов: {sent}")
     
-    async def send_day_report(self):
-        """Отправить сводку дня"""
-        print(f"[{datetime.now()}] Отправка сводки дня...")
+    async def send_day_report(
+        self,
+        tz: str = DEFAULT_TIMEZONE,
+        region_ids: Optional[List[str]] = None,
+        include_unassigned: bool = True
+    ):
+        """Отправить сводку дня по регионам часового пояса tz"""
+        zone = get_timezone(tz)
+        print(f"[{datetime.now(zone)}] Отправка сводки дня ({tz})...")
         
-        today = datetime.now().strftime('%Y-%m-%d')
-        orders = FirebaseService.get_orders_by_date(today)
+        today = local_date(zone)
         
-        # Подсчитываем по статусам
-        statuses = {}
-        total_amount = 0
-        delivered_amount = 0
-        
-        for order in orders:
-            status = order.get('status', 'NEW')
-            statuses[status] = statuses.get(status, 0) + 1
-            
-            amount = order.get('totalAmount', 0)
-            total_amount += amount
-            if status == 'DELIVERED':
-                delivered_amount += amount
+        # Количество и суммы по статусам - из дневных счетчиков
+        stats = await ReportService.get_day_stats_for_regions(today, region_ids, include_unassigned)
+        if region_ids == [] and not stats['total']:
+            return
         
         # Формируем расширенный отчет
-        report = f"""*Сводка дня за {today}*
-
-*Всего заказов:* {len(orders)}
-*Сумма всех заказов:* {total_amount:,.0f} сум
-*Сумма доставленных:* {delivered_amount:,.0f} сум
-
-*По статусам:*
-✅ Подтверждено: {statuses.get('CONFIRMED', 0)}
-🚗 В пути: {statuses.get('ON_THE_WAY', 0)}
-📦 Доставлено: {statuses.get('DELIVERED', 0)}
-📞 Нет ответа: {statuses.get('NO_ANSWER', 0)}
-❌ Плохой номер: {statuses.get('BAD_NUMBER', 0)}
-⚠️ Фейк: {statuses.get('FAKE', 0)}
-🚫 Отказ: {statuses.get('DECLINED', 0)}
-🔄 Возврат: {statuses.get('PARTIAL_RETURN', 0) + statuses.get('FULL_RETURN', 0)}
-
-*Конверсия:* {len([o for o in orders if o.get('status') == 'DELIVERED']) / len(orders) * 100:.1f}%
-"""
+        from src.utils.formatters import format_day_summary
+        report = format_day_summary(stats, today)
+        header = self._regions_header(region_ids, include_unassigned)
+        if header:
+            report = f"{header}\n\n{report}"
         
         # Отправляем логистам и админам
         from src.config import LOGIST_USER_IDS, ADMIN_USER_IDS
         user_ids = LOGIST_USER_IDS + ADMIN_USER_IDS
         
-        for user_id in user_ids:
-            try:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=report,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                print(f"Error sending report to {user_id}: {e}")
-        
-        print(f"✅ Сводка дня отправлена")
-    
-    async def check_sla(self):
-        """Проверка SLA и создание задач"""
-        print(f"[{datetime.now()}] Проверка SLA...")
-        
-        # Проверяем заказы с NO_ANSWER
-        no_answer_orders = FirebaseService.get_orders_by_status('NO_ANSWER')
-        
-        for order in no_answer_orders:
-            # Находим последнее событие NO_ANSWER
-            history = order.get('history', [])
-            last_no_answer = None
-            
-            for event in reversed(history):
-                if event.get('to') == 'NO_ANSWER':
-                    last_no_answer = event
-                    break
-            
-            if last_no_answer:
-                event_time = datetime.fromisoformat(last_no_answer.get('at', ''))
-                minutes_passed = (datetime.now() - event_time).total_seconds() / 60
-                
-                # Если прошло больше SLA времени - создаем задачу оператору
-                if minutes_passed >= SLA_NO_ANSWER_RETRY:
-                    operator_id = order.get('operatorId')
-                    if operator_id:
-                        # TODO: Создать задачу в Firestore
-                        print(f"⚠️ SLA нарушен для заказа {order.get('id')}: NO_ANSWER > {SLA_NO_ANSWER_RETRY} мин")
-        
-        # Проверяем заказы с BAD_NUMBER
-        bad_number_orders = FirebaseService.get_orders_by_status('BAD_NUMBER')
-        
-        for order in bad_number_orders:
-            history = order.get('history', [])
-            last_bad_number = None
-            
-            for event in reversed(history):
-                if event.get('to') == 'BAD_NUMBER':
-                    last_bad_number = event
-                    break
-            
-            if last_bad_number:
-                event_time = datetime.fromisoformat(last_bad_number.get('at', ''))
-                minutes_passed = (datetime.now() - event_time).total_seconds() / 60
-                
-                if minutes_passed >= SLA_BAD_NUMBER_ESCALATION:
-                    operator_id = order.get('operatorId')
-                    if operator_id:
-                        # TODO: Эскалировать супервайзеру
-                        print(f"⚠️ Эскалация для заказа {order.get('id')}: BAD_NUMBER > {SLA_BAD_NUMBER_ESCALATION} мин")
-
+        result = await self.notification_service.broadcast(report, user_ids)
+        print(f"✅ Сводка дня отправлена: {len(result['sent'])}, ошибок: {len(result['failed'])}")
+    
+    async def reconcile_daily_counters(self):
+        """Сверить дневные счетчики за вчера, сегодня и завтра с заказами"""
+        zone = get_timezone()
+        print(f"[{datetime.now(zone)}] Сверка дневных счетчиков...")
+        
+        # Вчера и завтра покрывают "сегодня" регионов в других часовых поясах
+        for offset in (-1, 0, 1):
+            date = local_date(zone, days=offset)
+            regions = await FirebaseService.rebuild_daily_counters(date)
+            print(f"✅ Счетчики {date} сверены, исправлено регионов: {regions}")
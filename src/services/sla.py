@@ -0,0 +1,152 @@
+"""Контроль SLA: задачи и эскалации по дедлайнам заказов"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+
+from src.config import LOGIST_USER_IDS, ADMIN_USER_IDS
+from src.services.firebase import FirebaseService, SLA_STATUSES
+from src.services.notifications import NotificationService
+from src.storage.base import DocumentChange
+from src.utils.formatters import format_order_card
+from src.utils.tasks import spawn
+
+# Через сколько секунд повторить дедлайн, если обработка упала
+RETRY_DELAY = 60
+
+# Поля заказа для восстановления дедлайнов при запуске
+BACKFILL_FIELDS = ['status', 'statusEnteredAt', 'idHuman', 'operatorId', 'regionId']
+
+
+class SlaEngine:
+    """Срабатывает по дедлайнам SLA вместо периодического обхода заказов.
+
+    Дедлайны хранятся в коллекции ``sla_deadlines`` (документ на заказ) и
+    пишутся тем же коммитом, что и смена статуса (см.
+    FirebaseService._sla_writes), поэтому переживают перезапуск. Движок
+    подписан на коллекцию и держит ближайшие дедлайны в куче; таймер спит
+    до ближайшего из них. Отмена ленивая: запись кучи устарела, если срок
+    в ``_due`` для заказа другой или отсутствует.
+    """
+
+    def __init__(self):
+        self._bot: Optional[Bot] = None
+        self._heap: List[Tuple[float, str]] = []
+        # ID заказа -> актуальный срок (unix time)
+        self._due: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._watch = None
+
+    @property
+    def pending(self) -> int:
+        """Сколько дедлайнов ожидает срабатывания"""
+        return len(self._due)
+
+    def start(self, bot: Bot) -> None:
+        """Подписаться на дедлайны и запустить таймер"""
+        if self._worker is not None:
+            return
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._watch = FirebaseService.watch_collection(
+            'sla_deadlines', self._apply_changes, asyncio.get_running_loop()
+        )
+        self._worker = asyncio.create_task(self._run())
+        spawn(self._backfill(), name='sla-backfill')
+        print("✅ Контроль SLA запущен")
+
+    def stop(self) -> None:
+        """Отписаться от дедлайнов и остановить таймер"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._heap.clear()
+        self._due.clear()
+
+    def _apply_changes(self, changes: List[DocumentChange]) -> None:
+        for change_type, order_id, data in changes:
+            if change_type == 'REMOVED' or data.get('firedAt') or not data.get('dueAt'):
+                self._due.pop(order_id, None)
+            else:
+                self._push(order_id, data['dueAt'].timestamp())
+        self._wakeup.set()
+
+    def _push(self, order_id: str, due: float) -> None:
+        if self._due.get(order_id) == due:
+            return
+        self._due[order_id] = due
+        heapq.heappush(self._heap, (due, order_id))
+
+    async def _run(self) -> None:
+        """Спать до ближайшего дедлайна и запускать его обработку"""
+        while True:
+            # Выбрасываем отмененные и перенесенные дедлайны
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            wait = self._heap[0][0] - time.time() if self._heap else None
+            if wait is not None and wait <= 0:
+                _, order_id = heapq.heappop(self._heap)
+                del self._due[order_id]
+                spawn(self._fire(order_id), name=f'sla-{order_id}')
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, order_id: str) -> None:
+        try:
+            fired = await FirebaseService.fire_sla_deadline(order_id)
+        except Exception as e:
+            print(f"Error firing SLA deadline {order_id}: {e}")
+            self._push(order_id, time.time() + RETRY_DELAY)
+            self._wakeup.set()
+            return
+        if not fired:
+            return
+
+        deadline, order = fired['deadline'], fired['order']
+        status = deadline['status']
+        late = time.time() - deadline['dueAt'].timestamp()
+        print(f"⚠️ SLA нарушен для заказа {order.get('idHuman') or order_id}: "
+              f"{status} > {SLA_STATUSES[status]} мин, задача {fired['task_id']} (опоздание {late:.1f} с)")
+
+        notifications = NotificationService(self._bot)
+        if status == 'NO_ANSWER':
+            # Повторный звонок - задача оператору заказа
+            operator_id = order.get('operatorId')
+            if operator_id:
+                await notifications.notify_operator_action_required(order, operator_id)
+        else:
+            # Плохой номер - эскалация логистам и админам
+            text = f"""🚨 *Эскалация SLA*
+
+{format_order_card(order, show_buttons=False)}
+
+Статус {status} дольше {SLA_STATUSES[status]} мин
+"""
+            await notifications.broadcast(text, LOGIST_USER_IDS + ADMIN_USER_IDS)
+
+    async def _backfill(self) -> None:
+        """Создать дедлайны для заказов, вошедших в SLA-статус до их появления"""
+        now = datetime.now(timezone.utc)
+        created = 0
+        for status in SLA_STATUSES:
+            orders = await FirebaseService.get_orders_in_status_since(status, now, fields=BACKFILL_FIELDS)
+            for order in orders:
+                created += await FirebaseService.ensure_sla_deadline(order)
+        if created:
+            print(f"✅ Восстановлено дедлайнов SLA: {created}")
+
+
+sla_engine = SlaEngine()
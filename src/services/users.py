@@ -0,0 +1,108 @@
+"""Кэш пользователей и ролей для авторизации"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from src.config import USER_CACHE_MAX_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL
+from src.services.firebase import FirebaseService, DocumentChange
+from src.utils.cache import TTLCache, MISSING
+
+
+class UserCache:
+    """Кэш пользователей по Telegram ID.
+
+    Записи живут USER_CACHE_TTL секунд, неизвестные Telegram ID кэшируются
+    как None на USER_CACHE_NEGATIVE_TTL. Snapshot-листенер на коллекции
+    ``users`` обновляет закэшированные записи, поэтому смена роли
+    применяется за несколько секунд, не дожидаясь истечения TTL.
+    """
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_MAX_SIZE,
+        ttl: float = USER_CACHE_TTL,
+        negative_ttl: float = USER_CACHE_NEGATIVE_TTL
+    ):
+        self._cache = TTLCache(max_size, ttl, negative_ttl, on_evict=self._forget)
+        # id документа -> telegramId, чтобы отследить смену telegramId у пользователя;
+        # только для записей, которые есть в кэше (чистится вместе с ним)
+        self._telegram_ids: Dict[str, str] = {}
+        # Одновременные промахи по одному ключу делают один запрос
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._watch = None
+
+    async def get_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить пользователя по Telegram ID (из кэша или Firestore)"""
+        key = str(telegram_id)
+        cached = self._cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        pending = self._pending.get(key)
+        if pending:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            user = await FirebaseService.get_user_by_telegram_id(telegram_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже проброшено вызывающему, ожидающие получат его из future
+            future.exception()
+            raise
+        else:
+            # Листенер мог обновить запись, пока шел запрос - его данные свежее
+            if key not in self._cache:
+                self._remember(key, user)
+            user = self._cache.get(key)
+            user = None if user is MISSING else user
+            future.set_result(user)
+            return user
+        finally:
+            self._pending.pop(key, None)
+
+    def invalidate(self, telegram_id: int) -> None:
+        """Сбросить запись для Telegram ID"""
+        self._cache.pop(str(telegram_id))
+
+    def start_listener(self) -> None:
+        """Запустить snapshot-листенер на коллекции users"""
+        if self._watch is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._watch = FirebaseService.watch_collection('users', self._apply_changes, loop)
+        print("✅ Листенер кэша пользователей запущен")
+
+    def stop_listener(self) -> None:
+        """Остановить snapshot-листенер"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _remember(self, key: str, user: Optional[Dict[str, Any]]) -> None:
+        self._cache.set(key, user)
+        if user:
+            self._telegram_ids[user['id']] = key
+
+    def _forget(self, key: str, user: Optional[Dict[str, Any]]) -> None:
+        """Запись покинула кэш (TTL, вытеснение, замена) - забыть ее telegramId"""
+        if user and self._telegram_ids.get(user['id']) == key:
+            del self._telegram_ids[user['id']]
+
+    def _apply_changes(self, changes: List[DocumentChange]) -> None:
+        """Применить изменения из листенера к закэшированным записям"""
+        for change_type, doc_id, data in changes:
+            old_key = self._telegram_ids.pop(doc_id, None)
+            new_key = str(data.get('telegramId')) if data and data.get('telegramId') else None
+
+            if old_key and old_key != new_key:
+                # telegramId сменился или пользователь удален
+                self._cache.set(old_key, None)
+
+            # Начальный снапшот присылает всех пользователей - кладем в кэш
+            # только тех, кого уже запрашивали (включая негативные записи)
+            if new_key and (old_key == new_key or new_key in self._cache):
+                self._remember(new_key, {'id': doc_id, **data})
+
+
+user_cache = UserCache()
@@ -0,0 +1,68 @@
+"""Хранилища документов: Firestore, память процесса, SQLite"""
+from typing import Optional
+
+from src.storage.base import (
+    StorageBackend,
+    Write,
+    DocumentChange,
+    AlreadyExists,
+    DocumentNotFound,
+    TransactionRejected,
+    IndexRequired,
+    SERVER_TIMESTAMP,
+    DELETE_FIELD,
+    Increment,
+    new_id,
+)
+
+_storage: Optional[StorageBackend] = None
+
+
+def create_storage(backend: str) -> StorageBackend:
+    """Создать хранилище по имени (firestore, memory, sqlite)"""
+    # Импорты внутри: firebase_admin нужен только для Firestore
+    if backend == 'firestore':
+        from src.storage.firestore import FirestoreBackend
+        return FirestoreBackend()
+    if backend == 'memory':
+        from src.storage.memory import MemoryBackend
+        return MemoryBackend()
+    if backend == 'sqlite':
+        from src.config import SQLITE_PATH
+        from src.storage.sqlite import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f'Неизвестное хранилище: {backend}')
+
+
+def get_storage() -> StorageBackend:
+    """Хранилище процесса (создается при первом обращении по STORAGE_BACKEND)"""
+    global _storage
+    if _storage is None:
+        from src.config import STORAGE_BACKEND
+        _storage = create_storage(STORAGE_BACKEND)
+        print(f"✅ Хранилище: {_storage.name}")
+    return _storage
+
+
+def set_storage(storage: StorageBackend) -> None:
+    """Подменить хранилище процесса (тесты, бенчмарки)"""
+    global _storage
+    _storage = storage
+
+
+__all__ = [
+    'StorageBackend',
+    'Write',
+    'DocumentChange',
+    'AlreadyExists',
+    'DocumentNotFound',
+    'TransactionRejected',
+    'IndexRequired',
+    'SERVER_TIMESTAMP',
+    'DELETE_FIELD',
+    'Increment',
+    'new_id',
+    'create_storage',
+    'get_storage',
+    'set_storage',
+]
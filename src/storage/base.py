@@ -0,0 +1,159 @@
+"""Интерфейс хранилища документов"""
+import asyncio
+import random
+import string
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.query import Filter
+
+
+class _Sentinel:
+    """Специальное значение поля, которое хранилище подставляет при записи"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+# Время сервера на момент записи
+SERVER_TIMESTAMP = _Sentinel('SERVER_TIMESTAMP')
+
+# Удалить поле (только в update)
+DELETE_FIELD = _Sentinel('DELETE_FIELD')
+
+
+class Increment:
+    """Атомарно увеличить числовое поле на value (в update и merge)"""
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f'Increment({self.value})'
+
+
+# Запись: (операция, коллекция, ID документа, данные).
+# Операции: 'set' - записать документ целиком, 'create' - создать, если его нет,
+# 'update' - обновить поля (ключи могут быть вложенными: 'customer.name'),
+# 'merge' - слить вложенные словари с документом, создав его при отсутствии
+# (Increment считает отсутствующее поле нулем),
+# 'delete' - удалить (данные None).
+# Коллекция может быть вложенной: 'orders/{id}/events'.
+Write = Tuple[str, str, str, Optional[Dict[str, Any]]]
+
+# Изменение документа для подписчиков: (тип, id, данные или None для REMOVED)
+DocumentChange = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class AlreadyExists(Exception):
+    """'create' для уже существующего документа"""
+
+
+class DocumentNotFound(Exception):
+    """'update' для несуществующего документа"""
+
+
+class TransactionRejected(Exception):
+    """Функция транзакции отказалась от записи; payload передается вызывающему"""
+
+    def __init__(self, payload: Any = None):
+        super().__init__(payload)
+        self.payload = payload
+
+
+class IndexRequired(Exception):
+    """Хранилищу нужен индекс для запроса"""
+
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def new_id() -> str:
+    """Сгенерировать ID документа (20 символов, как у Firestore)"""
+    return ''.join(random.choices(_ID_ALPHABET, k=20))
+
+
+class StorageBackend(ABC):
+    """Хранилище документов, на котором построен FirebaseService.
+
+    Документы возвращаются словарями с ключом 'id'. Семантика запросов
+    (фильтры, сортировка, курсоры, проекция) - как у Firestore
+    (см. src/utils/query.py), поэтому сервисы работают одинаково
+    с любой реализацией.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Получить документ или None"""
+
+    @abstractmethod
+    async def query(
+        self,
+        collection: str,
+        filters: List[Filter],
+        order_by: str = '__name__',
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Выполнить запрос (курсоры - ID документов)"""
+
+    @abstractmethod
+    async def commit(self, writes: List[Write]) -> None:
+        """Атомарно применить набор записей"""
+
+    @abstractmethod
+    async def transact(
+        self,
+        reads: List[Tuple[str, str]],
+        fn: Callable[[List[Optional[Dict[str, Any]]]], List[Write]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Транзакция: прочитать документы reads, вызвать fn(документы) и
+        атомарно применить возвращенные записи.
+
+        fn может вызываться повторно при конфликте, поэтому должна быть
+        чистой; чтобы отменить запись, fn бросает TransactionRejected.
+        Возвращает прочитанные документы (из успешной попытки).
+        """
+
+    @abstractmethod
+    def watch(
+        self,
+        collection: str,
+        callback: Callable[[List[DocumentChange]], None],
+        loop: asyncio.AbstractEventLoop,
+        filters: Optional[List[Filter]] = None
+    ) -> Any:
+        """Подписаться на изменения документов коллекции.
+
+        callback вызывается в event loop; первый вызов - начальный снапшот
+        (возможно пустой). Возвращает объект с методом unsubscribe().
+        """
+
+    async def add(self, collection: str, data: Dict[str, Any]) -> str:
+        """Создать документ с новым ID"""
+        doc_id = new_id()
+        await self.commit([('create', collection, doc_id, data)])
+        return doc_id
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """Записать документ целиком"""
+        await self.commit([('set', collection, doc_id, data)])
+
+    async def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """Обновить поля документа"""
+        await self.commit([('update', collection, doc_id, data)])
+
+    async def delete(self, collection: str, doc_id: str) -> None:
+        """Удалить документ"""
+        await self.commit([('delete', collection, doc_id, None)])
+
+    async def close(self) -> None:
+        """Освободить ресурсы"""
@@ -0,0 +1,271 @@
+"""Хранилище в Firebase Firestore"""
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import firebase_admin
+from firebase_admin import credentials, firestore, firestore_async
+from google.api_core import exceptions as google_exceptions
+
+from src.config import FIREBASE_PROJECT_ID, FIREBASE_CREDENTIALS_PATH
+from src.storage.base import (
+    StorageBackend,
+    Write,
+    DocumentChange,
+    AlreadyExists,
+    DocumentNotFound,
+    IndexRequired,
+    SERVER_TIMESTAMP,
+    DELETE_FIELD,
+    Increment,
+)
+from src.utils.query import Filter, run_query
+
+
+def _initialize_app():
+    """Инициализация Firebase Admin SDK"""
+    if firebase_admin._apps:
+        return
+    
+    # Проверяем, есть ли credentials в переменной окружения (для Render)
+    firebase_creds_json = os.getenv('FIREBASE_CREDENTIALS_JSON')
+    
+    if firebase_creds_json:
+        # Читаем credentials из переменной окружения
+        try:
+            print("📝 Загрузка Firebase credentials из переменной окружения...")
+            cred_dict = json.loads(firebase_creds_json)
+            cred = credentials.Certificate(cred_dict)
+            firebase_admin.initialize_app(cred, {
+                'projectId': FIREBASE_PROJECT_ID,
+            })
+            print("✅ Firebase credentials загружены из переменной окружения")
+        except json.JSONDecodeError as e:
+            print(f"❌ Ошибка парсинга FIREBASE_CREDENTIALS_JSON: {e}")
+            print(f"Первые 100 символов: {firebase_creds_json[:100]}")
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка инициализации Firebase: {e}")
+            raise
+    elif os.path.exists(FIREBASE_CREDENTIALS_PATH):
+        # Читаем credentials из файла (для локальной разработки)
+        print(f"📝 Загрузка Firebase credentials из файла: {FIREBASE_CREDENTIALS_PATH}")
+        cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
+        firebase_admin.initialize_app(cred, {
+            'projectId': FIREBASE_PROJECT_ID,
+        })
+        print("✅ Firebase credentials загружены из файла")
+    else:
+        # Для разработки можно использовать Application Default Credentials
+        print("⚠️ Firebase credentials не найдены.")
+        print(f"   Проверьте переменную окружения FIREBASE_CREDENTIALS_JSON или файл {FIREBASE_CREDENTIALS_PATH}")
+        print("   Пытаемся использовать Application Default Credentials...")
+        try:
+            firebase_admin.initialize_app()
+            print("✅ Используются Application Default Credentials")
+        except Exception as e:
+            print(f"❌ Не удалось инициализировать Firebase: {e}")
+            raise
+
+
+def _to_firestore(value: Any) -> Any:
+    """Заменить специальные значения хранилища на значения Firestore"""
+    if value is SERVER_TIMESTAMP:
+        return firestore.SERVER_TIMESTAMP
+    if value is DELETE_FIELD:
+        return firestore.DELETE_FIELD
+    if isinstance(value, Increment):
+        return firestore.Increment(value.value)
+    if isinstance(value, dict):
+        return {key: _to_firestore(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_firestore(item) for item in value]
+    return value
+
+
+class FirestoreBackend(StorageBackend):
+    """Хранилище в Cloud Firestore (асинхронный клиент)"""
+
+    name = 'firestore'
+
+    def __init__(self):
+        _initialize_app()
+        # Асинхронный клиент: сетевые запросы не блокируют event loop
+        self.db = firestore_async.client()
+        # Синхронный клиент нужен только для snapshot-листенеров (on_snapshot есть лишь в нём)
+        self.sync_db = firestore.client()
+
+    def _apply_filters(self, query, filters: List[Filter]):
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        return query
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.db.collection(collection).document(doc_id).get()
+        return {'id': doc.id, **doc.to_dict()} if doc.exists else None
+
+    async def query(
+        self,
+        collection: str,
+        filters: List[Filter],
+        order_by: str = '__name__',
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        try:
+            return await self._query(
+                collection, filters, order_by, descending, limit, start_after, end_before, fields
+            )
+        except google_exceptions.FailedPrecondition as e:
+            in_filters = [f for f in filters if f[1] == 'in']
+            if not in_filters:
+                raise IndexRequired(e.message) from e
+            # Нет составного индекса для `in` + сортировки - выполняем запросы
+            # по каждому значению параллельно и сортируем в памяти
+            print(f"⚠️ Нет индекса для запроса к {collection}, используем fan-out ({e.message})")
+
+        field, _, values = in_filters[0]
+        rest = [f for f in filters if f is not in_filters[0]]
+        collection_ref = self.db.collection(collection)
+
+        async def fetch(value: Any) -> List[Dict[str, Any]]:
+            query = self._apply_filters(collection_ref, [*rest, (field, '==', value)])
+            if fields:
+                query = query.select([*fields, order_by] if order_by != '__name__' else fields)
+            return [{'id': doc.id, **doc.to_dict()} async for doc in query.stream()]
+
+        results = await asyncio.gather(*(fetch(value) for value in values))
+        return run_query(
+            [doc for docs in results for doc in docs],
+            [],
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+            start_after=start_after,
+            end_before=end_before,
+            fields=fields
+        )
+
+    async def _query(
+        self,
+        collection: str,
+        filters: List[Filter],
+        order_by: str,
+        descending: bool,
+        limit: Optional[int],
+        start_after: Optional[str],
+        end_before: Optional[str],
+        fields: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        collection_ref = self.db.collection(collection)
+        query = self._apply_filters(collection_ref, filters)
+
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = query.order_by(order_by, direction=direction)
+
+        if fields:
+            query = query.select(fields)
+
+        cursor_id = start_after or end_before
+        if cursor_id:
+            if order_by == '__name__':
+                cursor = {'__name__': cursor_id}
+            else:
+                # Значение поля сортировки берем из документа-курсора
+                cursor = await collection_ref.document(cursor_id).get(field_paths=[order_by])
+                if not cursor.exists:
+                    return []
+            query = query.start_after(cursor) if start_after else query.end_before(cursor)
+
+        if end_before and limit:
+            docs = await query.limit_to_last(limit).get()
+            return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+
+        if limit:
+            query = query.limit(limit)
+        return [{'id': doc.id, **doc.to_dict()} async for doc in query.stream()]
+
+    def _apply_writes(self, target, writes: List[Write]) -> None:
+        """Добавить записи в batch или транзакцию"""
+        for op, collection, doc_id, data in writes:
+            ref = self.db.collection(collection).document(doc_id)
+            if op == 'set':
+                target.set(ref, _to_firestore(data))
+            elif op == 'create':
+                target.create(ref, _to_firestore(data))
+            elif op == 'update':
+                target.update(ref, _to_firestore(data))
+            elif op == 'merge':
+                target.set(ref, _to_firestore(data), merge=True)
+            elif op == 'delete':
+                target.delete(ref)
+            else:
+                raise ValueError(f'Неизвестная операция: {op}')
+
+    async def commit(self, writes: List[Write]) -> None:
+        batch = self.db.batch()
+        self._apply_writes(batch, writes)
+        try:
+            await batch.commit()
+        except google_exceptions.AlreadyExists as e:
+            raise AlreadyExists(e.message) from e
+        except google_exceptions.NotFound as e:
+            raise DocumentNotFound(e.message) from e
+
+    async def transact(
+        self,
+        reads: List[Tuple[str, str]],
+        fn: Callable[[List[Optional[Dict[str, Any]]]], List[Write]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        refs = [self.db.collection(collection).document(doc_id) for collection, doc_id in reads]
+
+        @firestore.async_transactional
+        async def run(transaction) -> List[Optional[Dict[str, Any]]]:
+            # Все документы одним запросом; порядок ответа не гарантирован,
+            # поэтому результат собирается по путям в порядке reads
+            snapshots = {}
+            if refs:
+                async for doc in self.db.get_all(refs, transaction=transaction):
+                    snapshots[doc.reference.path] = doc
+            docs = []
+            for ref in refs:
+                doc = snapshots.get(ref.path)
+                docs.append({'id': doc.id, **doc.to_dict()} if doc is not None and doc.exists else None)
+            self._apply_writes(transaction, fn(docs))
+            return docs
+
+        try:
+            return await run(self.db.transaction())
+        except google_exceptions.AlreadyExists as e:
+            raise AlreadyExists(e.message) from e
+        except google_exceptions.NotFound as e:
+            raise DocumentNotFound(e.message) from e
+
+    def watch(
+        self,
+        collection: str,
+        callback: Callable[[List[DocumentChange]], None],
+        loop: asyncio.AbstractEventLoop,
+        filters: Optional[List[Filter]] = None
+    ) -> Any:
+        # Firestore вызывает on_snapshot из своего потока, поэтому изменения
+        # передаются в callback через event loop
+        query = self._apply_filters(self.sync_db.collection(collection), filters or [])
+
+        def on_snapshot(_docs, changes, _read_time):
+            batch = [
+                (
+                    change.type.name,
+                    change.document.id,
+                    None if change.type.name == 'REMOVED' else change.document.to_dict(),
+                )
+                for change in changes
+            ]
+            # Первый снапшот передается даже пустым - по нему видно, что данные загружены
+            loop.call_soon_threadsafe(callback, batch)
+
+        return query.on_snapshot(on_snapshot)
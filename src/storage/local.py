@@ -0,0 +1,225 @@
+"""Общая логика локальных хранилищ (в памяти и SQLite)"""
+import asyncio
+import copy
+from abc import abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.storage.base import (
+    StorageBackend,
+    Write,
+    DocumentChange,
+    AlreadyExists,
+    DocumentNotFound,
+    SERVER_TIMESTAMP,
+    DELETE_FIELD,
+    Increment,
+)
+from src.utils.query import Filter, matches, run_query
+
+
+def _resolve(value: Any, now: datetime) -> Any:
+    """Заменить SERVER_TIMESTAMP на текущее время (рекурсивно)"""
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, dict):
+        return {key: _resolve(item, now) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, now) for item in value]
+    return value
+
+
+def _apply_update(doc: Dict[str, Any], data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Применить update с вложенными ключами и трансформациями к копии документа"""
+    result = copy.deepcopy(doc)
+    for path, value in data.items():
+        parts = path.split('.')
+        target = result
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+
+        key = parts[-1]
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, Increment):
+            current = target.get(key)
+            target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+        else:
+            target[key] = _resolve(value, now)
+    return result
+
+
+def _merge(doc: Dict[str, Any], data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Слить data с копией документа (merge): вложенные словари сливаются рекурсивно"""
+    result = copy.deepcopy(doc)
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            result.pop(key, None)
+        elif isinstance(value, Increment):
+            current = result.get(key)
+            result[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+        elif isinstance(value, dict):
+            current = result.get(key)
+            result[key] = _merge(current if isinstance(current, dict) else {}, value, now)
+        else:
+            result[key] = _resolve(value, now)
+    return result
+
+
+class _LocalWatch:
+    """Подписка на изменения локального хранилища"""
+
+    def __init__(self, backend: 'LocalBackend', collection: str, filters: List[Filter],
+                 callback: Callable[[List[DocumentChange]], None], loop: asyncio.AbstractEventLoop):
+        self.backend = backend
+        self.collection = collection
+        self.filters = filters
+        self.callback = callback
+        self.loop = loop
+
+    def unsubscribe(self) -> None:
+        if self in self.backend._watches:
+            self.backend._watches.remove(self)
+
+
+class LocalBackend(StorageBackend):
+    """Хранилище в одном процессе: атомарность обеспечивается блокировкой,
+    запросы выполняются в памяти через src/utils/query.py.
+
+    Наследники реализуют чтение и атомарную запись документов.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._watches: List[_LocalWatch] = []
+
+    @abstractmethod
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Прочитать документ (без ключа 'id')"""
+
+    @abstractmethod
+    def _scan(self, collection: str, filters: List[Filter]) -> List[Dict[str, Any]]:
+        """Документы коллекции (с ключом 'id'), которые могут пройти фильтры"""
+
+    @abstractmethod
+    def _store(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        """Атомарно записать документы (None - удалить)"""
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        data = self._read(collection, doc_id)
+        return {'id': doc_id, **data} if data is not None else None
+
+    async def query(
+        self,
+        collection: str,
+        filters: List[Filter],
+        order_by: str = '__name__',
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[str] = None,
+        end_before: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        def get_doc(doc_id: str) -> Optional[Dict[str, Any]]:
+            data = self._read(collection, doc_id)
+            return {'id': doc_id, **data} if data is not None else None
+
+        # Копии, чтобы вызывающий код не мог изменить хранимые документы
+        return copy.deepcopy(run_query(
+            self._scan(collection, filters),
+            filters,
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+            start_after=start_after,
+            end_before=end_before,
+            fields=fields,
+            get_doc=get_doc
+        ))
+
+    async def commit(self, writes: List[Write]) -> None:
+        async with self._lock:
+            self._commit(writes)
+
+    async def transact(
+        self,
+        reads: List[Tuple[str, str]],
+        fn: Callable[[List[Optional[Dict[str, Any]]]], List[Write]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        async with self._lock:
+            docs = [await self.get(collection, doc_id) for collection, doc_id in reads]
+            self._commit(fn(copy.deepcopy(docs)))
+            return docs
+
+    def watch(
+        self,
+        collection: str,
+        callback: Callable[[List[DocumentChange]], None],
+        loop: asyncio.AbstractEventLoop,
+        filters: Optional[List[Filter]] = None
+    ) -> Any:
+        watch = _LocalWatch(self, collection, filters or [], callback, loop)
+        self._watches.append(watch)
+
+        # Начальный снапшот
+        initial = [
+            ('ADDED', doc['id'], copy.deepcopy({key: value for key, value in doc.items() if key != 'id'}))
+            for doc in self._scan(collection, watch.filters)
+            if matches(doc, watch.filters)
+        ]
+        loop.call_soon_threadsafe(callback, initial)
+        return watch
+
+    def _commit(self, writes: List[Write]) -> None:
+        """Применить записи атомарно: все или ни одной"""
+        now = datetime.now(timezone.utc)
+        pending: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        before: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+
+        for op, collection, doc_id, data in writes:
+            key = (collection, doc_id)
+            if key not in before:
+                before[key] = self._read(collection, doc_id)
+            current = pending[key] if key in pending else before[key]
+
+            if op == 'create':
+                if current is not None:
+                    raise AlreadyExists(f'{collection}/{doc_id}')
+                pending[key] = _resolve(data or {}, now)
+            elif op == 'set':
+                pending[key] = _resolve(data or {}, now)
+            elif op == 'update':
+                if current is None:
+                    raise DocumentNotFound(f'{collection}/{doc_id}')
+                pending[key] = _apply_update(current, data or {}, now)
+            elif op == 'merge':
+                pending[key] = _merge(current or {}, data or {}, now)
+            elif op == 'delete':
+                pending[key] = None
+            else:
+                raise ValueError(f'Неизвестная операция: {op}')
+
+        self._store([(collection, doc_id, data) for (collection, doc_id), data in pending.items()])
+        self._notify(before, pending)
+
+    def _notify(
+        self,
+        before: Dict[Tuple[str, str], Optional[Dict[str, Any]]],
+        after: Dict[Tuple[str, str], Optional[Dict[str, Any]]]
+    ) -> None:
+        for watch in list(self._watches):
+            changes: List[DocumentChange] = []
+            for (collection, doc_id), new_data in after.items():
+                if collection != watch.collection:
+                    continue
+                old_data = before.get((collection, doc_id))
+                was = old_data is not None and matches({'id': doc_id, **old_data}, watch.filters)
+                now = new_data is not None and matches({'id': doc_id, **new_data}, watch.filters)
+                if now:
+                    changes.append(('MODIFIED' if was else 'ADDED', doc_id, copy.deepcopy(new_data)))
+                elif was:
+                    changes.append(('REMOVED', doc_id, None))
+            if changes:
+                watch.loop.call_soon_threadsafe(watch.callback, changes)
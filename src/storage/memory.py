@@ -0,0 +1,31 @@
+"""Хранилище в памяти процесса (тесты, нагрузочные прогоны)"""
+import copy
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.storage.local import LocalBackend
+from src.utils.query import Filter
+
+
+class MemoryBackend(LocalBackend):
+    """Документы хранятся в словарях; данные теряются при остановке"""
+
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        data = self._collections[collection].get(doc_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    def _scan(self, collection: str, filters: List[Filter]) -> List[Dict[str, Any]]:
+        return [{'id': doc_id, **data} for doc_id, data in self._collections[collection].items()]
+
+    def _store(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        for collection, doc_id, data in changes:
+            if data is None:
+                self._collections[collection].pop(doc_id, None)
+            else:
+                self._collections[collection][doc_id] = data
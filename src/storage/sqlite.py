@@ -0,0 +1,159 @@
+"""Хранилище в локальном файле SQLite"""
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from src.storage.base import Write
+from src.storage.local import LocalBackend
+from src.utils.query import Filter
+
+# Сколько ждать блокировку записи, занятую другим процессом (секунды)
+LOCK_TIMEOUT = 5.0
+# Пауза между попытками занять блокировку (секунды)
+LOCK_RETRY_DELAY = 0.02
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'Тип {type(value).__name__} не сериализуется в JSON')
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class SQLiteBackend(LocalBackend):
+    """Документы хранятся JSON-строками в таблице documents.
+
+    Фильтры на равенство по строкам и числам выполняет SQLite
+    (json_extract), остальная часть запроса - в памяти с той же
+    семантикой, что и у других хранилищ. Подходит для одного процесса:
+    локальные прогоны и небольшие регионы. Транзакции атомарны и между
+    процессами, которые делят файл (например, аренда ведущей копии), но
+    подписки видят только изменения своего процесса.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            ' collection TEXT NOT NULL,'
+            ' id TEXT NOT NULL,'
+            ' data TEXT NOT NULL,'
+            ' PRIMARY KEY (collection, id))'
+        )
+
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            'SELECT data FROM documents WHERE collection = ? AND id = ?',
+            (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def _scan(self, collection: str, filters: List[Filter]) -> List[Dict[str, Any]]:
+        sql = 'SELECT id, data FROM documents WHERE collection = ?'
+        params: List[Any] = [collection]
+
+        for field, op, value in filters:
+            if field == '__name__':
+                continue
+            path = '$.' + field
+            if op == '==' and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                sql += ' AND json_extract(data, ?) = ?'
+                params += [path, value]
+            elif op == 'in' and value and all(isinstance(item, str) for item in value):
+                sql += f" AND json_extract(data, ?) IN ({', '.join('?' * len(value))})"
+                params += [path, *value]
+
+        return [
+            {'id': doc_id, **json.loads(data, object_hook=_decode)}
+            for doc_id, data in self._conn.execute(sql, params)
+        ]
+
+    async def commit(self, writes: List[Write]) -> None:
+        async with self._write_transaction():
+            self._commit(writes)
+
+    async def transact(
+        self,
+        reads: List[Tuple[str, str]],
+        fn: Callable[[List[Optional[Dict[str, Any]]]], List[Write]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        async with self._write_transaction():
+            docs = [await self.get(collection, doc_id) for collection, doc_id in reads]
+            self._commit(fn(copy.deepcopy(docs)))
+            return docs
+
+    @asynccontextmanager
+    async def _write_transaction(self) -> AsyncIterator[None]:
+        """Транзакция с блокировкой записи в файл от чтения до коммита.
+
+        BEGIN IMMEDIATE выполняется без ожидания (busy_timeout = 0): пока
+        блокировка у другого процесса, попытки повторяются через
+        asyncio.sleep, и event loop не простаивает. Не удалось за
+        LOCK_TIMEOUT - sqlite3.OperationalError (database is locked).
+        """
+        async with self._lock:
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            self._conn.execute('PRAGMA busy_timeout = 0')
+            try:
+                while True:
+                    try:
+                        self._conn.execute('BEGIN IMMEDIATE')
+                        break
+                    except sqlite3.OperationalError as e:
+                        if 'locked' not in str(e) or time.monotonic() >= deadline:
+                            raise
+                    await asyncio.sleep(LOCK_RETRY_DELAY)
+            finally:
+                self._conn.execute(f'PRAGMA busy_timeout = {int(LOCK_TIMEOUT * 1000)}')
+
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _store(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        if self._conn.in_transaction:
+            # Внутри transact: коммит выполнит он
+            self._write(changes)
+            return
+        with self._conn:
+            self._conn.execute('BEGIN')
+            self._write(changes)
+
+    def _write(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        for collection, doc_id, data in changes:
+            if data is None:
+                self._conn.execute(
+                    'DELETE FROM documents WHERE collection = ? AND id = ?',
+                    (collection, doc_id)
+                )
+            else:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                    (collection, doc_id, json.dumps(data, default=_encode, ensure_ascii=False))
+                )
+
+    async def close(self) -> None:
+        self._conn.close()
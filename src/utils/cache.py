@@ -0,0 +1,75 @@
+"""In-process кэш с ограничением размера и TTL"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+# Маркер отсутствия значения в кэше (None - допустимое закэшированное значение)
+MISSING = object()
+
+
+class TTLCache:
+    """LRU-кэш с ограниченным размером и временем жизни записей.
+
+    Позволяет кэшировать None (негативное кэширование) с отдельным TTL.
+    ``on_evict(key, value)`` вызывается для каждой записи, покидающей кэш:
+    устаревшей, вытесненной, замененной или удаленной.
+    Не потокобезопасен: используется только из event loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        negative_ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.on_evict = on_evict
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Получить значение или MISSING, если записи нет или она устарела"""
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return MISSING
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение (None кэшируется с negative_ttl)"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        self.pop(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+
+        while len(self._data) > self.max_size:
+            self._evicted(*self._data.popitem(last=False))
+
+    def pop(self, key: Hashable) -> None:
+        """Удалить запись"""
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._evicted(key, entry)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        while self._data:
+            self._evicted(*self._data.popitem(last=False))
+
+    def _evicted(self, key: Hashable, entry: Tuple[float, Any]) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, entry[1])
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -106,6 +106,15 @@ def format_currency(amount: float) -> str:
     return f"{amount:,.0f} сум".replace(',', ' ')
 
 
+# Заголовки списков заказов по типу фильтра
+ORDER_LIST_TITLES = {
+    'all': 'Мои заказы',
+    'today': 'Заказы на сегодня',
+    'tomorrow': 'Заказы на завтра',
+    'action': 'Требуют действия',
+}
+
+
 def format_order_list(orders: list, title: str = "Заказы") -> str:
     """Форматировать список заказов"""
     if not orders:
@@ -158,3 +167,31 @@ def format_report(orders_by_status: Dict[str, int], date: str) -> str:
     
     return report.strip()
 
+
+def format_day_summary(stats: Dict[str, Any], date: str) -> str:
+    """Форматировать сводку дня (статистика из ReportService)"""
+    orders_by_status = stats.get('byStatus', {})
+    total = stats.get('total', 0)
+    delivered = orders_by_status.get('DELIVERED', 0)
+    conversion = delivered / total * 100 if total else 0
+    
+    report = f"""*Сводка дня за {date}*
+
+*Всего заказов:* {total}
+*Сумма всех заказов:* {stats.get('totalAmount', 0):,.0f} сум
+*Сумма доставленных:* {stats.get('deliveredAmount', 0):,.0f} сум
+
+*По статусам:*
+✅ Подтверждено: {orders_by_status.get('CONFIRMED', 0)}
+🚗 В пути: {orders_by_status.get('ON_THE_WAY', 0)}
+📦 Доставлено: {delivered}
+📞 Нет ответа: {orders_by_status.get('NO_ANSWER', 0)}
+❌ Плохой номер: {orders_by_status.get('BAD_NUMBER', 0)}
+⚠️ Фейк: {orders_by_status.get('FAKE', 0)}
+🚫 Отказ: {orders_by_status.get('DECLINED', 0)}
+🔄 Возврат: {orders_by_status.get('PARTIAL_RETURN', 0) + orders_by_status.get('FULL_RETURN', 0)}
+
+*Конверсия:* {conversion:.1f}%
+"""
+    
+    return report.strip()
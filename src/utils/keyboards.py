@@ -128,9 +128,10 @@ def get_return_type_keyboard(order_id: str) -> InlineKeyboardMarkup:
 def get_reschedule_keyboard(order_id: str) -> InlineKeyboardMarkup:
     """Клавиатура для выбора новой даты"""
     from datetime import datetime, timedelta
+    from src.utils.timezones import get_timezone
     
     buttons = []
-    today = datetime.now()
+    today = datetime.now(get_timezone())
     
     # Предлагаем следующие 7 дней
     for i in range(1, 8):
@@ -184,6 +185,32 @@ def get_main_menu_keyboard(user_role: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_pagination_keyboard(
+    filter_type: str,
+    prev_cursor: Optional[str] = None,
+    next_cursor: Optional[str] = None
+) -> Optional[InlineKeyboardMarkup]:
+    """Кнопки листания списка заказов (курсор хранится в callback data)"""
+    row = []
+    
+    if prev_cursor:
+        row.append(InlineKeyboardButton(
+            text='◀️ Назад',
+            callback_data=f'page:{filter_type}:prev:{prev_cursor}'
+        ))
+    
+    if next_cursor:
+        row.append(InlineKeyboardButton(
+            text='Далее ▶️',
+            callback_data=f'page:{filter_type}:next:{next_cursor}'
+        ))
+    
+    if not row:
+        return None
+    
+    return InlineKeyboardMarkup(inline_keyboard=[row])
+
+
 def get_order_action_keyboard(order_id: str, user_role: str) -> InlineKeyboardMarkup:
     """Клавиатура для действий оператора с заказом"""
     buttons = []
@@ -219,3 +246,14 @@ def get_order_action_keyboard(order_id: str, user_role: str) -> InlineKeyboardMa
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+
+
+def order_id_from_callback(data: Optional[str]) -> Optional[str]:
+    """ID заказа из callback data кнопок заказа (order:...:<id>) или None"""
+    parts = (data or '').split(':')
+    if len(parts) < 3 or parts[0] != 'order':
+        return None
+    # order:reschedule:<id>:<дата> - единственная кнопка, где ID не последний
+    if parts[1] == 'reschedule':
+        return parts[2]
+    return parts[-1]
@@ -0,0 +1,50 @@
+"""Блокировки по ключу"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLock:
+    """Набор FIFO-блокировок по ключам (чат, заказ).
+
+    Блокировка создается при первом ожидании и удаляется, когда ее
+    никто не держит и не ждет. Несколько ключей захватываются в
+    отсортированном порядке, поэтому взаимной блокировки не бывает.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def acquire(self, *keys: Hashable) -> AsyncIterator[None]:
+        """Захватить блокировки всех ключей (повторы игнорируются)"""
+        ordered: List[Hashable] = sorted(set(keys), key=repr)
+        acquired: List[Hashable] = []
+        try:
+            for key in ordered:
+                lock = self._locks.get(key)
+                if lock is None:
+                    lock = self._locks[key] = asyncio.Lock()
+                self._users[key] = self._users.get(key, 0) + 1
+                try:
+                    # asyncio.Lock будит ожидающих в порядке очереди
+                    await lock.acquire()
+                except BaseException:
+                    self._release_user(key)
+                    raise
+                acquired.append(key)
+            yield
+        finally:
+            for key in reversed(acquired):
+                self._locks[key].release()
+                self._release_user(key)
+
+    def _release_user(self, key: Hashable) -> None:
+        self._users[key] -= 1
+        if not self._users[key]:
+            del self._users[key]
+            del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,155 @@
+"""Выполнение запросов к документам в памяти с семантикой Firestore"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Фильтр запроса: (поле, оператор, значение), поле может быть вложенным ('customer.phone')
+Filter = Tuple[str, str, Any]
+
+_MISSING = object()
+
+
+def get_field(doc: Dict[str, Any], path: str) -> Any:
+    """Получить значение (вложенного) поля документа или _MISSING"""
+    if path == '__name__':
+        return doc.get('id', _MISSING)
+
+    value: Any = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _type_rank(value: Any) -> int:
+    """Порядок типов как в Firestore: null < bool < число < время < строка < прочее"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    return 5
+
+
+def _comparable(value: Any) -> Tuple[int, Any]:
+    rank = _type_rank(value)
+    if rank == 3 and value.tzinfo is None:
+        value = value.astimezone()
+    return rank, value if rank < 5 else repr(value)
+
+
+def _compare(left: Any, op: str, right: Any) -> bool:
+    if op == '==':
+        return left == right
+    if op == '!=':
+        return left != right and left is not None
+    if op == 'in':
+        return left in right
+    if op == 'not-in':
+        return left not in right and left is not None
+    if op == 'array-contains':
+        return isinstance(left, list) and right in left
+    if op == 'array-contains-any':
+        return isinstance(left, list) and any(item in left for item in right)
+
+    # Диапазонные операторы сравнивают только значения одного типа
+    left_key, right_key = _comparable(left), _comparable(right)
+    if left_key[0] != right_key[0]:
+        return False
+    if op == '<':
+        return left_key < right_key
+    if op == '<=':
+        return left_key <= right_key
+    if op == '>':
+        return left_key > right_key
+    if op == '>=':
+        return left_key >= right_key
+    raise ValueError(f'Неподдерживаемый оператор: {op}')
+
+
+def matches(doc: Dict[str, Any], filters: Iterable[Filter]) -> bool:
+    """Проверить, что документ проходит все фильтры"""
+    for field, op, value in filters:
+        field_value = get_field(doc, field)
+        if field_value is _MISSING or not _compare(field_value, op, value):
+            return False
+    return True
+
+
+def project(doc: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Оставить в документе только поля fields (аналог select())"""
+    if not fields:
+        return dict(doc)
+
+    result: Dict[str, Any] = {'id': doc['id']}
+    for path in fields:
+        value = get_field(doc, path)
+        if value is _MISSING:
+            continue
+        target = result
+        parts = path.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+def run_query(
+    docs: Iterable[Dict[str, Any]],
+    filters: List[Filter],
+    order_by: str = '__name__',
+    descending: bool = False,
+    limit: Optional[int] = None,
+    start_after: Optional[str] = None,
+    end_before: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    get_doc: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None
+) -> List[Dict[str, Any]]:
+    """Выполнить запрос так же, как его выполнил бы Firestore.
+
+    Документы - словари с ключом 'id'. Сортировка по order_by, затем по id;
+    документы без поля сортировки не попадают в выборку. Курсоры - id
+    документов; их значения сортировки берутся через get_doc (если курсор
+    выпал из выборки). При end_before возвращаются последние limit
+    документов перед курсором.
+    """
+    def sort_key(doc: Dict[str, Any]) -> Tuple[Tuple[int, Any], str]:
+        return _comparable(get_field(doc, order_by)), doc['id']
+
+    result = [
+        doc for doc in docs
+        if matches(doc, filters) and get_field(doc, order_by) is not _MISSING
+    ]
+    result.sort(key=sort_key, reverse=descending)
+
+    cursor_id = start_after or end_before
+    if cursor_id:
+        cursor_doc = next((doc for doc in result if doc['id'] == cursor_id), None)
+        if cursor_doc is None and get_doc:
+            cursor_doc = get_doc(cursor_id)
+        if cursor_doc is None or get_field(cursor_doc, order_by) is _MISSING:
+            return []
+
+        cursor_key = sort_key(cursor_doc)
+        if start_after:
+            result = [
+                doc for doc in result
+                if (sort_key(doc) < cursor_key if descending else sort_key(doc) > cursor_key)
+            ]
+        else:
+            result = [
+                doc for doc in result
+                if (sort_key(doc) > cursor_key if descending else sort_key(doc) < cursor_key)
+            ]
+            if limit:
+                result = result[-limit:]
+
+    if limit:
+        result = result[:limit]
+
+    return [project(doc, fields) for doc in result]
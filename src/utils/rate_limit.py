@@ -0,0 +1,41 @@
+"""Ограничение частоты запросов"""
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не более capacity про запас.
+
+    Не потокобезопасен: используется только из event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Через сколько секунд будет доступен токен (0 - доступен сейчас)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self, now: Optional[float] = None) -> None:
+        """Забрать токен (может уйти в минус, если вызван без проверки delay)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self._tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        """Запас восстановлен полностью: состояние можно не хранить"""
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
@@ -0,0 +1,33 @@
+"""Фоновые задачи процесса"""
+import asyncio
+from typing import Awaitable, Optional, Set
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"❌ Ошибка фоновой задачи {task.get_name()}: {task.exception()!r}")
+
+
+def spawn(coro: Awaitable, name: Optional[str] = None) -> asyncio.Task:
+    """Запустить задачу в фоне; ссылка хранится до завершения, ошибки логируются"""
+    task = asyncio.ensure_future(coro)
+    if name:
+        task.set_name(name)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def pending() -> int:
+    """Сколько фоновых задач еще выполняется"""
+    return len(_tasks)
+
+
+async def drain(timeout: float) -> None:
+    """Дождаться фоновых задач (при остановке), не дольше timeout секунд"""
+    if _tasks:
+        print(f"⏳ Ожидание фоновых задач: {len(_tasks)}")
+        await asyncio.wait(set(_tasks), timeout=timeout)
@@ -0,0 +1,26 @@
+"""Часовые пояса регионов"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from src.config import DEFAULT_TIMEZONE
+
+
+def get_timezone(name: Optional[str] = None) -> ZoneInfo:
+    """Часовой пояс по имени IANA; пустое или неизвестное имя - DEFAULT_TIMEZONE"""
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"⚠️ Неизвестный часовой пояс {name}, используется {DEFAULT_TIMEZONE}")
+    return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def region_timezone(region: Optional[Dict[str, Any]]) -> ZoneInfo:
+    """Часовой пояс региона (поле tz)"""
+    return get_timezone(region.get('tz') if region else None)
+
+
+def local_date(tz: ZoneInfo, days: int = 0) -> str:
+    """Дата YYYY-MM-DD в часовом поясе tz (со сдвигом на days дней)"""
+    return (datetime.now(tz) + timedelta(days=days)).strftime('%Y-%m-%d')
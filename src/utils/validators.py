@@ -0,0 +1,36 @@
+"""Утилиты для валидации и нормализации данных"""
+import re
+from typing import Optional
+
+from src.config import PHONE_COUNTRY_CODE, PHONE_LOCAL_LENGTH
+
+
+def normalize_phone(phone: str) -> str:
+    """Привести телефон к виду <код страны><номер> (только цифры).
+
+    '+998 (90) 123-45-67', '998901234567', '0099890 1234567' и '90 123 45 67'
+    дают один и тот же результат.
+    """
+    digits = re.sub(r'\D', '', phone or '')
+
+    # Международный префикс 00
+    if digits.startswith('00'):
+        digits = digits[2:]
+
+    # Локальный номер без кода страны
+    if len(digits) == PHONE_LOCAL_LENGTH:
+        digits = PHONE_COUNTRY_CODE + digits
+
+    return digits
+
+
+def make_dedupe_key(phone: str, delivery_date: str) -> Optional[str]:
+    """Ключ дедупликации заказа: нормализованный телефон + дата доставки.
+
+    Без цифр в телефоне ключа нет (None): иначе все такие заказы на дату
+    считались бы дубликатами друг друга.
+    """
+    digits = normalize_phone(phone)
+    if not digits:
+        return None
+    return f"{digits}_{delivery_date}"
@@ -0,0 +1,100 @@
+"""Прием обновлений через webhook (aiohttp-сервер)"""
+import asyncio
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from src.config import WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEB_SERVER_HOST, PORT
+from src.services.regions import region_registry
+from src.services.order_store import order_store
+from src.services.outbound import outbound_queue
+from src.services.leader import scheduler_leader
+from src.services.scheduler import recent_job_runs
+from src.utils.tasks import drain
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """Liveness: процесс жив и отвечает"""
+    return web.json_response({'status': 'ok'})
+
+
+async def readyz(request: web.Request) -> web.Response:
+    """Readiness: webhook зарегистрирован и кэши прогреты"""
+    checks = {
+        'webhook': request.app['state']['webhook_set'],
+        'regions': region_registry.loaded,
+        'orders': order_store.ready,
+    }
+    status = 200 if all(checks.values()) else 503
+    return web.json_response({'ready': status == 200, 'checks': checks}, status=status)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Метрики очереди исходящих запросов к Telegram, роль копии и
+    последние запуски задач планировщика"""
+    return web.json_response({
+        'outbound': outbound_queue.metrics(),
+        'scheduler_leader': scheduler_leader.is_leader,
+        'scheduler_runs': await recent_job_runs(),
+    })
+
+
+def create_web_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """Создать aiohttp-приложение с обработчиком webhook и health-проверками"""
+    app = web.Application()
+    # Изменяемое состояние: само приложение после запуска менять нельзя
+    app['state'] = {'webhook_set': False}
+
+    # Проверяет X-Telegram-Bot-Api-Secret-Token (401 при несовпадении) и
+    # отвечает Telegram сразу, обрабатывая обновление в фоне
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET,
+    ).register(app, path=WEBHOOK_PATH)
+
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics)
+
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Запустить сервер и зарегистрировать webhook; работает до SIGTERM/SIGINT"""
+    app = create_web_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEB_SERVER_HOST, PORT)
+    await site.start()
+    print(f"🌐 Webhook-сервер слушает {WEB_SERVER_HOST}:{PORT}{WEBHOOK_PATH}")
+
+    # Все копии регистрируют один и тот же адрес балансировщика: вызов
+    # идемпотентен и подхватывает смену секрета при деплое
+    webhook_url = WEBHOOK_BASE_URL.rstrip('/') + WEBHOOK_PATH
+    await bot.set_webhook(
+        webhook_url,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    app['state']['webhook_set'] = True
+    print(f"✅ Webhook зарегистрирован: {webhook_url}")
+
+    # Render останавливает копию через SIGTERM: дожидаемся завершения
+    # обработки принятых обновлений. Webhook не удаляем - его обслуживают
+    # остальные копии и следующий деплой
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        print("🛑 Остановка webhook-сервера...")
+        await runner.cleanup()
+        # Смены статуса, начатые до остановки
+        await drain(timeout=10)
@@ -0,0 +1,38 @@
+"""Общие фикстуры тестов: хранилище в памяти вместо Firestore"""
+import os
+
+# До импорта src.config: токен обязателен, Firestore в тестах не нужен
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '1:test')
+os.environ['STORAGE_BACKEND'] = 'memory'
+
+import pytest
+
+from src.storage import set_storage
+from src.storage.memory import MemoryBackend
+from src.storage.sqlite import SQLiteBackend
+
+
+@pytest.fixture
+def memory_storage():
+    """Чистое хранилище в памяти на тест"""
+    storage = MemoryBackend()
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    """Хранилище SQLite во временном файле"""
+    storage = SQLiteBackend(str(tmp_path / 'crm.sqlite3'))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+    storage._conn.close()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request):
+    """Каждое локальное хранилище по очереди"""
+    storage = request.getfixturevalue(f'{request.param}_storage')
+    yield storage
@@ -0,0 +1,107 @@
+"""Кнопки смены статуса: подтверждение сразу, запись в фоне"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.handlers import callbacks
+from src.middleware.ordering import UpdateOrderingMiddleware, orders_in_flight
+from src.services.firebase import FirebaseService
+from src.services.orders import OrderService
+from src.utils.tasks import drain
+
+
+def make_callback(chat_id: int = -100, message_id: int = 5, data: str = '') -> MagicMock:
+    callback = MagicMock()
+    callback.data = data
+    callback.answer = AsyncMock()
+    callback.message.reply = AsyncMock()
+    callback.message.edit_text = AsyncMock()
+    callback.message.chat.id = chat_id
+    callback.message.message_id = message_id
+    return callback
+
+
+async def create_order(status: str = 'ASSIGNED') -> str:
+    result = await FirebaseService.create_order({
+        'idHuman': '#1',
+        'status': status,
+        'deliveryDate': '2030-01-01',
+        'courierId': 'courier_1',
+        'customer': {'name': 'Тест'},
+    })
+    return result['order_id']
+
+
+def test_transition_failure_replies_and_redraws_card(memory_storage, monkeypatch):
+    async def failing_update(**kwargs):
+        raise RuntimeError('storage unavailable')
+
+    monkeypatch.setattr(callbacks, 'CALLBACK_ACK_FIRST', True)
+    monkeypatch.setattr(OrderService, 'update_order_status', staticmethod(failing_update))
+
+    async def main():
+        order_id = await create_order()
+        callback = make_callback()
+        await callbacks._run_transition(callback, order_id, 'DELIVERED', 'courier_1', 'courier', '✅ Доставлено')
+        await drain(timeout=5)
+        return order_id, callback
+
+    order_id, callback = asyncio.run(main())
+
+    callback.answer.assert_awaited_once_with("⏳ Обрабатываем...")
+    callback.message.reply.assert_awaited_once()
+    assert 'Не удалось сменить статус' in callback.message.reply.await_args.args[0]
+    # Карточка перерисована по актуальному состоянию заказа
+    callback.message.edit_text.assert_awaited_once()
+    assert order_id not in orders_in_flight
+
+
+def test_repeat_tap_is_answered_at_once_and_written_once(memory_storage, monkeypatch):
+    """Повторное нажатие во время записи не ждет ее и не пишет второй раз;
+    другие обновления той же группы не ждут смену статуса"""
+    writes = []
+    real_update = OrderService.update_order_status
+
+    async def slow_update(**kwargs):
+        await asyncio.sleep(0.3)
+        result = await real_update(**kwargs)
+        writes.append(result['order']['status'])
+        return result
+
+    monkeypatch.setattr(callbacks, 'CALLBACK_ACK_FIRST', True)
+    monkeypatch.setattr(OrderService, 'update_order_status', staticmethod(slow_update))
+
+    async def main():
+        order_id = await create_order()
+        middleware = UpdateOrderingMiddleware()
+        chat, courier = MagicMock(id=-100), MagicMock(id=1)
+        started = asyncio.get_running_loop().time()
+        handled = {}
+
+        async def handler(event, data):
+            if event.callback_query is not None:
+                await callbacks._run_transition(
+                    event.callback_query, order_id, 'DELIVERED', 'courier_1', 'courier', '✅ Доставлено'
+                )
+            handled[event.name] = asyncio.get_running_loop().time() - started
+
+        def update(name, callback=None):
+            event = MagicMock(callback_query=callback)
+            event.name = name
+            return middleware(handler, event, {'event_chat': chat, 'event_from_user': courier})
+
+        tap1 = make_callback(data=f'order:delivered:{order_id}')
+        tap2 = make_callback(data=f'order:delivered:{order_id}')
+        await update('tap1', tap1)
+        await asyncio.sleep(0.1)
+        await asyncio.gather(update('tap2', tap2), update('message'))
+        tap2_answered = asyncio.get_running_loop().time() - started
+        await drain(timeout=5)
+        return tap1, tap2, tap2_answered, handled
+
+    tap1, tap2, tap2_answered, handled = asyncio.run(main())
+
+    assert writes == ['DELIVERED']
+    tap1.answer.assert_awaited_once_with("⏳ Обрабатываем...")
+    tap2.answer.assert_awaited_once_with("⏳ Заказ уже обрабатывается")
+    assert tap2_answered < 0.25
+    assert handled['message'] < 0.25
@@ -0,0 +1,63 @@
+"""Дедупликация заказов по телефону и дате доставки"""
+import asyncio
+
+from src.services.firebase import FirebaseService
+from src.storage import get_storage
+from src.utils.validators import make_dedupe_key
+
+
+def order(phone: str = '+998 90 123-45-67', date: str = '2030-01-01') -> dict:
+    return {'idHuman': '#1', 'status': 'NEW', 'deliveryDate': date, 'customer': {'name': 'Тест', 'phone': phone}}
+
+
+def test_concurrent_duplicates_create_one_order(memory_storage):
+    key = make_dedupe_key('+998 90 123-45-67', '2030-01-01')
+
+    async def main():
+        return await asyncio.gather(*(FirebaseService.create_order(order(), dedupe_key=key) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert sum(result['success'] for result in results) == 1
+    assert all(result['error'] == 'duplicate' for result in results if not result['success'])
+
+
+def test_empty_phone_is_not_deduplicated():
+    assert make_dedupe_key('', '2030-01-01') is None
+    assert make_dedupe_key('нет', '2030-01-01') is None
+
+
+def test_fake_order_releases_its_key(memory_storage):
+    key = make_dedupe_key('901234567', '2030-01-01')
+
+    async def main():
+        first = await FirebaseService.create_order(order(), dedupe_key=key)
+        await FirebaseService.transition_order_status(first['order_id'], 'FAKE', 'operator')
+        second = await FirebaseService.create_order(order(), dedupe_key=key)
+        # Переход уже освобожденного заказа не трогает ключ нового
+        await FirebaseService.transition_order_status(first['order_id'], 'DECLINED', 'operator')
+        return second, await get_storage().get('order_dedupe', key)
+
+    second, dedupe = asyncio.run(main())
+    assert second['success']
+    assert dedupe['orderId'] == second['order_id']
+
+
+def test_backfill_claims_keys_for_old_orders(memory_storage):
+    async def main():
+        storage = get_storage()
+        # Заказы до появления ключей: два на один телефон и дату, один в прошлом
+        await storage.commit([
+            ('set', 'orders', 'a', order()),
+            ('set', 'orders', 'b', order()),
+            ('set', 'orders', 'c', order(date='2020-01-01')),
+            ('set', 'orders', 'd', order(phone='')),
+        ])
+        backfilled = await FirebaseService.backfill_dedupe_keys('2029-12-31')
+        again = await FirebaseService.backfill_dedupe_keys('2029-12-31')
+        duplicate = await FirebaseService.check_duplicate_order('901234567', '2030-01-01')
+        return backfilled, again, duplicate
+
+    backfilled, again, duplicate = asyncio.run(main())
+    assert backfilled == (1, 1)
+    assert again == (0, 1)
+    assert duplicate['id'] == 'a'
@@ -0,0 +1,45 @@
+"""Пропуск правок сообщений без изменений"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText
+
+from src.middleware.edit_dedup import EditDedupMiddleware
+
+
+def edit(text: str) -> EditMessageText:
+    return EditMessageText(chat_id=-100, message_id=5, text=text)
+
+
+def test_local_cache_skips_repeated_edit():
+    make_request = AsyncMock(return_value=True)
+    middleware = EditDedupMiddleware(local_cache=True)
+
+    async def main():
+        await middleware(make_request, MagicMock(), edit('a'))
+        await middleware(make_request, MagicMock(), edit('a'))
+
+    asyncio.run(main())
+    assert make_request.await_count == 1
+
+
+def test_without_local_cache_edit_back_is_sent():
+    """Другая копия могла изменить сообщение: правка обратно отправляется"""
+    make_request = AsyncMock(return_value=True)
+    middleware = EditDedupMiddleware(local_cache=False)
+
+    async def main():
+        await middleware(make_request, MagicMock(), edit('a'))
+        await middleware(make_request, MagicMock(), edit('a'))
+
+    asyncio.run(main())
+    assert make_request.await_count == 2
+
+
+def test_not_modified_is_success():
+    method = edit('a')
+    make_request = AsyncMock(side_effect=TelegramBadRequest(method, 'Bad Request: message is not modified'))
+    middleware = EditDedupMiddleware(local_cache=False)
+
+    assert asyncio.run(middleware(make_request, MagicMock(), method)) is True
@@ -0,0 +1,24 @@
+"""Журнал запусков задач планировщика"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src.services.job_runs import JobRunLog
+
+
+def test_recent_runs_newest_first(tmp_path):
+    runs = JobRunLog(str(tmp_path / 'scheduler.sqlite3'))
+    started_at = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+
+    async def main():
+        await runs.record('report', 'ok', started_at, started_at, started_at + timedelta(seconds=2))
+        await runs.record('rollover', 'timeout', started_at, error='Превышено время выполнения')
+        await runs.record('report', 'missed', started_at)
+        return await runs.recent(limit=2)
+
+    try:
+        recent = asyncio.run(main())
+    finally:
+        runs.close()
+
+    assert [(run['job_id'], run['status']) for run in recent] == [('report', 'missed'), ('rollover', 'timeout')]
+    assert recent[1]['error'] == 'Превышено время выполнения'
@@ -0,0 +1,60 @@
+"""Аренда ведущей копии на локальных хранилищах"""
+import asyncio
+import time
+
+from src.services.leader import LeaderElection
+
+
+def election(ttl: float = 0.6, on_elected=lambda: None) -> LeaderElection:
+    leader = LeaderElection('scheduler', ttl=ttl, renew_interval=0.05)
+    leader.start(on_elected, lambda: None)
+    return leader
+
+
+async def leaders_during(elections: list, seconds: float) -> int:
+    """Наибольшее число одновременных ведущих за seconds"""
+    most = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        most = max(most, sum(leader.is_leader for leader in elections))
+        await asyncio.sleep(0.01)
+    return most
+
+
+def test_one_leader_and_handover_on_stop(storage):
+    async def main():
+        elections = [election() for _ in range(3)]
+        assert await leaders_during(elections, 0.3) == 1
+        [first] = [leader for leader in elections if leader.is_leader]
+
+        # Освобожденную аренду забирает другая копия со следующей попытки
+        await first.stop()
+        rest = [leader for leader in elections if leader is not first]
+        assert await leaders_during(rest, 0.2) == 1
+        assert sum(leader.is_leader for leader in rest) == 1
+
+        for leader in rest:
+            await leader.stop()
+        return await storage.get('locks', 'scheduler')
+
+    assert asyncio.run(main()) is None
+
+
+def test_lost_leader_lease_is_taken_only_after_expiry(storage):
+    async def main():
+        first = election()
+        await asyncio.sleep(0.1)
+        assert first.is_leader
+        # Копия зависла: аренда не продлевается и не освобождается
+        first._task.cancel()
+        lost_at = time.monotonic()
+
+        elected = []
+        second = election(on_elected=lambda: elected.append(time.monotonic()))
+        assert await leaders_during([first, second], 1.0) == 1
+        assert second.is_leader and not first.is_leader
+
+        await second.stop()
+        return elected[0] - lost_at
+
+    assert asyncio.run(main()) >= 0.5
@@ -0,0 +1,65 @@
+"""Перекат очереди: пакеты транзакций и дневные счетчики"""
+import asyncio
+
+from src.services.firebase import FirebaseService
+from src.storage import get_storage
+
+
+async def create_queued(count: int) -> list:
+    orders = []
+    for i in range(count):
+        result = await FirebaseService.create_order({
+            'idHuman': f'#{i}',
+            'status': 'QUEUED_TOMORROW',
+            'deliveryDate': '2030-01-02',
+            'regionId': 'r1',
+            'totalAmount': 10,
+            'customer': {'name': 'Тест'},
+        })
+        orders.append(await FirebaseService.get_order(result['order_id']))
+    return orders
+
+
+def test_batch_skips_orders_changed_after_read(memory_storage):
+    async def main():
+        orders = await create_queued(300)
+        await FirebaseService.transition_order_status(orders[5]['id'], 'CANCELLED', 'operator')
+        moved = await FirebaseService.transition_orders_batch(orders, 'PUBLISHED_TODAY', 'system')
+        cancelled = await FirebaseService.get_order(orders[5]['id'])
+        counters = await FirebaseService.get_daily_counters('2030-01-02')
+        return orders, moved, cancelled, counters
+
+    orders, moved, cancelled, counters = asyncio.run(main())
+
+    assert len(moved['orders']) == 299
+    assert moved['skipped'] == [orders[5]['id']]
+    assert moved['errors'] == []
+    assert cancelled['status'] == 'CANCELLED'
+    # Отмененный заказ снят с очереди один раз
+    assert counters['r1'] == {
+        'PUBLISHED_TODAY': {'count': 299, 'amount': 2990},
+        'CANCELLED': {'count': 1, 'amount': 10},
+    }
+
+
+def test_failed_batch_does_not_cancel_the_others(memory_storage, monkeypatch):
+    storage = get_storage()
+    real_transact = storage.transact
+    calls = []
+
+    async def flaky_transact(reads, fn):
+        calls.append(len(reads))
+        if len(calls) == 1:
+            raise RuntimeError('deadline exceeded')
+        return await real_transact(reads, fn)
+
+    async def main():
+        orders = await create_queued(200)
+        monkeypatch.setattr(storage, 'transact', flaky_transact)
+        return await FirebaseService.transition_orders_batch(orders, 'PUBLISHED_TODAY', 'system')
+
+    moved = asyncio.run(main())
+
+    assert len(moved['errors']) == 1
+    assert len(moved['orders']) == 200 - calls[0]
+    assert all(order['status'] == 'PUBLISHED_TODAY' for order in moved['orders'])
@@ -0,0 +1,73 @@
+"""Дедлайны SLA: запись вместе со статусом и срабатывание по куче"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.services import firebase, sla
+from src.services.firebase import FirebaseService
+from src.storage import get_storage
+
+
+async def new_order() -> str:
+    result = await FirebaseService.create_order({
+        'idHuman': '#1', 'status': 'NEW', 'deliveryDate': '2030-01-01', 'operatorId': 'op',
+        'customer': {'name': 'Тест', 'phone': '901234567'},
+    })
+    return result['order_id']
+
+
+async def open_tasks(order_id: str) -> list:
+    return await get_storage().query('tasks', [('orderId', '==', order_id)])
+
+
+def test_reentering_sla_status_rearms_fired_deadline(storage):
+    async def main():
+        order_id = await new_order()
+        await FirebaseService.transition_order_status(order_id, 'NO_ANSWER', 'op')
+        first = await get_storage().get('sla_deadlines', order_id)
+        assert (await FirebaseService.fire_sla_deadline(order_id))['task_id']
+
+        # Еще один недозвон: дедлайн отсчитывается заново и срабатывает снова
+        await FirebaseService.transition_order_status(order_id, 'NO_ANSWER', 'op')
+        second = await get_storage().get('sla_deadlines', order_id)
+        assert not second.get('firedAt')
+        assert second['dueAt'] > first['dueAt']
+        assert (await FirebaseService.fire_sla_deadline(order_id))['task_id']
+        assert await FirebaseService.fire_sla_deadline(order_id) is None
+
+        await FirebaseService.transition_order_status(order_id, 'CONFIRMED', 'op')
+        return await get_storage().get('sla_deadlines', order_id), await open_tasks(order_id)
+
+    deadline, tasks = asyncio.run(main())
+    assert deadline is None
+    assert len(tasks) == 2
+
+
+def test_engine_fires_on_deadline_and_after_reentry(memory_storage, monkeypatch):
+    # SLA в доли секунды, чтобы таймер движка сработал в тесте
+    monkeypatch.setitem(firebase.SLA_STATUSES, 'NO_ANSWER', 0.2 / 60)
+    notifications = MagicMock(notify_operator_action_required=AsyncMock(), broadcast=AsyncMock())
+    monkeypatch.setattr(sla, 'NotificationService', MagicMock(return_value=notifications))
+
+    async def main():
+        engine = sla.SlaEngine()
+        engine.start(MagicMock())
+        try:
+            fired, left = await new_order(), await new_order()
+            await FirebaseService.transition_order_status(fired, 'NO_ANSWER', 'op')
+            await FirebaseService.transition_order_status(left, 'NO_ANSWER', 'op')
+            # Вышедший из статуса до дедлайна заказ не срабатывает
+            await FirebaseService.transition_order_status(left, 'CONFIRMED', 'op')
+            await asyncio.sleep(0.5)
+            assert len(await open_tasks(fired)) == 1
+
+            await FirebaseService.transition_order_status(fired, 'NO_ANSWER', 'op')
+            await asyncio.sleep(0.5)
+            return await open_tasks(fired), await open_tasks(left), engine.pending
+        finally:
+            engine.stop()
+
+    fired_tasks, left_tasks, pending = asyncio.run(main())
+    assert len(fired_tasks) == 2
+    assert left_tasks == []
+    assert pending == 0
+    assert notifications.notify_operator_action_required.await_count == 2
@@ -0,0 +1,69 @@
+"""Транзакции и атомарность локальных хранилищ (память, SQLite)"""
+import asyncio
+
+import pytest
+
+from src.storage import AlreadyExists, Increment, TransactionRejected
+
+
+def test_transact_returns_reads_in_order(storage):
+    async def main():
+        await storage.commit([('set', 'orders', 'a', {'n': 1}), ('set', 'orders', 'b', {'n': 2})])
+        seen = []
+
+        def build(docs):
+            seen.extend(docs)
+            return []
+
+        await storage.transact([('orders', 'b'), ('orders', 'missing'), ('orders', 'a')], build)
+        return seen
+
+    seen = asyncio.run(main())
+    assert [doc and doc['n'] for doc in seen] == [2, None, 1]
+
+
+def test_rejected_transaction_writes_nothing(storage):
+    def build(docs):
+        raise TransactionRejected({'success': False})
+
+    async def main():
+        with pytest.raises(TransactionRejected) as rejected:
+            await storage.transact([('orders', 'a')], build)
+        return rejected.value.payload, await storage.get('orders', 'a')
+
+    payload, doc = asyncio.run(main())
+    assert payload == {'success': False}
+    assert doc is None
+
+
+def test_commit_is_all_or_nothing(storage):
+    async def main():
+        await storage.commit([('set', 'orders', 'a', {'n': 1})])
+        with pytest.raises(AlreadyExists):
+            await storage.commit([('set', 'orders', 'b', {'n': 2}), ('create', 'orders', 'a', {'n': 3})])
+        return await storage.get('orders', 'a'), await storage.get('orders', 'b')
+
+    a, b = asyncio.run(main())
+    assert a['n'] == 1
+    assert b is None
+
+
+def test_concurrent_transactions_do_not_lose_updates(storage):
+    def build(docs):
+        value = docs[0]['n'] if docs[0] else 0
+        return [('set', 'counters', 'c', {'n': value + 1})]
+
+    async def main():
+        await asyncio.gather(*(storage.transact([('counters', 'c')], build) for _ in range(50)))
+        return await storage.get('counters', 'c')
+
+    assert asyncio.run(main())['n'] == 50
+
+
+def test_merge_increments_missing_fields_from_zero(storage):
+    async def main():
+        for _ in range(3):
+            await storage.commit([('merge', 'daily_counters', 'd', {'count': {'NEW': Increment(2)}})])
+        return await storage.get('daily_counters', 'd')
+
+    assert asyncio.run(main())['count'] == {'NEW': 6}
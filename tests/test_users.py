@@ -0,0 +1,52 @@
+"""Кэш пользователей: вытеснение и обновления из листенера"""
+import asyncio
+import time
+
+from src.services import users
+from src.services.users import UserCache
+
+
+def test_evicted_users_are_forgotten(monkeypatch):
+    async def get_user(telegram_id):
+        return {'id': f'user-{telegram_id}', 'telegramId': telegram_id, 'role': 'courier'}
+
+    monkeypatch.setattr(users.FirebaseService, 'get_user_by_telegram_id', staticmethod(get_user))
+    cache = UserCache(max_size=3, ttl=60)
+
+    async def main():
+        for telegram_id in range(100):
+            await cache.get_by_telegram_id(telegram_id)
+
+    asyncio.run(main())
+    assert len(cache._telegram_ids) == 3
+    assert set(cache._telegram_ids.values()) == {'97', '98', '99'}
+
+
+def test_expired_users_are_forgotten(monkeypatch):
+    async def get_user(telegram_id):
+        return {'id': 'user-1', 'telegramId': telegram_id}
+
+    monkeypatch.setattr(users.FirebaseService, 'get_user_by_telegram_id', staticmethod(get_user))
+    cache = UserCache(max_size=10, ttl=0.01)
+    asyncio.run(cache.get_by_telegram_id(1))
+    time.sleep(0.02)
+
+    assert '1' not in cache._cache
+    assert cache._telegram_ids == {}
+
+
+def test_listener_updates_only_cached_users():
+    cache = UserCache(max_size=10, ttl=60)
+    cache._remember('1', {'id': 'user-1', 'telegramId': 1, 'role': 'courier'})
+
+    cache._apply_changes([
+        ('MODIFIED', 'user-1', {'telegramId': 1, 'role': 'admin'}),
+        ('ADDED', 'user-2', {'telegramId': 2, 'role': 'courier'}),
+    ])
+    assert cache._cache.get('1')['role'] == 'admin'
+    assert '2' not in cache._cache
+
+    # Смена telegramId: старый ключ становится негативной записью
+    cache._apply_changes([('MODIFIED', 'user-1', {'telegramId': 3, 'role': 'admin'})])
+    assert cache._cache.get('1') is None
+    assert cache._telegram_ids == {}